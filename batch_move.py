@@ -0,0 +1,140 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Tuple
+from gallery_source import FilesystemGallerySource
+
+COPY_WORKERS = 4  # Concurrent cross-device copies
+
+# (old relative path, new relative path, old full path, new full path)
+PlannedMove = Tuple[str, str, str, str]
+
+
+def plan_moves(source: FilesystemGallerySource, target: FilesystemGallerySource, target_subpath: str,
+               files: Iterable[str]) -> Tuple[List[PlannedMove], List[str]]:
+    """
+    Work out where every file goes before anything is touched.
+
+    Files that are missing, would land on an existing file or collide with
+    another file of the batch are reported as errors and left out of the plan.
+
+    Returns:
+        (planned moves, error messages)
+    """
+    target_base = target._resolve_subpath(target_subpath)
+    moves: List[PlannedMove] = []
+    errors: List[str] = []
+    claimed = set()
+    for file in files:
+        file = file.replace(os.sep, '/')
+        if not source.file_exists(file):
+            errors.append(f"{file}: Source file not found")
+            continue
+        basename = os.path.basename(file)
+        new_relative = (target_subpath.strip('/') + '/' + basename).lstrip('/')
+        if target.file_exists(new_relative) or new_relative in claimed:
+            errors.append(f"{file}: A file with that name already exists at the destination")
+            continue
+        claimed.add(new_relative)
+        moves.append((file, new_relative, source.get_file_path(file), os.path.join(target_base, basename)))
+    return moves, errors
+
+
+def _staging_path(destination: str) -> str:
+    # Hidden and not a media extension, so watchers ignore the file until it is renamed into place
+    directory, basename = os.path.split(destination)
+    return os.path.join(directory, f".{basename}.moving")
+
+
+def execute_moves(moves: List[PlannedMove], workers: int = COPY_WORKERS) -> List[str]:
+    """
+    Move every planned file, or none of them.
+
+    Files on the target's filesystem are moved with os.rename. Files on
+    another device are first copied next to their destination in a bounded
+    pool; only once every rename and copy has succeeded are the copies
+    renamed into place and their originals removed. On any failure, up to
+    and including placing the copies, the renames are undone and the
+    copies deleted.
+
+    Returns:
+        Error messages; empty if every file was moved
+    """
+    if not moves:
+        return []
+    target_dirs = {os.path.dirname(destination) for _, _, _, destination in moves}
+    for directory in target_dirs:
+        os.makedirs(directory, exist_ok=True)
+    target_devices = {directory: os.stat(directory).st_dev for directory in target_dirs}
+    local: List[PlannedMove] = []
+    remote: List[PlannedMove] = []
+    for move in moves:
+        try:
+            same_device = os.stat(move[2]).st_dev == target_devices[os.path.dirname(move[3])]
+        except OSError as e:
+            return [f"{move[0]}: {e}"]
+        (local if same_device else remote).append(move)
+
+    renamed: List[PlannedMove] = []
+    staged: List[PlannedMove] = []
+    errors: List[str] = []
+    for move in local:
+        old_relative, _, old_path, new_path = move
+        try:
+            if os.path.exists(new_path):
+                raise FileExistsError("A file with that name already exists at the destination")
+            os.rename(old_path, new_path)
+            renamed.append(move)
+        except OSError as e:
+            errors.append(f"{old_relative}: {e}")
+            break
+
+    if not errors and remote:
+        def copy(move: PlannedMove):
+            shutil.copy2(move[2], _staging_path(move[3]))
+            return move
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='move-copy') as executor:
+            futures = [(move, executor.submit(copy, move)) for move in remote]
+            for move, future in futures:
+                try:
+                    staged.append(future.result())
+                except OSError as e:
+                    errors.append(f"{move[0]}: {e}")
+
+    placed: List[PlannedMove] = []
+    if not errors:
+        # Originals are only removed once every copy is in place, so a failure here can still be undone
+        for move in staged:
+            try:
+                os.replace(_staging_path(move[3]), move[3])
+                placed.append(move)
+            except OSError as e:
+                errors.append(f"{move[0]}: {e}")
+                break
+
+    if errors:
+        for _, _, old_path, new_path in reversed(placed):
+            try:
+                os.remove(new_path)
+            except OSError as e:
+                print(f"Error rolling back copy of {old_path}: {e}")
+        for _, _, old_path, new_path in reversed(renamed):
+            try:
+                os.rename(new_path, old_path)
+            except OSError as e:
+                print(f"Error rolling back move of {old_path}: {e}")
+        for move in remote:
+            try:
+                os.remove(_staging_path(move[3]))
+            except OSError:
+                pass
+        return errors
+
+    for _, _, old_path, _ in placed:
+        try:
+            os.remove(old_path)
+        except OSError as e:
+            # The copy is in place; a leftover original is reported but not undone
+            print(f"Error removing {old_path} after copying it: {e}")
+    return []
@@ -0,0 +1,125 @@
+import json
+import queue
+import threading
+from collections import deque
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from source_watcher import SourceWatcher
+
+# describe(dir_name, relative_path) -> file metadata as returned by /images, or None if the file is gone
+Describe = Callable[[str, str], Optional[Dict]]
+
+
+class ChangeFeed:
+    """
+    Server-sent events feed of gallery changes.
+
+    Watcher events and rating/tag changes are queued by cheap listeners and
+    turned into feed events on one worker thread, which computes the file's
+    metadata once for all subscribers. Event types are 'created', 'deleted',
+    'moved' (with 'previous') and 'metadata-changed'; created, moved and
+    metadata-changed events carry the same 'file' dict as an /images item.
+
+    Recent events are kept in a backlog so a reconnecting EventSource can
+    resume from Last-Event-ID; a client that fell further behind gets a
+    single 'reset' event and should refetch.
+    """
+
+    BACKLOG_SIZE = 1000
+    SUBSCRIBER_QUEUE_SIZE = 1000  # Undelivered events before a subscriber is dropped
+    HEARTBEAT_SECONDS = 15.0
+
+    def __init__(self, describe: Describe):
+        self.describe = describe
+        self._last_id = 0
+        self._backlog: deque = deque(maxlen=self.BACKLOG_SIZE)
+        self._subscribers: List["queue.Queue[Optional[Dict]]"] = []
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Tuple[str, str, str, Optional[str]]]" = queue.Queue()
+
+    def add_source(self, dir_name: str, watcher: SourceWatcher, ratings_manager=None, tags_manager=None):
+        """Feed events for one source; a watcher shared by two sources is added once per dir_name."""
+        def on_file_event(event: str, relative_path: str, previous_path: Optional[str]):
+            self._queue.put((dir_name, event, relative_path, previous_path))
+
+        def on_metadata_changed(filename: str):
+            self._queue.put((dir_name, 'metadata-changed', filename, None))
+
+        watcher.add_listener(on_file_event)
+        for manager in (ratings_manager, tags_manager):
+            if manager is not None:
+                manager.add_listener(on_metadata_changed)
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while True:
+            dir_name, event, relative_path, previous_path = self._queue.get()
+            try:
+                self._publish(dir_name, event, relative_path, previous_path)
+            except Exception as e:
+                print(f"Error publishing {event} event for {relative_path}: {e}")
+
+    def _publish(self, dir_name: str, event: str, relative_path: str, previous_path: Optional[str]):
+        if event == 'modified':
+            event = 'metadata-changed'
+        payload = {"type": event, "dir": dir_name, "name": relative_path}
+        if event == 'moved':
+            payload["previous"] = previous_path
+        if event != 'deleted':
+            file_metadata = self.describe(dir_name, relative_path)
+            if file_metadata is None:
+                # Gone again before we got to it (or a rename notification for the old name)
+                return
+            payload["file"] = file_metadata
+        with self._lock:
+            self._last_id += 1
+            payload["id"] = self._last_id
+            self._backlog.append(payload)
+            for subscriber in list(self._subscribers):
+                if subscriber.qsize() >= self.SUBSCRIBER_QUEUE_SIZE:
+                    # Too slow to keep up: end its stream; the client resumes or resets on reconnect
+                    self._subscribers.remove(subscriber)
+                    subscriber.put(None)
+                else:
+                    subscriber.put(payload)
+
+    def _subscribe(self, last_event_id: Optional[int]) -> Tuple["queue.Queue[Optional[Dict]]", List[Dict]]:
+        subscriber: "queue.Queue[Optional[Dict]]" = queue.Queue()
+        with self._lock:
+            self._subscribers.append(subscriber)
+            if last_event_id is None:
+                return subscriber, []
+            oldest = self._backlog[0]["id"] if self._backlog else self._last_id + 1
+            # Events fell out of the backlog, or the ids are from before a server restart
+            if last_event_id < oldest - 1 or last_event_id > self._last_id:
+                return subscriber, [{"type": "reset", "id": self._last_id}]
+            return subscriber, [event for event in self._backlog if event["id"] > last_event_id]
+
+    def _unsubscribe(self, subscriber: "queue.Queue[Optional[Dict]]"):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def stream(self, last_event_id: Optional[int] = None) -> Iterator[str]:
+        """Yield SSE-formatted events until the client disconnects."""
+        subscriber, replay = self._subscribe(last_event_id)
+        try:
+            yield "retry: 3000\n\n"
+            for event in replay:
+                yield format_event(event)
+            while True:
+                try:
+                    event = subscriber.get(timeout=self.HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    return
+                yield format_event(event)
+        finally:
+            self._unsubscribe(subscriber)
+
+
+def format_event(event: Dict) -> str:
+    return f"id: {event['id']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
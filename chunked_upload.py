@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, IO, List, Optional, Tuple
+
+CHUNK_SIZE = 8 * 1024 * 1024
+STREAM_BLOCK_SIZE = 1024 * 1024
+PART_EXPIRY_SECONDS = 7 * 24 * 3600  # Abandoned .part files older than this are removed by init
+
+
+class UploadError(Exception):
+    """Rejected upload request; carries the HTTP status to answer with."""
+
+    def __init__(self, message: str, status: int = 400, missing: Optional[List[int]] = None):
+        super().__init__(message)
+        self.status = status
+        self.missing = missing or []
+
+
+def composite_checksum(chunk_digests: List[str]) -> str:
+    """SHA-256 over the concatenated per-chunk SHA-256 digests, in chunk order."""
+    return hashlib.sha256(b''.join(bytes.fromhex(digest) for digest in chunk_digests)).hexdigest()
+
+
+class ChunkedUploads:
+    """
+    Resumable chunked uploads into one directory tree.
+
+    init() creates (or finds) a session for a target path, size and client
+    fingerprint (e.g. the file's last-modified time) and preallocates a
+    hidden .part file next to the target. Chunks may arrive in any order and
+    in parallel; each is streamed straight to its offset in the .part file
+    and its SHA-256 checked against the client's. Received chunks are
+    recorded in a JSON sidecar, so calling init() again after a dropped
+    connection or a server restart reports what is left to send. complete()
+    re-reads the .part file, checks it against the client's composite
+    checksum and renames it into place.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = os.path.abspath(directory)
+        self._sessions: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    # ─── Sessions ────────────────────────────────────────────
+
+    @staticmethod
+    def _session_id(relative_path: str, size: int, fingerprint: str) -> str:
+        return hashlib.sha1(f"{relative_path}\0{size}\0{fingerprint}".encode('utf-8')).hexdigest()
+
+    def _part_path(self, relative_path: str, upload_id: str) -> str:
+        directory, _, filename = relative_path.rpartition('/')
+        return os.path.join(self.directory, directory, f".{filename}.{upload_id[:12]}.part")
+
+    def _save_session_unsafe(self, session: Dict):
+        state_path = session['part_path'] + '.json'
+        temp_path = state_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({k: v for k, v in session.items() if k != 'part_path'}, f)
+        os.replace(temp_path, state_path)
+
+    def _load_session_unsafe(self, upload_id: str, relative_path: str) -> Optional[Dict]:
+        session = self._sessions.get(upload_id)
+        if session is not None:
+            return session
+        part_path = self._part_path(relative_path, upload_id)
+        try:
+            with open(part_path + '.json', 'r', encoding='utf-8') as f:
+                session = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if not os.path.exists(part_path):
+            return None
+        session['part_path'] = part_path
+        self._sessions[upload_id] = session
+        return session
+
+    def _sweep_expired(self, directory: str):
+        cutoff = time.time() - PART_EXPIRY_SECONDS
+        try:
+            for entry in os.scandir(directory):
+                if entry.name.startswith('.') and entry.name.endswith('.part') and entry.stat().st_mtime < cutoff:
+                    for path in (entry.path, entry.path + '.json'):
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+        except OSError:
+            pass
+
+    def init(self, relative_path: str, size: int, fingerprint: str = "") -> Dict:
+        """
+        Start or resume an upload of size bytes to relative_path.
+
+        Returns {"upload_id", "chunk_size", "received": [chunk indexes already stored]}.
+        """
+        upload_id = self._session_id(relative_path, size, fingerprint)
+        with self._lock:
+            session = self._load_session_unsafe(upload_id, relative_path)
+            if session is None:
+                part_path = self._part_path(relative_path, upload_id)
+                os.makedirs(os.path.dirname(part_path), exist_ok=True)
+                self._sweep_expired(os.path.dirname(part_path))
+                with open(part_path, 'wb') as f:
+                    f.truncate(size)
+                chunk_count = max(1, (size + CHUNK_SIZE - 1) // CHUNK_SIZE)
+                session = {
+                    'path': relative_path, 'size': size,
+                    'chunk_size': CHUNK_SIZE, 'digests': [None] * chunk_count, 'part_path': part_path,
+                }
+                self._sessions[upload_id] = session
+                self._save_session_unsafe(session)
+            received = [i for i, digest in enumerate(session['digests']) if digest is not None]
+            return {"upload_id": upload_id, "chunk_size": session['chunk_size'], "received": received}
+
+    def _get_session(self, upload_id: str) -> Dict:
+        with self._lock:
+            session = self._sessions.get(upload_id)
+        if session is None:
+            raise UploadError("Unknown upload; start it again with /upload/init", 404)
+        return session
+
+    # ─── Chunks ──────────────────────────────────────────────
+
+    def _chunk_range(self, session: Dict, index: int) -> Tuple[int, int]:
+        if not 0 <= index < len(session['digests']):
+            raise UploadError(f"Chunk {index} out of range")
+        start = index * session['chunk_size']
+        return start, min(session['size'], start + session['chunk_size']) - start
+
+    def write_chunk(self, upload_id: str, index: int, stream: IO[bytes], expected_digest: str = "") -> int:
+        """Stream one chunk to its offset; returns the number of chunks stored so far."""
+        session = self._get_session(upload_id)
+        offset, length = self._chunk_range(session, index)
+        hasher = hashlib.sha256()
+        written = 0
+        with open(session['part_path'], 'r+b') as f:
+            f.seek(offset)
+            while written < length:
+                block = stream.read(min(STREAM_BLOCK_SIZE, length - written))
+                if not block:
+                    break
+                f.write(block)
+                hasher.update(block)
+                written += len(block)
+            if written != length or stream.read(1):
+                raise UploadError(f"Chunk {index} should be {length} bytes")
+        digest = hasher.hexdigest()
+        if expected_digest and digest != expected_digest.lower():
+            raise UploadError(f"Chunk {index} checksum mismatch", 422)
+        with self._lock:
+            session['digests'][index] = digest
+            self._save_session_unsafe(session)
+            return sum(1 for d in session['digests'] if d is not None)
+
+    # ─── Completion ──────────────────────────────────────────
+
+    def complete(self, upload_id: str, checksum: str = "") -> str:
+        """
+        Verify the .part file and move it into place; returns the relative path.
+
+        checksum, if given, is composite_checksum() of the client's chunk
+        digests. Raises UploadError (409) listing the chunks to send again if
+        any are missing, no longer match on disk or disagree with checksum.
+        """
+        session = self._get_session(upload_id)
+        missing = [i for i, digest in enumerate(session['digests']) if digest is None]
+        if missing:
+            raise UploadError(f"{len(missing)} chunk(s) not received", 409, missing)
+
+        # Re-read what actually landed on disk rather than trusting the digests taken in flight
+        on_disk = []
+        with open(session['part_path'], 'rb') as f:
+            for index in range(len(session['digests'])):
+                _, length = self._chunk_range(session, index)
+                hasher = hashlib.sha256()
+                remaining = length
+                while remaining > 0:
+                    block = f.read(min(STREAM_BLOCK_SIZE, remaining))
+                    if not block:
+                        break
+                    hasher.update(block)
+                    remaining -= len(block)
+                on_disk.append(hasher.hexdigest())
+        corrupt = [i for i, (a, b) in enumerate(zip(on_disk, session['digests'])) if a != b]
+        if not corrupt and checksum and composite_checksum(on_disk) != checksum.lower():
+            corrupt = list(range(len(on_disk)))
+        if corrupt:
+            with self._lock:
+                for index in corrupt:
+                    session['digests'][index] = None
+                self._save_session_unsafe(session)
+            raise UploadError("Checksum mismatch", 409, corrupt)
+
+        with self._lock:
+            self._sessions.pop(upload_id, None)
+        os.replace(session['part_path'], os.path.join(self.directory, session['path']))
+        try:
+            os.remove(session['part_path'] + '.json')
+        except OSError:
+            pass
+        return session['path']
@@ -0,0 +1,359 @@
+import argparse
+import hashlib
+import os
+import struct
+import sys
+import tempfile
+import time
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from hashing import hash_file
+
+DEFAULT_BLOCK_SIZE = 256 * 1024
+MIN_BLOCK_SIZE = 1024
+MAX_BLOCK_SIZE = 16 * 1024 * 1024  # Bounds the memory a client's signature can make the server use
+STRONG_SIZE = 16
+SCAN_WINDOW = 8 * 1024 * 1024  # Bytes searched per vectorized rolling-checksum pass
+BATCH_BYTES = 8 * 1024 * 1024  # Bytes of aligned blocks checksummed per vectorized pass
+DATA_CHUNK_SIZE = 1024 * 1024
+
+SIGNATURE_HEADER = struct.Struct('<QI')  # basis file size, block size
+SIGNATURE_ENTRY = struct.Struct(f'<I{STRONG_SIZE}s')  # weak checksum, strong checksum
+COPY_OP = struct.Struct('<QQ')  # first basis block, block count
+DATA_OP = struct.Struct('<Q')  # literal length
+
+def strong_checksum(block: bytes) -> bytes:
+    return hashlib.blake2b(block, digest_size=STRONG_SIZE).digest()
+
+def weak_checksum(block: bytes) -> int:
+    """rsync-style weak checksum of a single block."""
+    x = np.frombuffer(block, dtype=np.uint8).astype(np.int64)
+    n = len(x)
+    a = int(x.sum()) & 0xFFFF
+    b = int(((n - np.arange(n, dtype=np.int64)) * x).sum()) & 0xFFFF
+    return a | (b << 16)
+
+def block_weak_checksums(data: bytes, block_size: int) -> np.ndarray:
+    """Weak checksums of each consecutive full block in data, computed in one pass."""
+    count = len(data) // block_size
+    if count == 0:
+        return np.empty(0, dtype=np.int64)
+    x = np.frombuffer(data, dtype=np.uint8, count=count * block_size).reshape(count, block_size).astype(np.int64)
+    a = x.sum(axis=1)
+    b = x @ np.arange(block_size, 0, -1, dtype=np.int64)
+    return (a & 0xFFFF) | ((b & 0xFFFF) << 16)
+
+def rolling_weak_checksums(data: bytes, block_size: int) -> np.ndarray:
+    """
+    Weak checksums of every block_size window in data, computed with prefix sums.
+
+    Equivalent to calling weak_checksum(data[k:k + block_size]) for every k,
+    but vectorized so multi-GB files can be searched without a per-byte loop.
+    """
+    count = len(data) - block_size + 1
+    if count <= 0:
+        return np.empty(0, dtype=np.int64)
+    x = np.frombuffer(data, dtype=np.uint8).astype(np.int64)
+    s = np.concatenate(([0], np.cumsum(x)))
+    t = np.concatenate(([0], np.cumsum(x * np.arange(len(x), dtype=np.int64))))
+    k = np.arange(count, dtype=np.int64)
+    a = s[block_size:] - s[:count]
+    weighted = t[block_size:] - t[:count] - k * a
+    b = block_size * a - weighted
+    return (a & 0xFFFF) | ((b & 0xFFFF) << 16)
+
+def compute_signature(path: str, block_size: int = DEFAULT_BLOCK_SIZE) -> bytes:
+    """
+    Build the block signature of a local file.
+
+    Only full blocks are signed; a trailing partial block is always resent.
+
+    Returns:
+        bytes: Packed header followed by one (weak, strong) entry per block
+    """
+    size = os.path.getsize(path)
+    parts = [SIGNATURE_HEADER.pack(size, block_size)]
+    batch = max(1, BATCH_BYTES // block_size) * block_size
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(batch)
+            weaks = block_weak_checksums(data, block_size)
+            for i, weak in enumerate(weaks):
+                block = data[i * block_size:(i + 1) * block_size]
+                parts.append(SIGNATURE_ENTRY.pack(int(weak), strong_checksum(block)))
+            if len(data) < batch:
+                break
+    return b''.join(parts)
+
+class Signature:
+    """Parsed block signature with a weak-checksum lookup table."""
+
+    def __init__(self, data: bytes):
+        if len(data) < SIGNATURE_HEADER.size:
+            raise ValueError("Signature is too short")
+        self.basis_size, self.block_size = SIGNATURE_HEADER.unpack_from(data)
+        if not MIN_BLOCK_SIZE <= self.block_size <= MAX_BLOCK_SIZE:
+            raise ValueError(f"Block size must be between {MIN_BLOCK_SIZE} and {MAX_BLOCK_SIZE} bytes")
+        body = memoryview(data)[SIGNATURE_HEADER.size:]
+        if len(body) % SIGNATURE_ENTRY.size:
+            raise ValueError("Truncated signature")
+        self.blocks: Dict[int, List[Tuple[int, bytes]]] = {}
+        for index, (weak, strong) in enumerate(SIGNATURE_ENTRY.iter_unpack(body)):
+            self.blocks.setdefault(weak, []).append((index, strong))
+        self.weak_values = np.array(sorted(self.blocks), dtype=np.int64)
+
+    def match(self, weak: int, block: bytes, preferred: Optional[int] = None) -> Optional[int]:
+        """Return the basis block index matching this block, or None."""
+        candidates = self.blocks.get(weak)
+        if not candidates:
+            return None
+        strong = strong_checksum(block)
+        found = None
+        for index, candidate in candidates:
+            if candidate == strong:
+                # Prefer the block at the same position so unchanged data stays in place
+                if index == preferred:
+                    return index
+                if found is None:
+                    found = index
+        return found
+
+def generate_plan(path: str, signature: Signature) -> List[Tuple]:
+    """
+    Compare a file against a basis signature and plan how to rebuild it.
+
+    Returns:
+        list: ('copy', first_block, block_count, target_offset) and
+              ('data', offset, length) operations in target order
+    """
+    block_size = signature.block_size
+    size = os.path.getsize(path)
+    ops: List[Tuple] = []
+    literal_start = 0
+    pos = 0
+
+    def emit_literal(end):
+        if end > literal_start:
+            ops.append(('data', literal_start, end - literal_start))
+
+    batch = max(1, BATCH_BYTES // block_size) * block_size
+    with open(path, 'rb') as f:
+        while pos + block_size <= size:
+            # Fast path: checksum a batch of aligned blocks and take matches in order
+            f.seek(pos)
+            data = f.read(batch)
+            weaks = block_weak_checksums(data, block_size)
+            matched = 0
+            for i, weak in enumerate(weaks):
+                block = data[i * block_size:(i + 1) * block_size]
+                index = signature.match(int(weak), block, preferred=pos // block_size)
+                if index is None:
+                    break
+                emit_literal(pos)
+                last = ops[-1] if ops else None
+                if last and last[0] == 'copy' and last[1] + last[2] == index and last[3] + last[2] * block_size == pos:
+                    ops[-1] = ('copy', last[1], last[2] + 1, last[3])
+                else:
+                    ops.append(('copy', index, 1, pos))
+                pos += block_size
+                literal_start = pos
+                matched += 1
+            if matched == len(weaks) and matched > 0:
+                continue
+            if pos + block_size > size:
+                break
+
+            # No match at this offset: search ahead for the next matching block.
+            # Windows grow geometrically since most edits are followed closely
+            # by unchanged data.
+            span = block_size
+            found = None
+            while found is None and pos + block_size <= size:
+                f.seek(pos + 1)
+                window = f.read(span + block_size - 1)
+                weaks = rolling_weak_checksums(window, block_size)
+                if len(weaks) == 0:
+                    pos = size
+                    break
+                for offset in np.flatnonzero(np.isin(weaks, signature.weak_values)):
+                    offset = int(offset)
+                    if signature.match(int(weaks[offset]), window[offset:offset + block_size]) is not None:
+                        found = pos + 1 + offset
+                        break
+                pos = found if found is not None else pos + len(weaks)
+                span = min(span * 2, SCAN_WINDOW)
+
+    emit_literal(size)
+    return ops
+
+def plan_is_in_place(ops: List[Tuple], block_size: int) -> bool:
+    """True when every copy keeps its data at the same offset, so the basis can be patched in place."""
+    return all(op[0] != 'copy' or op[1] * block_size == op[3] for op in ops)
+
+def plan_literal_bytes(ops: List[Tuple]) -> int:
+    return sum(op[2] for op in ops if op[0] == 'data')
+
+def encode_delta(path: str, ops: List[Tuple]) -> Iterator[bytes]:
+    """Stream a plan as delta bytes, reading literal data from the file."""
+    with open(path, 'rb') as f:
+        for op in ops:
+            if op[0] == 'copy':
+                yield b'C' + COPY_OP.pack(op[1], op[2])
+            else:
+                _, offset, length = op
+                yield b'D' + DATA_OP.pack(length)
+                f.seek(offset)
+                while length > 0:
+                    chunk = f.read(min(DATA_CHUNK_SIZE, length))
+                    if not chunk:
+                        raise IOError("File shrank while encoding delta")
+                    length -= len(chunk)
+                    yield chunk
+    yield b'E'
+
+def _read_exact(stream: BinaryIO, size: int) -> bytes:
+    data = b''
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise IOError("Delta stream ended unexpectedly")
+        data += chunk
+    return data
+
+def apply_delta(basis_path: str, stream: BinaryIO, block_size: int, target_size: int,
+                output_path: Optional[str] = None) -> int:
+    """
+    Rebuild a file from its basis and a delta stream.
+
+    With no output_path the basis is patched in place, which is only valid
+    for plans where plan_is_in_place() holds. Otherwise the result is
+    written to output_path, copying unchanged blocks from the basis.
+
+    Returns:
+        int: Number of literal bytes read from the stream
+    """
+    literal_bytes = 0
+    in_place = output_path is None
+    with open(basis_path, 'r+b' if in_place else 'rb') as basis:
+        target = basis if in_place else open(output_path, 'wb')
+        try:
+            offset = 0
+            while True:
+                op = _read_exact(stream, 1)
+                if op == b'E':
+                    break
+                if op == b'C':
+                    first_block, count = COPY_OP.unpack(_read_exact(stream, COPY_OP.size))
+                    length = count * block_size
+                    if not in_place:
+                        basis.seek(first_block * block_size)
+                        remaining = length
+                        while remaining > 0:
+                            chunk = basis.read(min(DATA_CHUNK_SIZE, remaining))
+                            if not chunk:
+                                raise IOError("Basis file is shorter than its signature")
+                            target.write(chunk)
+                            remaining -= len(chunk)
+                    offset += length
+                elif op == b'D':
+                    (length,) = DATA_OP.unpack(_read_exact(stream, DATA_OP.size))
+                    target.seek(offset)
+                    remaining = length
+                    while remaining > 0:
+                        chunk = _read_exact(stream, min(DATA_CHUNK_SIZE, remaining))
+                        target.write(chunk)
+                        remaining -= len(chunk)
+                    offset += length
+                    literal_bytes += length
+                else:
+                    raise IOError(f"Unknown delta operation {op!r}")
+            if offset != target_size:
+                raise IOError(f"Delta produced {offset} bytes, expected {target_size}")
+            target.truncate(target_size)
+        finally:
+            if not in_place:
+                target.close()
+    return literal_bytes
+
+def _write_random_file(path: str, size: int):
+    with open(path, 'wb') as f:
+        remaining = size
+        while remaining > 0:
+            chunk = min(64 * 1024 * 1024, remaining)
+            f.write(os.urandom(chunk))
+            remaining -= chunk
+
+def benchmark(size_mb: int, block_size: int):
+    """
+    Measure bytes transferred by delta sync for small edits to a large file.
+
+    Each scenario edits a copy of a random file, then runs signature,
+    plan and apply exactly as receive.py and serve.py would.
+    """
+    size = size_mb * 1024 * 1024
+    scenarios = [
+        ("append 1 MiB", lambda f: (f.seek(0, 2), f.write(os.urandom(1024 * 1024)))),
+        ("overwrite 4 KiB in the middle", lambda f: (f.seek(size // 2), f.write(os.urandom(4096)))),
+        ("overwrite 64 B at 10 places", lambda f: [(f.seek(i * size // 10), f.write(os.urandom(64))) for i in range(10)]),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        basis = os.path.join(tmp, 'basis.bin')
+        print(f"Creating {size_mb} MiB test file...")
+        _write_random_file(basis, size)
+
+        print(f"{'Scenario':<32} {'Signature':>12} {'Delta':>14} {'Full file':>14} {'Saved':>8} {'Time':>8}")
+        for name, edit in scenarios + [("insert 100 B at 10%", None)]:
+            changed = os.path.join(tmp, 'changed.bin')
+            if edit is None:
+                with open(basis, 'rb') as src, open(changed, 'wb') as dst:
+                    head = src.read(size // 10)
+                    dst.write(head)
+                    dst.write(os.urandom(100))
+                    while True:
+                        chunk = src.read(64 * 1024 * 1024)
+                        if not chunk:
+                            break
+                        dst.write(chunk)
+            else:
+                with open(basis, 'rb') as src, open(changed, 'wb') as dst:
+                    while True:
+                        chunk = src.read(64 * 1024 * 1024)
+                        if not chunk:
+                            break
+                        dst.write(chunk)
+                with open(changed, 'r+b') as f:
+                    edit(f)
+
+            start = time.time()
+            signature_bytes = compute_signature(basis, block_size)
+            ops = generate_plan(changed, Signature(signature_bytes))
+            delta_path = os.path.join(tmp, 'delta.bin')
+            with open(delta_path, 'wb') as out:
+                for part in encode_delta(changed, ops):
+                    out.write(part)
+            rebuilt = os.path.join(tmp, 'rebuilt.bin')
+            with open(delta_path, 'rb') as stream:
+                apply_delta(basis, stream, block_size, os.path.getsize(changed), rebuilt)
+            elapsed = time.time() - start
+
+            if hash_file(rebuilt) != hash_file(changed):
+                print(f"{name}: reconstruction mismatch")
+                sys.exit(1)
+
+            sig_size = len(signature_bytes)
+            delta_size = os.path.getsize(delta_path)
+            full_size = os.path.getsize(changed)
+            saved = 1 - (sig_size + delta_size) / full_size
+            print(f"{name:<32} {sig_size:>12,} {delta_size:>14,} {full_size:>14,} {saved:>7.2%} {elapsed:>7.2f}s")
+
+def main():
+    """Command-line benchmark for delta transfer."""
+    parser = argparse.ArgumentParser(description="Benchmark block-level delta transfer")
+    parser.add_argument('--size-mb', type=int, default=1024, help="Size of the test file in MiB (default: 1024)")
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE // 1024, help="Block size in KiB")
+    args = parser.parse_args()
+    benchmark(args.size_mb, args.block_size * 1024)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import hashlib
+import os
+import queue
+import threading
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from hashing import HASH_ALGORITHM, HashCache, hash_file
+from source_watcher import SourceWatcher
+
+PARTIAL_HASH_BYTES = 64 * 1024
+DUPLICATE_ACTIONS = ('keep', 'skip', 'link')
+
+FileKey = Tuple[str, str]  # (dir_name, relative_path)
+
+
+class DuplicateIndex:
+    """
+    Byte-identical file detection across gallery sources.
+
+    Files are bucketed by size from each source's SourceWatcher; only files
+    sharing a size are partially hashed (first 64 KiB), and only files sharing
+    size and partial hash get a full content hash from the source's HashCache
+    (background pool, .hashes.json sidecar keyed on size+mtime). A background
+    thread re-verifies a size bucket whenever a file joins it.
+    """
+
+    def __init__(self, sources: List[Tuple[str, SourceWatcher, HashCache]]):
+        self._watchers: Dict[str, SourceWatcher] = {}
+        self._hash_caches: Dict[str, HashCache] = {}
+        self._stamps: Dict[FileKey, Tuple[int, float]] = {}
+        self._by_size: Dict[int, Set[FileKey]] = {}
+        self._partials: Dict[FileKey, Tuple[Tuple[int, float], str]] = {}
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[int]" = queue.Queue()
+        self._queued: Set[int] = set()
+        for dir_name, watcher, hash_cache in sources:
+            self._watchers[dir_name] = watcher
+            self._hash_caches[dir_name] = hash_cache
+            watcher.add_listener(self._make_listener(dir_name))
+
+    def start(self):
+        """Load every source's files and verify colliding sizes in the background."""
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        for dir_name, watcher in self._watchers.items():
+            watcher.wait_ready()
+            # Snapshot before taking our lock: listeners hold the watcher lock while taking ours
+            files = watcher.snapshot()
+            with self._lock:
+                for path, stamp in files.items():
+                    self._add_unsafe((dir_name, path), stamp)
+        with self._lock:
+            sizes = [size for size, keys in self._by_size.items() if len(keys) > 1]
+            for size in sizes:
+                self._enqueue_unsafe(size)
+        while True:
+            size = self._queue.get()
+            with self._lock:
+                self._queued.discard(size)
+            self._verify_size(size)
+
+    # ─── Maintenance ─────────────────────────────────────────
+
+    def _make_listener(self, dir_name: str):
+        def listener(event: str, relative_path: str, previous_path: Optional[str]):
+            key = (dir_name, relative_path)
+            hash_cache = self._hash_caches[dir_name]
+            with self._lock:
+                if event == 'deleted':
+                    self._remove_unsafe(key)
+                    hash_cache.forget(relative_path)
+                    return
+                if event == 'moved':
+                    self._remove_unsafe((dir_name, previous_path))
+                    hash_cache.rename(previous_path, relative_path)
+                stamp = self._watchers[dir_name].get_entry(relative_path)
+                if stamp is None:
+                    return
+                self._remove_unsafe(key)
+                if self._add_unsafe(key, stamp):
+                    self._enqueue_unsafe(stamp[0])
+        return listener
+
+    def _enqueue_unsafe(self, size: int):
+        if size not in self._queued:
+            self._queued.add(size)
+            self._queue.put(size)
+
+    def _add_unsafe(self, key: FileKey, stamp: Tuple[int, float]) -> bool:
+        """Track a file; returns True if its size now collides with another file."""
+        self._stamps[key] = stamp
+        bucket = self._by_size.setdefault(stamp[0], set())
+        bucket.add(key)
+        return len(bucket) > 1
+
+    def _remove_unsafe(self, key: FileKey):
+        stamp = self._stamps.pop(key, None)
+        if stamp is None:
+            return
+        self._partials.pop(key, None)
+        bucket = self._by_size.get(stamp[0])
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._by_size[stamp[0]]
+
+    def _full_path(self, key: FileKey) -> str:
+        return os.path.join(self._watchers[key[0]].directory, key[1])
+
+    def _partial_hash(self, key: FileKey, stamp: Tuple[int, float]) -> Optional[str]:
+        with self._lock:
+            cached = self._partials.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        try:
+            digest = hash_file(self._full_path(key), limit=PARTIAL_HASH_BYTES)
+        except OSError:
+            return None
+        with self._lock:
+            if self._stamps.get(key) == stamp:
+                self._partials[key] = (stamp, digest)
+        return digest
+
+    def _candidates(self, size: int) -> List[Tuple[FileKey, Tuple[int, float]]]:
+        with self._lock:
+            return [(key, self._stamps[key]) for key in self._by_size.get(size, ())]
+
+    def _verify_size(self, size: int):
+        """Partial-hash a size bucket and queue full hashes for partial collisions."""
+        if size == 0:
+            return
+        by_partial: Dict[str, List[Tuple[FileKey, Tuple[int, float]]]] = {}
+        for key, stamp in self._candidates(size):
+            partial = self._partial_hash(key, stamp)
+            if partial is not None:
+                by_partial.setdefault(partial, []).append((key, stamp))
+        for members in by_partial.values():
+            if len(members) < 2:
+                continue
+            for (dir_name, path), (file_size, mtime) in members:
+                self._hash_caches[dir_name].submit(path, file_size, mtime)
+
+    # ─── Queries ─────────────────────────────────────────────
+
+    def groups(self) -> Tuple[List[Dict], int]:
+        """
+        Return (duplicate groups, files still waiting for a hash).
+
+        Never blocks on hashing: buckets that have not been verified yet are
+        queued for the background thread and counted as pending.
+        """
+        with self._lock:
+            buckets = [
+                [(key, self._stamps[key], self._partials.get(key)) for key in keys]
+                for size, keys in self._by_size.items() if size > 0 and len(keys) > 1
+            ]
+        result = []
+        pending = 0
+        for members in buckets:
+            size = members[0][1][0]
+            by_partial: Dict[str, List[Tuple[FileKey, Tuple[int, float]]]] = {}
+            unverified = 0
+            for key, stamp, partial in members:
+                if partial is None or partial[0] != stamp:
+                    unverified += 1
+                else:
+                    by_partial.setdefault(partial[1], []).append((key, stamp))
+            if unverified:
+                pending += unverified
+                with self._lock:
+                    self._enqueue_unsafe(size)
+            for candidates in by_partial.values():
+                if len(candidates) < 2:
+                    continue
+                by_digest: Dict[str, List[FileKey]] = {}
+                for (dir_name, path), (file_size, mtime) in candidates:
+                    digest = self._hash_caches[dir_name].get_cached(path, file_size, mtime)
+                    if digest is None:
+                        pending += 1
+                    else:
+                        by_digest.setdefault(digest, []).append((dir_name, path))
+                for digest, files in by_digest.items():
+                    if len(files) > 1:
+                        result.append({
+                            "size": size, HASH_ALGORITHM: digest, "files": sorted(files),
+                            "copies": self._count_copies(files)
+                        })
+        result.sort(key=lambda g: g["size"] * (g["copies"] - 1), reverse=True)
+        return result, pending
+
+    def _count_copies(self, files: List[FileKey]) -> int:
+        """Number of distinct inodes, so hardlinked duplicates are not counted as wasted space."""
+        inodes = set()
+        for key in files:
+            try:
+                stat = os.stat(self._full_path(key))
+                inodes.add((stat.st_dev, stat.st_ino))
+            except OSError:
+                continue
+        return len(inodes)
+
+    def _find_duplicate(self, size: int, head: bytes, compute_digest: Callable[[], str],
+                        exclude_path: Optional[str]) -> Optional[FileKey]:
+        # Excluded by resolved path: one file can be indexed under another source's name
+        candidates = [
+            (key, stamp) for key, stamp in self._candidates(size)
+            if exclude_path is None or os.path.realpath(self._full_path(key)) != exclude_path
+        ]
+        if not candidates or size == 0:
+            return None
+        partial = hashlib.new(HASH_ALGORITHM, head[:PARTIAL_HASH_BYTES]).hexdigest()
+        candidates = [(key, stamp) for key, stamp in candidates if self._partial_hash(key, stamp) == partial]
+        if not candidates:
+            return None
+        digest = compute_digest()
+        for (dir_name, path), (file_size, mtime) in candidates:
+            try:
+                if self._hash_caches[dir_name].submit(path, file_size, mtime).result() == digest:
+                    return dir_name, path
+            except OSError:
+                continue
+        return None
+
+    def find_duplicate_of_file(self, file_path: str) -> Optional[FileKey]:
+        """
+        Return another existing file with the same bytes as file_path, hashing
+        only on a size+prefix match. file_path itself is never returned, under
+        whichever source it is indexed.
+        """
+        try:
+            size = os.path.getsize(file_path)
+            with open(file_path, 'rb') as f:
+                head = f.read(PARTIAL_HASH_BYTES)
+        except OSError:
+            return None
+        return self._find_duplicate(size, head, lambda: hash_file(file_path), os.path.realpath(file_path))
+
+    def find_duplicate_of_bytes(self, data: bytes) -> Optional[FileKey]:
+        """Return an existing file with exactly these bytes."""
+        return self._find_duplicate(len(data), data, lambda: hashlib.new(HASH_ALGORITHM, data).hexdigest(), None)
+
+    def get_file_path(self, key: FileKey) -> str:
+        return self._full_path(key)
+
+
+def hardlink_duplicate(existing_path: str, target_path: str) -> bool:
+    """
+    Make target_path a hardlink to an existing identical file.
+
+    The link is created beside the target and swapped in with os.replace, so
+    an existing target is only replaced once the link exists. Returns False
+    (leaving the target untouched) if linking is unsupported, e.g. across devices.
+    """
+    temp_path = target_path + '.link'
+    try:
+        os.link(existing_path, temp_path)
+        os.replace(temp_path, target_path)
+        return True
+    except OSError as e:
+        print(f"Error hardlinking {target_path} to {existing_path}: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False
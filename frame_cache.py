@@ -0,0 +1,35 @@
+import threading
+from typing import Dict, Hashable, Optional, Set, Tuple
+
+# (source dir name, relative path) of the file an entry was rendered from
+FileKey = Tuple[str, str]
+
+
+class FrameCache:
+    """
+    In-memory cache of rendered frames, indexed by the file each came from.
+
+    Entries are keyed by whatever distinguishes renders of one file (frame,
+    cache-buster); a reverse index from file to its entry keys lets a move
+    or delete drop every render of a file without scanning the whole cache.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Tuple[FileKey, Hashable], bytes] = {}
+        self._keys_by_file: Dict[FileKey, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, file_key: FileKey, render_key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            return self._entries.get((file_key, render_key))
+
+    def put(self, file_key: FileKey, render_key: Hashable, data: bytes):
+        with self._lock:
+            self._entries[(file_key, render_key)] = data
+            self._keys_by_file.setdefault(file_key, set()).add(render_key)
+
+    def invalidate(self, file_key: FileKey):
+        """Drop every render of one file."""
+        with self._lock:
+            for render_key in self._keys_by_file.pop(file_key, ()):
+                self._entries.pop((file_key, render_key), None)
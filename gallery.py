@@ -1,30 +1,51 @@
 import os
 import sys
 import re
-import shutil
 from flask import Flask, send_from_directory, jsonify, render_template, abort, request, Response, send_file
 from werkzeug.utils import secure_filename
 import io
-from PIL import Image
-import cv2
-import numpy as np
 import argparse
 import zipfile
+import json
+import time
 from datetime import datetime
 from typing import Dict
 from gallery_source import FilesystemGallerySource, GallerySource
-from mp4 import extract_mp4_first_frame
+from media_metadata import extract_media_metadata
+from source_watcher import SourceWatcher
+from search_index import SearchIndex, summarize_metadata
+from hashing import HashCache, HASH_ALGORITHM
+from duplicates import DuplicateIndex, DUPLICATE_ACTIONS, hardlink_duplicate
+from similarity import SimilarityIndex, find_clusters, DEFAULT_MAX_DISTANCE, DEFAULT_CLUSTER_DISTANCE
+from media_table import MediaTable
+from change_feed import ChangeFeed
+from latest_files import LatestFiles
+from previews import PreviewCache
+from sprites import SpriteSheets
+from chunked_upload import ChunkedUploads, UploadError
+from ingest import IngestIndex
+from frame_cache import FrameCache
+from batch_move import plan_moves, execute_moves
+from trash import Trash
 
 # Parse command-line arguments
 parser = argparse.ArgumentParser(description="RunPodTools Media Gallery")
 parser.add_argument("gallery_dir", help="Path to the gallery folder")
 parser.add_argument("-u", "--upload_dir", help="Path to the alternate upload directory", default=None)
 parser.add_argument("-a", "--archive_dir", help="Path to the archive target directory", default=None)
+parser.add_argument("--on-duplicate", choices=DUPLICATE_ACTIONS, default="keep",
+                    help="What to do with uploaded/extracted files identical to an existing file")
+parser.add_argument("--cache-dir", default=os.path.join(os.path.expanduser("~"), ".cache", "runpodtools"),
+                    help="Where generated previews are kept (outside the gallery so they are not listed as media)")
+parser.add_argument("--ffprobe", action="store_true",
+                    help="Ask ffprobe for MP4 tags when the built-in reader finds no workflow in a file")
+parser.add_argument("--port", type=int, default=3137, help="Port to serve on (default: 3137)")
 args = parser.parse_args()
 
 gallery_dir = os.path.abspath(args.gallery_dir)
 upload_dir = os.path.abspath(args.upload_dir) if args.upload_dir else gallery_dir
 archive_dir = os.path.abspath(args.archive_dir) if args.archive_dir else gallery_dir
+cache_dir = os.path.abspath(args.cache_dir)
 
 # Initialize gallery sources - one for each directory
 try:
@@ -35,13 +56,49 @@ except ValueError as e:
     print(f"Error: {e}")
     sys.exit(1)
 
+# Live file views and prompt search indexes (shared when uploads go to the gallery dir)
+gallery_watcher = SourceWatcher(gallery_dir, gallery_source.allowed_extensions)
+uploads_watcher = gallery_watcher if upload_dir == gallery_dir else SourceWatcher(upload_dir, uploads_source.allowed_extensions)
+gallery_search = SearchIndex(gallery_watcher)
+uploads_search = gallery_search if uploads_watcher is gallery_watcher else SearchIndex(uploads_watcher)
+gallery_similarity = SimilarityIndex(gallery_watcher)
+uploads_similarity = gallery_similarity if uploads_watcher is gallery_watcher else SimilarityIndex(uploads_watcher)
+gallery_hashes = HashCache(gallery_dir)
+uploads_hashes = gallery_hashes if uploads_watcher is gallery_watcher else HashCache(upload_dir)
+duplicate_index = DuplicateIndex(
+    [("gallery", gallery_watcher, gallery_hashes)] +
+    ([("uploads", uploads_watcher, uploads_hashes)] if uploads_watcher is not gallery_watcher else [])
+)
+gallery_latest = LatestFiles(gallery_watcher)
+uploads_latest = gallery_latest if uploads_watcher is gallery_watcher else LatestFiles(uploads_watcher)
+gallery_previews = PreviewCache(gallery_watcher, cache_dir)
+uploads_previews = gallery_previews if uploads_watcher is gallery_watcher else PreviewCache(uploads_watcher, cache_dir)
+sprite_sheets = SpriteSheets(cache_dir)
+gallery_ingest = IngestIndex(gallery_watcher, cache_dir, gallery_hashes, include_ffprobe=args.ffprobe)
+uploads_ingest = gallery_ingest if uploads_watcher is gallery_watcher else IngestIndex(
+    uploads_watcher, cache_dir, uploads_hashes, include_ffprobe=args.ffprobe
+)
+gallery_source.media_info_provider = gallery_ingest.get_media_info
+uploads_source.media_info_provider = uploads_ingest.get_media_info
+chunked_uploads = ChunkedUploads(upload_dir)
+# One trash per directory tree, so a purge never races a delete into the same folder
+trashes = {directory: Trash(directory) for directory in {gallery_dir, upload_dir, archive_dir}}
+# One table per source even when the watcher is shared: each source has its own ratings/tags managers
+gallery_table = MediaTable(gallery_watcher, gallery_source.ratings_manager, gallery_source.tags_manager)
+uploads_table = MediaTable(uploads_watcher, uploads_source.ratings_manager, uploads_source.tags_manager)
+
 # Constants
 FILES_PER_PAGE = 12
+MAX_SEARCH_PAGE_SIZE = 200
+MAX_SIMILAR_RESULTS = 500
+MAX_TAG_SUGGESTIONS = 100
+DEFAULT_LATEST_FILES = 50
+# Prefix for version-counter ETags, which start over when the server restarts
+ETAG_EPOCH = f"{time.time_ns():x}"
 ALLOWED_EXTENSIONS = {'webp', 'jpg', 'jpeg', 'png', 'mp4', 'mp3'}
 
-# Static frame cache
-static_frame_cache:Dict[str, bytes] = {}
-video_thumbnail_cache:Dict[str, bytes] = {}
+# Rendered first/last frames of animated WebPs
+static_frames = FrameCache()
 
 app = Flask(__name__)
 
@@ -64,11 +121,14 @@ def static_frame(dir_name, filename):
     if not source.file_exists(filename):
         abort(404)
 
-    cache_key = f"{filename}_{frame_type}_{cache_bust}"
-    
-    if cache_key in static_frame_cache:
-        return Response(static_frame_cache[cache_key], mimetype='image/png')
+    file_key = (dir_name, filename)
+    render_key = (frame_type, cache_bust)
+    cached = static_frames.get(file_key, render_key)
+    if cached is not None:
+        return Response(cached, mimetype='image/png')
     
+    from PIL import Image
+
     try:
         full_path = source.get_file_path(filename)
         with Image.open(full_path) as img:
@@ -81,7 +141,7 @@ def static_frame(dir_name, filename):
             output.seek(0)
             
             frame_data = output.getvalue()
-            static_frame_cache[cache_key] = frame_data
+            static_frames.put(file_key, render_key, frame_data)
             
             return Response(frame_data, mimetype='image/png')
     except Exception as e:
@@ -101,23 +161,60 @@ def video_thumbnail(dir, filename):
     if not source.file_exists(filename) or not filename.lower().endswith('.mp4'):
         abort(404)
 
-    cache_key = f"{dir}/{filename}"
-    if cache_key in video_thumbnail_cache:
-        return Response(video_thumbnail_cache[cache_key], mimetype='image/png')
+    thumbnail_path = get_ingest_index(dir).get_thumbnail(filename)
+    if thumbnail_path is None:
+        abort(500)
+    return send_file(thumbnail_path, mimetype='image/png')
+
 
-    full_path = source.get_file_path(filename)
-    frame = extract_mp4_first_frame(full_path)
-    if frame is None:
+@app.route("/preview/<dir_name>/<path:filename>")
+def preview(dir_name, filename):
+    """Serve a small, low-framerate animated WebP of an animated WebP or MP4 for grid hover playback"""
+    previews = {"gallery": gallery_previews, "uploads": uploads_previews}.get(dir_name)
+    if previews is None:
+        abort(400)
+    try:
+        preview_path = previews.get_preview(filename)
+    except Exception as e:
+        print(f"Error rendering preview for {filename}: {e}")
         abort(500)
+    if preview_path is None:
+        abort(404)
+    return send_file(preview_path, mimetype='image/webp')
 
-    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    pil_img = Image.fromarray(rgb_frame)
-    output = io.BytesIO()
-    pil_img.save(output, format='PNG')
-    output.seek(0)
-    frame_data = output.getvalue()
-    video_thumbnail_cache[cache_key] = frame_data
-    return Response(frame_data, mimetype='image/png')
+_SPRITE_KEY = re.compile(r'^[0-9a-f]{40}$')
+
+@app.route("/sprite/<string:key>.webp")
+def sprite(key):
+    """Serve a page's thumbnail sprite sheet, laid out by the /images or /search response that named it"""
+    if not _SPRITE_KEY.match(key):
+        abort(404)
+    try:
+        sheet_path = sprite_sheets.get_sheet(key)
+    except Exception as e:
+        print(f"Error composing sprite sheet {key}: {e}")
+        abort(500)
+    if sheet_path is None:
+        abort(404)
+    # The key covers every file's size and mtime, so a sheet never changes
+    return send_file(sheet_path, mimetype='image/webp', max_age=31536000)
+
+def page_sprite(dir_name: str, files_metadata):
+    """Sprite sheet layout for a page of /images or /search results, with its URL; None if nothing fits."""
+    watcher = {"gallery": gallery_watcher, "uploads": uploads_watcher}.get(dir_name)
+    if watcher is None:
+        return None
+    files = []
+    for file in files_metadata:
+        entry = watcher.get_entry(file["name"])
+        width, _, height = file.get("resolution", "").partition("x")
+        if entry is not None and width.isdigit() and height.isdigit():
+            files.append((file["name"], entry[0], entry[1], int(width), int(height)))
+    layout = sprite_sheets.layout(watcher.directory, files)
+    if layout is None:
+        return None
+    layout["url"] = f"/sprite/{layout.pop('key')}.webp"
+    return layout
 
 
 @app.route("/")
@@ -135,12 +232,62 @@ def get_source_for_directory(dir_name: str) -> GallerySource:
     else:
         return gallery_source  # default
 
+def get_ingest_index(dir_name: str):
+    return {"gallery": gallery_ingest, "uploads": uploads_ingest}.get(dir_name)
+
+def get_media_table(dir_name: str):
+    """Return the source's MediaTable once it covers every file, else None (archives have none)."""
+    table = {"gallery": gallery_table, "uploads": uploads_table}.get(dir_name)
+    return table if table is not None and table.ready else None
+
+def conditional_json(etag: str, build):
+    """
+    Respond with jsonify(build()) tagged with etag, or with an empty 304 if the
+    client's If-None-Match already holds it, in which case build() never runs.
+    """
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+def describe_file(dir_name: str, relative_path: str):
+    """/images-style metadata for one file, or None if it no longer exists."""
+    source = get_source_for_directory(dir_name)
+    if not source.file_exists(relative_path):
+        return None
+    try:
+        return source.get_file_metadata(relative_path)
+    except OSError:
+        return None
+
+change_feed = ChangeFeed(describe_file)
+change_feed.add_source("gallery", gallery_watcher, gallery_source.ratings_manager, gallery_source.tags_manager)
+change_feed.add_source("uploads", uploads_watcher, uploads_source.ratings_manager, uploads_source.tags_manager)
+
+@app.route("/events")
+def change_events():
+    """Server-sent events: created/deleted/moved/metadata-changed for the gallery and uploads sources."""
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    return Response(change_feed.stream(last_event_id), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.route("/dirs")
 def list_dirs():
     dir_name = request.args.get("dir", "gallery")
     source = get_source_for_directory(dir_name)
     tree = source.list_dir_tree()
-    return jsonify({"tree": tree})
+    # Empty directories never reach the watcher, so the tree is versioned by its own content
+    response = jsonify({"tree": tree})
+    response.add_etag()
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
 
 _INVALID_DIR_CHARS = re.compile(r'[/\\:*?"<>|]')
 
@@ -166,18 +313,27 @@ def make_dir():
 def list_tags():
     dir_name = request.args.get("dir", "gallery")
     subpath = request.args.get("subpath", "")
+    recursive = request.args.get("recursive", "false") == "true"
     tag_filter_param = request.args.get("tag_filter", "")
     source = get_source_for_directory(dir_name)
     if not hasattr(source, 'tags_manager') or source.tags_manager is None:
         return jsonify({"tags": []})
-    all_files = source.list_files_in_dir(subpath)
+    selected_tags = {t for t in tag_filter_param.split(",") if t}
+    table = get_media_table(dir_name)
+    if table is not None:
+        def build():
+            # Every tag present below the subpath, counted among files that also carry the selected tags
+            present = table.tag_counts(subpath=subpath, recursive=recursive)
+            counts = table.tag_counts(subpath=subpath, recursive=recursive, tags_all=selected_tags)
+            return {"tags": [{"name": tag, "count": counts.get(tag, 0)} for tag in sorted(present)]}
+        return conditional_json(f"{ETAG_EPOCH}-{table.version}", build)
+    all_files = list_source_files(source, subpath, recursive)
     # Build a dict of filename -> tag set once
     file_tags = {f: set(source.tags_manager.get_tags(f)) for f in all_files}
     # Collect every tag that exists in this directory
     all_tag_set = set()
     for tags in file_tags.values():
         all_tag_set.update(tags)
-    selected_tags = {t for t in tag_filter_param.split(",") if t}
     # For each tag, count files where selected_tags | {tag} ⊆ file_tags
     result = []
     for tag in sorted(all_tag_set):
@@ -186,44 +342,124 @@ def list_tags():
         result.append({"name": tag, "count": count})
     return jsonify({"tags": result})
 
+def library_tag_managers():
+    """The gallery's and uploads' TagsManagers; one when uploads share the gallery directory."""
+    managers = [gallery_source.tags_manager]
+    if uploads_source.directory != gallery_source.directory:
+        managers.append(uploads_source.tags_manager)
+    return managers
+
+def merge_library_tags(tags, target: str):
+    """Merge tags into target across the library; returns a /tags/rename-style response."""
+    changed = 0
+    failed = False
+    for manager in library_tag_managers():
+        saved, count = manager.merge_tags(tags, target)
+        changed += count
+        failed |= not saved
+    if failed:
+        return jsonify({"success": False, "message": "Failed to save tags", "files": changed}), 500
+    return jsonify({"success": True, "message": f"Updated {changed} file(s)", "files": changed}), 200
+
+@app.route("/tags/rename", methods=["POST"])
+def rename_tag():
+    """Rename a tag on every file in the gallery and uploads ({"from", "to"}); an existing "to" merges."""
+    data = request.json or {}
+    old_tag, new_tag = data.get("from", ""), data.get("to", "")
+    if not isinstance(old_tag, str) or not isinstance(new_tag, str) or not old_tag or not new_tag:
+        return jsonify({"success": False, "message": "Both 'from' and 'to' tags are required"}), 400
+    return merge_library_tags([old_tag], new_tag)
+
+@app.route("/tags/merge", methods=["POST"])
+def merge_tags():
+    """Replace several tags with one on every file in the gallery and uploads ({"tags": [...], "into"})."""
+    data = request.json or {}
+    tags, target = data.get("tags", []), data.get("into", "")
+    if not isinstance(tags, list) or not all(isinstance(t, str) and t for t in tags) or not tags:
+        return jsonify({"success": False, "message": "No tags to merge provided"}), 400
+    if not isinstance(target, str) or not target:
+        return jsonify({"success": False, "message": "No target tag provided"}), 400
+    return merge_library_tags(tags, target)
+
+@app.route("/tags/delete", methods=["POST"])
+def delete_tag():
+    """Remove a tag from every file in the gallery and uploads ({"tag"})."""
+    data = request.json or {}
+    tag = data.get("tag", "")
+    if not isinstance(tag, str) or not tag:
+        return jsonify({"success": False, "message": "No tag provided"}), 400
+    changed = 0
+    failed = False
+    for manager in library_tag_managers():
+        saved, count = manager.delete_tag(tag)
+        changed += count
+        failed |= not saved
+    if failed:
+        return jsonify({"success": False, "message": "Failed to save tags", "files": changed}), 500
+    return jsonify({"success": True, "message": f"Removed '{tag}' from {changed} file(s)", "files": changed}), 200
+
+@app.route("/tags/suggest")
+def suggest_tags():
+    """Library-wide tags starting with ?prefix=, most used first, for autocomplete."""
+    prefix = request.args.get("prefix", "")
+    limit = min(max(request.args.get("limit", 10, type=int), 1), MAX_TAG_SUGGESTIONS)
+    counts: Dict[str, int] = {}
+    for manager in library_tag_managers():
+        for tag, count in manager.suggest(prefix):
+            counts[tag] = counts.get(tag, 0) + count
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    return jsonify({"tags": [{"name": tag, "count": count} for tag, count in ranked]})
+
 @app.route("/extensions")
 def list_extensions():
     dir_name = request.args.get("dir", "gallery")
     subpath = request.args.get("subpath", "")
+    recursive = request.args.get("recursive", "false") == "true"
     source = get_source_for_directory(dir_name)
-    counts = source.list_extensions_in_dir(subpath)
-    result = sorted(
+    table = get_media_table(dir_name)
+    if table is not None:
+        return conditional_json(
+            f"{ETAG_EPOCH}-{table.version}",
+            lambda: {"extensions": sort_extension_counts(table.extension_counts(subpath=subpath, recursive=recursive))}
+        )
+    if recursive:
+        counts = {}
+        for f in list_source_files(source, subpath, recursive):
+            ext = os.path.splitext(f)[1].lower()
+            if ext:
+                counts[ext] = counts.get(ext, 0) + 1
+    else:
+        counts = source.list_extensions_in_dir(subpath)
+    return jsonify({"extensions": sort_extension_counts(counts)})
+
+def sort_extension_counts(counts: Dict[str, int]):
+    return sorted(
         [{"ext": ext, "count": count} for ext, count in counts.items()],
         key=lambda x: x["count"],
         reverse=True
     )
-    return jsonify({"extensions": result})
-
-@app.route("/images")
-def list_images():
-    dir_name = request.args.get("dir", "gallery")
-    page = int(request.args.get("page", 0))
-    sort_by = request.args.get("sort_by", "date")
-    sort_dir = request.args.get("sort_dir", "asc")
-    subpath = request.args.get("subpath", "")
-    rating_filter = request.args.get("rating_filter", "all")
-    tag_filter_param = request.args.get("tag_filter", "")
-    ext_filter = request.args.get("ext_filter", "")
 
-    source = get_source_for_directory(dir_name)
-    all_files = source.list_files_in_dir(subpath)
+def list_source_files(source: GallerySource, subpath: str, recursive: bool):
+    """Directory-scan fallback used while the media table is still loading."""
+    if not recursive:
+        return source.list_files_in_dir(subpath)
+    prefix = subpath.strip("/")
+    files = [f.replace(os.sep, "/") for f in source.list_files()]
+    return [f for f in files if not prefix or f.startswith(prefix + "/")]
 
+def filter_files(source: GallerySource, files, ext_filter: str, rating_filter: str, tag_filter_param: str):
+    """Apply the extension, rating and tag filters shared by /images and /search."""
     # Filter by extension if specified
     if ext_filter:
-        all_files = [f for f in all_files if os.path.splitext(f)[1].lower() == ext_filter.lower()]
+        files = [f for f in files if os.path.splitext(f)[1].lower() == ext_filter.lower()]
 
     # Filter by rating if specified
     if rating_filter != "all":
         try:
             target_rating = int(rating_filter)
             if source.ratings_manager:
-                all_files = [f for f in all_files 
-                           if source.ratings_manager.get_rating(f) == target_rating]
+                files = [f for f in files
+                         if source.ratings_manager.get_rating(f) == target_rating]
         except (ValueError, TypeError):
             pass  # Invalid rating filter, ignore
 
@@ -231,28 +467,252 @@ def list_images():
     if tag_filter_param and hasattr(source, 'tags_manager') and source.tags_manager is not None:
         required_tags = {t for t in tag_filter_param.split(",") if t}
         if required_tags:
-            all_files = [f for f in all_files
-                         if required_tags <= set(source.tags_manager.get_tags(f))]
-    
-    # Sorting logic
-    def sort_key(file):
-        if sort_by == "filename":
-            return file.lower()
-        elif sort_by == "size":
-            return source.get_file_size(file)
-        elif sort_by == "date":
-            return source.get_file_mtime(file)
-        return source.get_file_mtime(file)
+            files = [f for f in files
+                     if required_tags <= set(source.tags_manager.get_tags(f))]
+    return files
+
+def parse_table_filters(args) -> Dict:
+    """
+    Translate /images query parameters into MediaTable.query filters.
+
+    rating_filter, tag_filter and ext_filter keep their original meaning (exact
+    rating, all tags, extension - now also a comma list); rating_min/rating_max,
+    tag_any, tag_not, min_/max_width, min_/max_height and min_/max_duration
+    (seconds) are only available through the table.
+    """
+    def split(name):
+        return [v for v in args.get(name, "").split(",") if v]
+
+    def number(name, convert=int):
+        try:
+            return convert(args[name]) if args.get(name, "") != "" else None
+        except ValueError:
+            return None
+
+    rating_filter = args.get("rating_filter", "all")
+    return {
+        "extensions": split("ext_filter"),
+        "rating": number("rating_filter") if rating_filter != "all" else None,
+        "rating_min": number("rating_min"),
+        "rating_max": number("rating_max"),
+        "tags_all": split("tag_filter"),
+        "tags_any": split("tag_any"),
+        "tags_none": split("tag_not"),
+        "min_width": number("min_width"),
+        "max_width": number("max_width"),
+        "min_height": number("min_height"),
+        "max_height": number("max_height"),
+        "min_duration": number("min_duration", float),
+        "max_duration": number("max_duration", float),
+    }
 
+@app.route("/images")
+def list_images():
+    dir_name = request.args.get("dir", "gallery")
+    page = int(request.args.get("page", 0))
+    sort_by = request.args.get("sort_by", "date")
+    sort_dir = request.args.get("sort_dir", "asc")
+    subpath = request.args.get("subpath", "")
+    rating_filter = request.args.get("rating_filter", "all")
+    tag_filter_param = request.args.get("tag_filter", "")
+    ext_filter = request.args.get("ext_filter", "")
+    recursive = request.args.get("recursive", "false") == "true"
+
+    source = get_source_for_directory(dir_name)
     reverse = sort_dir == "desc"
-    all_files = sorted(all_files, key=sort_key, reverse=reverse)
+    table = get_media_table(dir_name)
+    if table is not None:
+        all_files = table.query(sort_by=sort_by, reverse=reverse, subpath=subpath, recursive=recursive,
+                                **parse_table_filters(request.args))
+    else:
+        # Table still loading (or archive source): scan the directory
+        all_files = list_source_files(source, subpath, recursive)
+
+        all_files = filter_files(source, all_files, ext_filter, rating_filter, tag_filter_param)
+
+        # Sorting logic
+        def sort_key(file):
+            if sort_by == "filename":
+                return file.lower()
+            elif sort_by == "size":
+                return source.get_file_size(file)
+            elif sort_by == "date":
+                return source.get_file_mtime(file)
+            return source.get_file_mtime(file)
+
+        all_files = sorted(all_files, key=sort_key, reverse=reverse)
 
     start = page * FILES_PER_PAGE
     end = start + FILES_PER_PAGE
-    files_metadata = [source.get_file_metadata(file) for file in all_files[start:end]]
+    files_metadata = [source.get_file_metadata(file) for file in all_files[start:end]
+                      if source.file_exists(file)]
+
+    return jsonify({"files": files_metadata, "total": len(all_files), "sprite": page_sprite(dir_name, files_metadata)})
+
+@app.route("/latest")
+def latest_files():
+    """Newest files across all subdirectories of a source, from the watcher-maintained ring buffer."""
+    dir_name = request.args.get("dir", "gallery")
+    subpath = request.args.get("subpath", "")
+    if dir_name == "gallery":
+        source, latest = gallery_source, gallery_latest
+    elif dir_name == "uploads":
+        source, latest = uploads_source, uploads_latest
+    else:
+        return jsonify({"success": False, "message": "Invalid directory"}), 400
+    try:
+        limit = min(max(int(request.args.get("limit", DEFAULT_LATEST_FILES)), 1), latest.capacity)
+    except ValueError:
+        return jsonify({"success": False, "message": "Invalid limit"}), 400
 
+    files_metadata = [source.get_file_metadata(file) for file in latest.latest(limit, subpath)
+                      if source.file_exists(file)]
     return jsonify({"files": files_metadata})
 
+@app.route("/search")
+def search_files():
+    """Search prompt text, model/lora names and sampler settings across a whole source."""
+    dir_name = request.args.get("dir", "gallery")
+    query = request.args.get("q", "").strip()
+    page = int(request.args.get("page", 0))
+    page_size = min(int(request.args.get("page_size", FILES_PER_PAGE)), MAX_SEARCH_PAGE_SIZE)
+    sort_by = request.args.get("sort_by", "date")
+    sort_dir = request.args.get("sort_dir", "desc")
+    subpath = request.args.get("subpath", "").strip("/")
+    rating_filter = request.args.get("rating_filter", "all")
+    tag_filter_param = request.args.get("tag_filter", "")
+    ext_filter = request.args.get("ext_filter", "")
+
+    if dir_name == "gallery":
+        source, index = gallery_source, gallery_search
+    elif dir_name == "uploads":
+        source, index = uploads_source, uploads_search
+    else:
+        return jsonify({"success": False, "message": "Invalid directory"}), 400
+
+    matches = index.search(query, sort_by=sort_by, reverse=sort_dir == "desc") if query else []
+    if subpath:
+        matches = [f for f in matches if f.startswith(subpath + "/")]
+    matches = filter_files(source, matches, ext_filter, rating_filter, tag_filter_param)
+
+    start = page * page_size
+    files_metadata = [source.get_file_metadata(file) for file in matches[start:start + page_size]
+                      if source.file_exists(file)]
+
+    return jsonify({"files": files_metadata, "total": len(matches), "index": index.status(),
+                    "sprite": page_sprite(dir_name, files_metadata)})
+
+def get_similarity_indexes():
+    """(dir_name, index) for each distinct similarity index; uploads may share the gallery's."""
+    indexes = [("gallery", gallery_similarity)]
+    if uploads_similarity is not gallery_similarity:
+        indexes.append(("uploads", uploads_similarity))
+    return indexes
+
+@app.route("/similar/clusters")
+def similar_clusters():
+    """Report groups of near-duplicate files across the gallery and uploads directories."""
+    max_distance = int(request.args.get("max_distance", DEFAULT_CLUSTER_DISTANCE))
+    limit = int(request.args.get("limit", 100))
+
+    hash_sets = []
+    status = {}
+    for dir_name, index in get_similarity_indexes():
+        paths, hashes = index.snapshot()
+        hash_sets.append((dir_name, paths, hashes))
+        status[dir_name] = index.status()
+
+    clusters = find_clusters(hash_sets, max_distance)
+    return jsonify({
+        "clusters": [[{"dir": d, "name": name} for d, name in cluster] for cluster in clusters[:limit]],
+        "total_clusters": len(clusters),
+        "total_files": sum(len(cluster) for cluster in clusters),
+        "index": status
+    })
+
+@app.route("/similar/<dir_name>/<path:filename>")
+def similar_files(dir_name, filename):
+    """List files in the gallery and uploads directories that look like the given file."""
+    max_distance = max(0, min(int(request.args.get("max_distance", DEFAULT_MAX_DISTANCE)), 64))
+    limit = min(int(request.args.get("limit", 50)), MAX_SIMILAR_RESULTS)
+
+    if dir_name == "gallery":
+        source, index = gallery_source, gallery_similarity
+    elif dir_name == "uploads":
+        source, index = uploads_source, uploads_similarity
+    else:
+        return jsonify({"success": False, "message": "Invalid directory"}), 400
+    if not source.file_exists(filename):
+        return jsonify({"success": False, "message": "File not found"}), 404
+
+    value = index.get_hash(filename)
+    if value is None:
+        return jsonify({"success": False, "message": "Could not hash file"}), 500
+
+    matches = []
+    for match_dir, match_index in get_similarity_indexes():
+        match_source = get_source_for_directory(match_dir)
+        for path, distance in match_index.nearest(value, max_distance):
+            if match_index is index and path == filename:
+                continue
+            matches.append((distance, match_dir, match_source, path))
+    matches.sort(key=lambda m: (m[0], m[1], m[3]))
+
+    files = []
+    for distance, match_dir, match_source, path in matches[:limit]:
+        if not match_source.file_exists(path):
+            continue
+        file_metadata = match_source.get_file_metadata(path)
+        file_metadata["dir"] = match_dir
+        file_metadata["distance"] = distance
+        files.append(file_metadata)
+
+    return jsonify({"success": True, "hash": f"{value:016x}", "files": files, "total": len(matches)})
+
+@app.route("/duplicates")
+def list_duplicates():
+    """Report groups of byte-identical files across the gallery and uploads directories."""
+    limit = int(request.args.get("limit", 100))
+    groups, pending = duplicate_index.groups()
+    return jsonify({
+        "groups": [
+            {
+                "size_bytes": group["size"],
+                HASH_ALGORITHM: group[HASH_ALGORITHM],
+                "copies": group["copies"],
+                "files": [{"dir": d, "name": name} for d, name in group["files"]]
+            }
+            for group in groups[:limit]
+        ],
+        "total_groups": len(groups),
+        "wasted_bytes": sum(group["size"] * max(group["copies"] - 1, 0) for group in groups),
+        "pending": pending
+    })
+
+def apply_duplicate_policy(source: GallerySource, relative_path: str, action: str):
+    """
+    Skip or hardlink a newly written file that duplicates an existing one.
+
+    Returns a status message if the policy was applied, otherwise None.
+    """
+    if action not in ("skip", "link"):
+        return None
+    full_path = source.get_file_path(relative_path)
+    existing = duplicate_index.find_duplicate_of_file(full_path)
+    if existing is None:
+        return None
+    existing_path = duplicate_index.get_file_path(existing)
+    # Never let a file stand in as its own duplicate: removing it would delete the only copy
+    if os.path.realpath(existing_path) == os.path.realpath(full_path):
+        return None
+    existing_name = f"{existing[0]}/{existing[1]}"
+    if action == "link" and hardlink_duplicate(existing_path, full_path):
+        return f"'{relative_path}' is identical to '{existing_name}'; stored as a hardlink"
+    if action == "skip":
+        os.remove(full_path)
+        return f"'{relative_path}' is identical to '{existing_name}'; skipped"
+    return None
+
 @app.route("/gallery/<path:filename>")
 def gallery_file(filename):
     if not gallery_source.file_exists(filename):
@@ -275,12 +735,84 @@ def upload_file():
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
         subdir = request.form.get("subdir", "")
+        on_duplicate = request.form.get("on_duplicate", args.on_duplicate)
         if uploads_source.save_file(filename, file, subdir):
+            relative_path = os.path.relpath(
+                os.path.join(uploads_source._resolve_subpath(subdir), filename), upload_dir
+            ).replace(os.sep, '/')
+            uploads_ingest.submit(relative_path)
+            duplicate_message = apply_duplicate_policy(uploads_source, relative_path, on_duplicate)
+            if duplicate_message:
+                return jsonify({"message": duplicate_message, "duplicate": True}), 200
             return jsonify({"message": f"File '{filename}' uploaded successfully"}), 200
         else:
             return jsonify({"message": "Invalid upload directory"}), 400
     return jsonify({"message": "Invalid file type"}), 400
 
+@app.route("/upload/init", methods=["POST"])
+def init_chunked_upload():
+    """
+    Start or resume a chunked upload.
+
+    Body: {"filename", "size", "subdir", "fingerprint"}; the same file (name,
+    size and fingerprint, e.g. its last-modified time) resumes its earlier
+    session. Returns the upload id, the chunk size to split the file by and
+    the chunks already received.
+    """
+    data = request.json or {}
+    filename = secure_filename(data.get("filename", ""))
+    size = data.get("size")
+    if not filename or not allowed_file(filename):
+        return jsonify({"message": "Invalid file type"}), 400
+    if not isinstance(size, int) or size < 0:
+        return jsonify({"message": "Invalid file size"}), 400
+    target_dir = uploads_source._resolve_subpath(data.get("subdir", ""))
+    if target_dir is None:
+        return jsonify({"message": "Invalid upload directory"}), 400
+    relative_path = os.path.relpath(os.path.join(target_dir, filename), upload_dir).replace(os.sep, '/')
+    try:
+        return jsonify(chunked_uploads.init(relative_path, size, str(data.get("fingerprint", ""))))
+    except OSError as e:
+        print(f"Error starting upload of {relative_path}: {e}")
+        return jsonify({"message": f"Could not start upload: {e}"}), 500
+
+@app.route("/upload/<upload_id>/chunks/<int:index>", methods=["PUT"])
+def upload_chunk(upload_id, index):
+    """Store one chunk (raw body) of a chunked upload; X-Chunk-SHA256 is checked if given."""
+    try:
+        received = chunked_uploads.write_chunk(
+            upload_id, index, request.stream, request.headers.get("X-Chunk-SHA256", "")
+        )
+    except UploadError as e:
+        return jsonify({"message": str(e)}), e.status
+    return jsonify({"received": received})
+
+@app.route("/upload/<upload_id>/complete", methods=["POST"])
+def complete_chunked_upload(upload_id):
+    """
+    Verify a chunked upload and move it into place.
+
+    Body: {"checksum", "on_duplicate"} where checksum (optional) is the SHA-256
+    of the concatenated per-chunk SHA-256 digests. 409 lists chunks to send again.
+    The response's "path" is where the file was stored (after secure_filename),
+    or null if it was skipped as a duplicate.
+    """
+    data = request.json or {}
+    try:
+        relative_path = chunked_uploads.complete(upload_id, data.get("checksum", ""))
+    except UploadError as e:
+        return jsonify({"message": str(e), "missing": e.missing}), e.status
+    uploads_ingest.submit(relative_path)
+    duplicate_message = apply_duplicate_policy(
+        uploads_source, relative_path, data.get("on_duplicate", args.on_duplicate)
+    )
+    stored_path = relative_path if uploads_source.file_exists(relative_path) else None
+    if duplicate_message:
+        return jsonify({"message": duplicate_message, "duplicate": True, "path": stored_path}), 200
+    return jsonify({
+        "message": f"File '{os.path.basename(relative_path)}' uploaded successfully", "path": stored_path
+    }), 200
+
 @app.route("/rate", methods=["POST"])
 def rate_file():
     """Set the rating for a file."""
@@ -360,185 +892,43 @@ def untag_file():
     else:
         return jsonify({"success": False, "message": "Failed to remove tag"}), 500
 
+def load_ingested_metadata(dir_name: str, filename: str, file_path: str):
+    """extract_media_metadata() for a file, from its ingest artifact when the source has one."""
+    ingest = get_ingest_index(dir_name)
+    metadata = ingest.get_metadata(filename) if ingest is not None else None
+    if metadata is None:
+        return extract_media_metadata(file_path, args.ffprobe)
+    return metadata
+
 @app.route("/metadata/<dir_name>/<path:filename>")
 def get_metadata(dir_name, filename):
-    """Extract and return metadata for a file, including workflow JSON."""
-    import json
-    
+    """
+    Extract and return metadata for a file, including workflow JSON.
+
+    With summary=true only the _basic section and a _summary of models,
+    loras, sampler settings and prompts are returned, not the workflow graph.
+    """
     source = get_source_for_directory(dir_name)
+    summary = request.args.get("summary", "false") == "true"
     
     if not source.file_exists(filename):
         return jsonify({"success": False, "message": "File not found"}), 404
     
     file_path = source.get_file_path(filename)
-    file_ext = os.path.splitext(filename)[1].lower()
-    metadata = {}
-    
-    def try_parse_json(value):
-        """Try to parse a string as JSON, return original if it fails."""
-        if isinstance(value, str):
-            try:
-                return json.loads(value)
-            except:
-                return value
-        return value
-    
-    def decode_value(value):
-        """Decode bytes to string if needed."""
-        if isinstance(value, bytes):
-            try:
-                return value.decode('utf-8', errors='ignore')
-            except:
-                return str(value)
-        return value
     
     try:
-        # Extract metadata based on file type
-        if file_ext in ['.webp', '.png', '.jpg', '.jpeg']:
-            with Image.open(file_path) as img:
-                # Basic image info
-                metadata["_basic"] = {
-                    "Format": img.format,
-                    "Mode": img.mode,
-                    "Size": f"{img.width} × {img.height}"
-                }
-                
-                # Extract PNG info (this is where ComfyUI/InvokeAI store workflow data)
-                if hasattr(img, 'info') and img.info:
-                    # Look for known workflow/generation keys
-                    workflow_keys = ['workflow', 'prompt', 'Workflow', 'Prompt']
-                    parameter_keys = ['parameters', 'Parameters', 'Dream', 'invokeai_metadata', 'sd-metadata']
-                    
-                    for key, value in img.info.items():
-                        decoded_value = decode_value(value)
-                        parsed_value = try_parse_json(decoded_value)
-                        
-                        # Prioritize workflow/generation data
-                        if key in workflow_keys:
-                            metadata[f"🔧 {key}"] = parsed_value
-                        elif key in parameter_keys:
-                            metadata[f"⚙️ {key}"] = parsed_value
-                        else:
-                            # Store other metadata
-                            if "_other" not in metadata:
-                                metadata["_other"] = {}
-                            metadata["_other"][key] = parsed_value
-                
-                # Try to get EXIF data (some tools store data here too)
-                exif = img.getexif()
-                if exif:
-                    from PIL.ExifTags import TAGS
-                    exif_data = {}
-                    for tag_id, value in exif.items():
-                        tag = TAGS.get(tag_id, tag_id)
-                        decoded_value = decode_value(value)
-                        # Try to parse as JSON for UserComment and other fields
-                        if tag in ['UserComment', 'ImageDescription', 'XPComment']:
-                            decoded_value = try_parse_json(decoded_value)
-                        exif_data[str(tag)] = decoded_value
-                    
-                    if exif_data:
-                        metadata["_exif"] = exif_data
-        
-        elif file_ext == '.mp4':
-            # Extract video metadata using OpenCV
-            cap = cv2.VideoCapture(file_path)
-            if cap.isOpened():
-                width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                fps = cap.get(cv2.CAP_PROP_FPS)
-                frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-                duration = frame_count / fps if fps > 0 else 0
-                
-                metadata["_basic"] = {
-                    "Format": "MP4",
-                    "Size": f"{width} × {height}",
-                    "FPS": f"{fps:.2f}",
-                    "Frame Count": str(frame_count),
-                    "Duration": f"{duration:.2f}s"
-                }
-                
-                cap.release()
-            
-            # Extract MP4 metadata tags using mutagen
-            try:
-                from mutagen.mp4 import MP4
-                video = MP4(file_path)
-                
-                # Look for workflow data in various MP4 tags
-                workflow_keys = ['workflow', 'prompt', 'Workflow', 'Prompt', '©cmt', 'desc']
-                parameter_keys = ['parameters', 'Parameters']
-                
-                for key in video.keys():
-                    value = video[key]
-                    # MP4 tags are usually lists
-                    if isinstance(value, list) and len(value) > 0:
-                        value = value[0]
-                    
-                    # Decode if bytes
-                    if isinstance(value, bytes):
-                        value = value.decode('utf-8', errors='ignore')
-                    
-                    value_str = str(value)
-                    parsed_value = try_parse_json(value_str)
-                    
-                    # Check if this is workflow/generation data
-                    if any(wk.lower() in key.lower() for wk in workflow_keys):
-                        metadata[f"🔧 {key}"] = parsed_value
-                    elif any(pk.lower() in key.lower() for pk in parameter_keys):
-                        metadata[f"⚙️ {key}"] = parsed_value
-                    else:
-                        # Store in other metadata
-                        if "_mp4_tags" not in metadata:
-                            metadata["_mp4_tags"] = {}
-                        metadata["_mp4_tags"][key] = parsed_value
-            except Exception as e:
-                print(f"Error extracting MP4 tags with mutagen: {e}")
-            
-            # Try using ffprobe for more comprehensive metadata extraction
-            try:
-                import subprocess
-                result = subprocess.run(
-                    ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', file_path],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                
-                if result.returncode == 0:
-                    ffprobe_data = json.loads(result.stdout)
-                    if 'format' in ffprobe_data and 'tags' in ffprobe_data['format']:
-                        tags = ffprobe_data['format']['tags']
-                        
-                        for key, value in tags.items():
-                            parsed_value = try_parse_json(value)
-                            
-                            # Look for workflow keywords in key names
-                            key_lower = key.lower()
-                            if any(wk in key_lower for wk in ['workflow', 'prompt', 'comfy']):
-                                metadata[f"🔧 {key}"] = parsed_value
-                            elif any(pk in key_lower for pk in ['parameter', 'setting']):
-                                metadata[f"⚙️ {key}"] = parsed_value
-                            elif "_ffprobe_tags" not in metadata:
-                                metadata["_ffprobe_tags"] = {}
-                                metadata["_ffprobe_tags"][key] = parsed_value
-                            else:
-                                metadata["_ffprobe_tags"][key] = parsed_value
-            except FileNotFoundError:
-                # ffprobe not available
-                pass
-            except Exception as e:
-                print(f"Error extracting metadata with ffprobe: {e}")
-                pass
-        
-        # Add file system metadata to _basic section
-        file_stat = os.stat(file_path)
-        if "_basic" not in metadata:
-            metadata["_basic"] = {}
-        metadata["_basic"]["File Size"] = f"{file_stat.st_size:,} bytes"
-        metadata["_basic"]["Modified"] = datetime.fromtimestamp(file_stat.st_mtime).strftime("%Y-%m-%d %H:%M:%S")
-        
-        return jsonify({"success": True, "metadata": metadata})
+        # Metadata only changes with the file, so its size and mtime version it
+        stat = os.stat(file_path)
+        if summary:
+            def build():
+                metadata = load_ingested_metadata(dir_name, filename, file_path)
+                return {"success": True, "metadata": {
+                    "_basic": metadata.get("_basic", {}), "_summary": summarize_metadata(metadata)
+                }}
+            return conditional_json(f"{stat.st_size:x}-{stat.st_mtime_ns:x}-summary", build)
+        return conditional_json(f"{stat.st_size:x}-{stat.st_mtime_ns:x}", lambda: {
+            "success": True, "metadata": load_ingested_metadata(dir_name, filename, file_path)
+        })
     
     except Exception as e:
         print(f"Error extracting metadata from {filename}: {e}")
@@ -638,23 +1028,26 @@ def delete_files():
         return jsonify({"success": False, "message": "No files selected"}), 400
     
     source = get_source_for_directory(directory)
-    deleted = []
+    targets = []
     errors = []
-    
     for file in files:
-        if source.delete_file(file):
-            deleted.append(file)
-            
-            # Remove cached static frames for this file
-            cache_keys_to_remove = [key for key in static_frame_cache.keys() if key.startswith(f"{file}_")]
-            for cache_key in cache_keys_to_remove:
-                del static_frame_cache[cache_key]
-            # Remove cached video thumbnails for this file
-            if file in video_thumbnail_cache:
-                del video_thumbnail_cache[file]
+        file_path = source._resolve_subpath(file)
+        if file_path is None or file_path == source.directory:
+            errors.append(f"{file}: Invalid path")
         else:
-            errors.append(f"{file}: Failed to delete")
-    
+            targets.append((file, file_path))
+
+    # Renamed into the trash now, removed from disk by its purge thread
+    deleted, trash_errors = trashes[source.directory].move_to_trash(targets)
+    errors += trash_errors
+    if deleted:
+        if source.ratings_manager:
+            source.ratings_manager.pop_ratings(deleted)
+        if source.tags_manager:
+            source.tags_manager.pop_file_tags(deleted)
+        for file in deleted:
+            static_frames.invalidate((directory, file))
+
     success = len(deleted) > 0 and len(errors) == 0
     message = f"Deleted {len(deleted)} files" if success else f"Errors: {', '.join(errors)}"
     
@@ -687,64 +1080,42 @@ def move_files():
     if target_base is None:
         return jsonify({"success": False, "message": "Invalid target path"}), 400
 
-    moved = []
-    errors = []
-
-    for file in files:
-        file = file.replace(os.sep, '/')
-        if not source.file_exists(file):
-            errors.append(f"{file}: Source file not found")
-            continue
-
-        basename = os.path.basename(file)
-        new_relative = (target_subpath.rstrip('/') + '/' + basename).lstrip('/') if target_subpath else basename
-        new_relative_fwd = new_relative.replace(os.sep, '/')
-
-        # Prevent collision
-        if target.file_exists(new_relative_fwd):
-            errors.append(f"{file}: A file with that name already exists at the destination")
-            continue
-
-        src_full = source.get_file_path(file)
-        dst_full = os.path.join(target_base, basename)
-
-        try:
-            os.makedirs(target_base, exist_ok=True)
-            shutil.move(src_full, dst_full)
-        except Exception as e:
-            errors.append(f"{file}: {e}")
-            continue
-
-        # Migrate tags
-        if source_dir == target_dir:
-            if source.tags_manager:
-                source.tags_manager.rename_file_key(file, new_relative_fwd)
-            if source.ratings_manager:
-                source.ratings_manager.rename_file_key(file, new_relative_fwd)
+    moves, errors = plan_moves(source, target, target_subpath, files)
+    execution_errors = execute_moves(moves)
+    if execution_errors:
+        # Nothing was moved: report why, alongside the files the plan already rejected
+        return jsonify({
+            "success": False,
+            "message": f"Move cancelled; Errors: {', '.join(execution_errors + errors)}",
+            "moved": [],
+            "errors": execution_errors + errors
+        }), 500
+    renames = {old: new for old, new, _, _ in moves}
+
+    # Migrate tags and ratings with one write per store
+    if source_dir == target_dir:
+        if source.tags_manager:
+            source.tags_manager.rename_file_keys(renames)
+        if source.ratings_manager:
+            source.ratings_manager.rename_file_keys(renames)
+    else:
+        if source.tags_manager and target.tags_manager:
+            moved_tags = source.tags_manager.pop_file_tags(renames)
+            target.tags_manager.add_file_tags({renames[old]: tags for old, tags in moved_tags.items()})
+        if source.ratings_manager and target.ratings_manager:
+            moved_ratings = source.ratings_manager.pop_ratings(renames)
+            target.ratings_manager.set_ratings({renames[old]: rating for old, rating in moved_ratings.items()})
+
+    # Derived data follows the file; a move between sources is ingested afresh
+    source_ingest, target_ingest = get_ingest_index(source_dir), get_ingest_index(target_dir)
+    for old, new in renames.items():
+        static_frames.invalidate((source_dir, old))
+        if source_ingest is target_ingest:
+            source_ingest.rename(old, new)
         else:
-            # Copy tags to target source, remove from source
-            if source.tags_manager and target.tags_manager:
-                existing_tags = source.tags_manager.get_tags(file)
-                for tag in existing_tags:
-                    target.tags_manager.add_tag(new_relative_fwd, tag)
-                source.tags_manager.delete_file_tags(file)
-            # Copy rating to target source, remove from source
-            if source.ratings_manager and target.ratings_manager:
-                existing_rating = source.ratings_manager.get_rating(file)
-                if existing_rating:
-                    target.ratings_manager.set_rating(new_relative_fwd, existing_rating)
-                source.ratings_manager.delete_rating(file)
-
-        # Clear backend caches for the moved file
-        cache_keys_to_remove = [k for k in static_frame_cache if k.startswith(f"{file}_")]
-        for k in cache_keys_to_remove:
-            del static_frame_cache[k]
-        old_thumb_key = f"{source_dir}/{file}"
-        if old_thumb_key in video_thumbnail_cache:
-            del video_thumbnail_cache[old_thumb_key]
-
-        moved.append(file)
+            target_ingest.submit(new)
 
+    moved = list(renames)
     success = len(moved) > 0
     return jsonify({
         "success": success,
@@ -758,6 +1129,7 @@ def extract_archive():
     """Extract a .zip file into the gallery directory."""
     data = request.json
     archive_name = data.get("filename")
+    on_duplicate = data.get("on_duplicate", args.on_duplicate)
 
     if not archive_name:
         return jsonify({"success": False, "message": "No archive filename provided"}), 400
@@ -767,6 +1139,9 @@ def extract_archive():
 
     archive_path = archive_source.get_file_path(archive_name)
 
+    skipped = []
+    linked = []
+
     try:
         with zipfile.ZipFile(archive_path, "r") as zipf:
             for zip_info in zipf.infolist():
@@ -780,10 +1155,30 @@ def extract_archive():
                         target_path = gallery_source.get_file_path(f"{base_name}_{counter}{ext}")
                         counter += 1
 
-                with zipf.open(zip_info) as source, open(target_path, "wb") as target:
-                    target.write(source.read())
-
-        return jsonify({"success": True, "message": f"Archive '{archive_name}' extracted successfully"}), 200
+                with zipf.open(zip_info) as source:
+                    content = source.read()
+
+                # Identical bytes already in the library: skip or hardlink instead of writing a copy
+                if on_duplicate in ("skip", "link"):
+                    existing = duplicate_index.find_duplicate_of_bytes(content)
+                    if existing is not None:
+                        if on_duplicate == "link" and hardlink_duplicate(duplicate_index.get_file_path(existing), target_path):
+                            linked.append(original_name)
+                            continue
+                        if on_duplicate == "skip":
+                            skipped.append(original_name)
+                            continue
+
+                with open(target_path, "wb") as target:
+                    target.write(content)
+                gallery_ingest.submit(os.path.relpath(target_path, gallery_dir).replace(os.sep, '/'))
+
+        message = f"Archive '{archive_name}' extracted successfully"
+        if skipped:
+            message += f"; skipped {len(skipped)} duplicate(s)"
+        if linked:
+            message += f"; hardlinked {len(linked)} duplicate(s)"
+        return jsonify({"success": True, "message": message, "skipped": skipped, "linked": linked}), 200
     except Exception as e:
         print(f"Error extracting archive {archive_name}: {e}")
         return jsonify({"success": False, "message": str(e)}), 500
@@ -791,4 +1186,17 @@ def extract_archive():
 if __name__ == "__main__":
     print(f"Serving from: {gallery_dir}")
     print(f"Uploads will be saved to: {upload_dir}")
-    app.run(host="0.0.0.0", port=3137)
\ No newline at end of file
+    # Stores are read on first use; start reading them now, off the request path
+    for source in (gallery_source, uploads_source):
+        source.ratings_manager.preload()
+        source.tags_manager.preload()
+    for watcher in {gallery_watcher, uploads_watcher}:
+        watcher.start()
+    for index in {gallery_search, uploads_search, gallery_similarity, uploads_similarity, gallery_table, uploads_table,
+                  gallery_previews, uploads_previews, gallery_ingest, uploads_ingest}:
+        index.start()
+    change_feed.start()
+    duplicate_index.start()
+    for trash in trashes.values():
+        trash.start()
+    app.run(host="0.0.0.0", port=args.port)
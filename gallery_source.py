@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 import os
 from datetime import datetime
 from webp import extract_webp_animation_metadata
@@ -8,6 +8,51 @@ from mp4 import extract_mp4_metadata
 from mp3 import extract_mp3_metadata
 from ratings import RatingsManager
 from tags import TagsManager
+from trash import TRASH_DIR
+
+def read_media_info(file_path: str) -> Dict:
+    """
+    Header fields of a media file for /images: size_bytes, resolution and, where
+    they apply, frames, duration_seconds and frame_rate; {"error": ...} if the
+    header could not be parsed.
+    """
+    lower_path = file_path.lower()
+    if lower_path.endswith(".webp"):
+        metadata = extract_webp_animation_metadata(file_path)
+        if not isinstance(metadata, dict):
+            return {"error": metadata}
+        return {
+            "size_bytes": metadata["file_size"],
+            "resolution": f"{metadata['width']}x{metadata['height']}",
+            "frames": metadata["frame_count"],
+            "duration_seconds": metadata["total_duration_ms"] / 1000,
+            "frame_rate": metadata["frame_rate"],
+        }
+    elif lower_path.endswith((".png", ".jpg", ".jpeg")):
+        metadata = get_image_metadata(file_path)
+        if not isinstance(metadata, dict):
+            return {"error": metadata}
+        return {
+            "size_bytes": metadata["file_size"],
+            "resolution": f"{metadata['width']}x{metadata['height']}",
+        }
+    elif lower_path.endswith(".mp4"):
+        metadata = extract_mp4_metadata(file_path)
+        if not isinstance(metadata, dict):
+            return {"error": metadata}
+        return {
+            "size_bytes": metadata["file_size"],
+            "resolution": f"{metadata['width']}x{metadata['height']}",
+            "duration_seconds": metadata["duration_ms"] / 1000,
+            "frame_rate": metadata["frame_rate"],
+        }
+    elif lower_path.endswith(".mp3"):
+        file_size = os.path.getsize(file_path)
+        metadata = extract_mp3_metadata(file_path)
+        if isinstance(metadata, dict) and 'error' not in metadata:
+            return {"size_bytes": file_size, "duration_seconds": metadata["duration_seconds"]}
+        return {"size_bytes": file_size}
+    return {}
 
 class GallerySource(ABC):
     """Abstract base class for gallery sources."""
@@ -72,6 +117,9 @@ class FilesystemGallerySource(GallerySource):
         else:
             self.ratings_manager = RatingsManager(self.directory)
             self.tags_manager = TagsManager(self.directory)
+
+        # Optional cache of read_media_info results: provider(relative_path) -> dict or None
+        self.media_info_provider: Optional[Callable[[str], Optional[Dict]]] = None
     
     def list_files(self) -> List[str]:
         """List all files in the source, recursively."""
@@ -96,99 +144,16 @@ class FilesystemGallerySource(GallerySource):
         """Get metadata for a file."""
         file_path = self.get_file_path(filename)
         last_modified = datetime.fromtimestamp(os.path.getmtime(file_path)).isoformat()
-        
-        if filename.lower().endswith(".webp"):
-            metadata = extract_webp_animation_metadata(file_path)
-            if isinstance(metadata, dict):
-                result = {
-                    "name": filename,
-                    "size_bytes": metadata["file_size"],
-                    "resolution": f"{metadata['width']}x{metadata['height']}",
-                    "frames": metadata["frame_count"],
-                    "duration_seconds": metadata["total_duration_ms"] / 1000,
-                    "frame_rate": metadata["frame_rate"],
-                    "last_modified": last_modified
-                }
-                if self.ratings_manager:
-                    result["rating"] = self.ratings_manager.get_rating(filename)
-                if self.tags_manager:
-                    result["tags"] = self.tags_manager.get_tags(filename)
-                return result
-            else:
-                result = {"name": filename, "error": metadata, "last_modified": last_modified}
-                if self.ratings_manager:
-                    result["rating"] = self.ratings_manager.get_rating(filename)
-                if self.tags_manager:
-                    result["tags"] = self.tags_manager.get_tags(filename)
-                return result
-        elif filename.lower().endswith((".png", ".jpg", ".jpeg")):
-            metadata = get_image_metadata(file_path)
-            if isinstance(metadata, dict):
-                result = {
-                    "name": filename,
-                    "size_bytes": metadata["file_size"],
-                    "resolution": f"{metadata['width']}x{metadata['height']}",
-                    "last_modified": last_modified
-                }
-                if self.ratings_manager:
-                    result["rating"] = self.ratings_manager.get_rating(filename)
-                if self.tags_manager:
-                    result["tags"] = self.tags_manager.get_tags(filename)
-                return result
-            else:
-                result = {"name": filename, "error": metadata, "last_modified": last_modified}
-                if self.ratings_manager:
-                    result["rating"] = self.ratings_manager.get_rating(filename)
-                if self.tags_manager:
-                    result["tags"] = self.tags_manager.get_tags(filename)
-                return result
-        elif filename.lower().endswith(".mp4"):
-            metadata = extract_mp4_metadata(file_path)
-            if isinstance(metadata, dict):
-                result = {
-                    "name": filename,
-                    "size_bytes": metadata["file_size"],
-                    "resolution": f"{metadata['width']}x{metadata['height']}",
-                    "duration_seconds": metadata["duration_ms"] / 1000,
-                    "frame_rate": metadata["frame_rate"],
-                    "last_modified": last_modified
-                }
-                if self.ratings_manager:
-                    result["rating"] = self.ratings_manager.get_rating(filename)
-                if self.tags_manager:
-                    result["tags"] = self.tags_manager.get_tags(filename)
-                return result
-            else:
-                result = {"name": filename, "error": metadata, "last_modified": last_modified}
-                if self.ratings_manager:
-                    result["rating"] = self.ratings_manager.get_rating(filename)
-                if self.tags_manager:
-                    result["tags"] = self.tags_manager.get_tags(filename)
-                return result
-        elif filename.lower().endswith(".mp3"):
-            file_size = os.path.getsize(file_path)
-            metadata = extract_mp3_metadata(file_path)
-            if isinstance(metadata, dict) and 'error' not in metadata:
-                result = {
-                    "name": filename,
-                    "size_bytes": file_size,
-                    "duration_seconds": metadata["duration_seconds"],
-                    "last_modified": last_modified
-                }
-            else:
-                result = {"name": filename, "size_bytes": file_size, "last_modified": last_modified}
-            if self.ratings_manager:
-                result["rating"] = self.ratings_manager.get_rating(filename)
-            if self.tags_manager:
-                result["tags"] = self.tags_manager.get_tags(filename)
-            return result
-        else:
-            result = {"name": filename, "last_modified": last_modified}
-            if self.ratings_manager:
-                result["rating"] = self.ratings_manager.get_rating(filename)
-            if self.tags_manager:
-                result["tags"] = self.tags_manager.get_tags(filename)
-            return result
+        media_info = self.media_info_provider(filename) if self.media_info_provider else None
+        if media_info is None:
+            # The provider has nothing for files it has not indexed (yet)
+            media_info = read_media_info(file_path)
+        result = {"name": filename, **media_info, "last_modified": last_modified}
+        if self.ratings_manager:
+            result["rating"] = self.ratings_manager.get_rating(filename)
+        if self.tags_manager:
+            result["tags"] = self.tags_manager.get_tags(filename)
+        return result
     
     def get_file_size(self, filename: str) -> int:
         """Get the size of a file in bytes."""
@@ -264,7 +229,7 @@ class FilesystemGallerySource(GallerySource):
         result = []
         try:
             for entry in os.scandir(target):
-                if entry.is_dir():
+                if entry.is_dir() and entry.name != TRASH_DIR:
                     result.append(entry.name)
         except PermissionError:
             pass
@@ -278,7 +243,7 @@ class FilesystemGallerySource(GallerySource):
         result = []
         try:
             for entry in sorted(os.scandir(target), key=lambda e: e.name.lower()):
-                if entry.is_dir():
+                if entry.is_dir() and entry.name != TRASH_DIR:
                     child_subpath = os.path.relpath(entry.path, self.directory).replace(os.sep, '/')
                     result.append({
                         "name": entry.name,
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+HASH_ALGORITHM = 'sha256'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def hash_file(path: str, limit: Optional[int] = None) -> str:
+    """
+    Compute the hex digest of a file, reading it in 1 MiB chunks.
+
+    Args:
+        path: Path to the file
+        limit: Only hash the first `limit` bytes when given
+
+    Returns:
+        Hex digest string
+    """
+    hasher = hashlib.new(HASH_ALGORITHM)
+    remaining = limit
+    with open(path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            size = HASH_CHUNK_SIZE if remaining is None else min(HASH_CHUNK_SIZE, remaining)
+            chunk = f.read(size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return hasher.hexdigest()
+
+class HashCache:
+    """
+    Per-directory content hashes cached in a JSON sidecar keyed on size+mtime.
+
+    Hashes are computed in a background thread pool; a cached hash is reused
+    for as long as the file's size and mtime are unchanged. The sidecar is
+    read on first use, not on construction.
+    """
+
+    HASHES_FILE = ".hashes.json"
+    SAVE_DELAY = 2.0  # Seconds to batch completed hashes before writing the sidecar
+
+    def __init__(self, directory: str, workers: int = 4):
+        self.directory = os.path.abspath(directory)
+        self.hashes_path = os.path.join(self.directory, self.HASHES_FILE)
+        self._hashes: Dict[str, Dict] = {}
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hash')
+        self._loaded = False
+
+    @contextmanager
+    def _locked(self):
+        """Hold the lock, loading the sidecar first if it has not been read yet."""
+        with self._lock:
+            if not self._loaded:
+                self._load_unsafe()
+            yield
+
+    def _load_unsafe(self):
+        self._loaded = True
+        if os.path.exists(self.hashes_path):
+            try:
+                with open(self.hashes_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self._hashes = {
+                    k: v for k, v in data.items()
+                    if isinstance(v, dict) and {'size', 'mtime', HASH_ALGORITHM} <= v.keys()
+                }
+            except (json.JSONDecodeError, IOError) as e:
+                print(f"Error loading hashes from {self.hashes_path}: {e}")
+                self._hashes = {}
+        else:
+            self._hashes = {}
+
+    def _contains(self, relative_path: str) -> bool:
+        """Whether a relative path names something inside the directory."""
+        if os.path.isabs(relative_path) or '..' in relative_path.replace('\\', '/').split('/'):
+            return False
+        full_path = os.path.abspath(os.path.join(self.directory, relative_path))
+        return full_path.startswith(self.directory + os.sep)
+
+    def get_cached(self, relative_path: str, size: int, mtime: float) -> Optional[str]:
+        """Return the cached hash if it is still valid for this size and mtime."""
+        with self._locked():
+            entry = self._hashes.get(relative_path)
+            if entry and entry['size'] == size and entry['mtime'] == mtime:
+                return entry[HASH_ALGORITHM]
+        return None
+
+    def submit(self, relative_path: str, size: int, mtime: float) -> Future:
+        """
+        Return a future resolving to the file's hash, scheduling it if needed.
+
+        Paths outside the directory resolve to FileNotFoundError.
+        """
+        if not self._contains(relative_path):
+            future: Future = Future()
+            future.set_exception(FileNotFoundError(f"Not in {self.directory}: {relative_path}"))
+            return future
+        cached = self.get_cached(relative_path, size, mtime)
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+            return future
+        with self._locked():
+            future = self._pending.get(relative_path)
+            if future is None:
+                future = self._executor.submit(self._compute, relative_path, size, mtime)
+                self._pending[relative_path] = future
+            return future
+
+    def get_hash(self, relative_path: str) -> Optional[str]:
+        """Hash a file by path, blocking until the hash is available; None if it is not a file inside the directory."""
+        full_path = os.path.join(self.directory, relative_path)
+        if not self._contains(relative_path) or not os.path.isfile(full_path):
+            return None
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            return None
+        try:
+            return self.submit(relative_path, stat.st_size, stat.st_mtime).result()
+        except OSError:
+            return None
+
+    def _compute(self, relative_path: str, size: int, mtime: float) -> str:
+        try:
+            digest = hash_file(os.path.join(self.directory, relative_path))
+            with self._locked():
+                self._hashes[relative_path] = {'size': size, 'mtime': mtime, HASH_ALGORITHM: digest}
+                self._schedule_save_unsafe()
+            return digest
+        finally:
+            with self._locked():
+                self._pending.pop(relative_path, None)
+
+    def rename(self, old_path: str, new_path: str):
+        """Carry a cached hash over to a file's new path after a move."""
+        with self._locked():
+            entry = self._hashes.pop(old_path, None)
+            if entry is not None:
+                self._hashes[new_path] = entry
+                self._schedule_save_unsafe()
+
+    def forget(self, relative_path: str):
+        with self._locked():
+            if self._hashes.pop(relative_path, None) is not None:
+                self._schedule_save_unsafe()
+
+    def _schedule_save_unsafe(self):
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.SAVE_DELAY, self.save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def save(self) -> bool:
+        with self._locked():
+            self._save_timer = None
+            try:
+                temp_path = self.hashes_path + '.tmp'
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self._hashes, f)
+                os.replace(temp_path, self.hashes_path)
+                return True
+            except IOError as e:
+                print(f"Error saving hashes to {self.hashes_path}: {e}")
+                return False
@@ -0,0 +1,337 @@
+import argparse
+import os
+import re
+import statistics
+import struct
+import sys
+import tempfile
+import time
+import zlib
+
+MAX_TEXT_SIZE = 16 * 1024 * 1024  # Compressed text chunks are not inflated past this
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# PNG colour type -> PIL mode; 1- and 16-bit greyscale are special-cased
+_PNG_MODES = {0: "L", 2: "RGB", 3: "P", 4: "LA", 6: "RGBA"}
+
+# TIFF field type -> (struct code, size of one value)
+_TIFF_TYPES = {
+    1: ('B', 1), 2: ('s', 1), 3: ('H', 2), 4: ('I', 4), 5: ('II', 8),
+    6: ('b', 1), 7: ('s', 1), 8: ('h', 2), 9: ('i', 4), 10: ('ii', 8),
+}
+
+# ComfyUI stores WebP workflows as EXIF strings such as "workflow:{...}"
+_EXIF_TEXT = re.compile(r'^([A-Za-z_][\w-]*):\s*([\[{].*)$', re.DOTALL)
+
+
+def _inflate(data):
+    inflater = zlib.decompressobj()
+    text = inflater.decompress(data, MAX_TEXT_SIZE)
+    if inflater.unconsumed_tail:
+        raise ValueError("Compressed text chunk is too large")
+    return text
+
+
+def _read_png_text_chunk(chunk_type, data):
+    """(key, value) of a tEXt, zTXt or iTXt chunk."""
+    key, _, rest = data.partition(b'\0')
+    key = key.decode('latin-1')
+    if chunk_type == b'tEXt':
+        return key, rest.decode('latin-1')
+    if chunk_type == b'zTXt':
+        # One byte of compression method, then the deflated text
+        return key, _inflate(rest[1:]).decode('latin-1')
+    # iTXt: compression flag and method, language tag, translated keyword, then UTF-8 text
+    compressed = rest[:1] == b'\x01'
+    _language, _, rest = rest[2:].partition(b'\0')
+    _translated, _, text = rest.partition(b'\0')
+    if compressed:
+        text = _inflate(text)
+    return key, text.decode('utf-8', errors='ignore')
+
+
+def parse_exif(data):
+    """
+    Read IFD0 of raw EXIF data (with or without the 'Exif\\0\\0' prefix).
+
+    Returns:
+        dict: Tag id -> value; strings for ASCII, bytes for BYTE and UNDEFINED,
+            ints, floats for rationals and tuples where a field holds several values.
+    """
+    if data[:6] == b'Exif\0\0':
+        data = data[6:]
+    if data[:2] == b'II':
+        order = '<'
+    elif data[:2] == b'MM':
+        order = '>'
+    else:
+        return {}
+    offset = struct.unpack(order + 'I', data[4:8])[0]
+    count = struct.unpack(order + 'H', data[offset:offset + 2])[0]
+    values = {}
+    for entry in range(offset + 2, offset + 2 + count * 12, 12):
+        tag, field_type, value_count = struct.unpack(order + 'HHI', data[entry:entry + 8])
+        if field_type not in _TIFF_TYPES:
+            continue
+        code, size = _TIFF_TYPES[field_type]
+        length = size * value_count
+        if length <= 4:
+            raw = data[entry + 8:entry + 8 + length]
+        else:
+            value_offset = struct.unpack(order + 'I', data[entry + 8:entry + 12])[0]
+            raw = data[value_offset:value_offset + length]
+        if len(raw) < length:
+            continue
+        if field_type == 2:
+            value = raw.split(b'\0', 1)[0].decode('utf-8', errors='ignore')
+        elif field_type in (1, 7):
+            value = raw
+        else:
+            numbers = struct.unpack(f'{order}{value_count * len(code)}{code[0]}', raw)
+            if len(code) == 2:
+                numbers = tuple(n / d if d else 0.0 for n, d in zip(numbers[0::2], numbers[1::2]))
+            value = numbers[0] if len(numbers) == 1 else numbers
+        values[tag] = value
+    return values
+
+
+def _exif_text(exif):
+    """'key:json' strings of EXIF fields, as written by ComfyUI's WebP nodes."""
+    text = {}
+    for value in exif.values():
+        if isinstance(value, str):
+            match = _EXIF_TEXT.match(value)
+            if match:
+                text[match.group(1)] = match.group(2)
+    return text
+
+
+def read_png_text(filename):
+    """
+    Read the text chunks of a PNG without decoding any image data.
+
+    Chunk headers are read one at a time and IDAT data is seeked over, so
+    only IHDR, tEXt, zTXt, iTXt and eXIf bodies are read, wherever in the
+    file they are.
+
+    Args:
+        filename (str): Path to the PNG file.
+
+    Returns:
+        dict: format, mode, width, height, text (key -> value), exif (tag id -> value).
+        str: Error message if the file cannot be processed.
+    """
+    if not os.path.isfile(filename):
+        return f"Error: File '{filename}' not found."
+
+    try:
+        file_size = os.path.getsize(filename)
+        with open(filename, 'rb') as f:
+            if f.read(8) != PNG_SIGNATURE:
+                return "Error: Not a valid PNG file."
+
+            result = {"format": "PNG", "mode": None, "width": None, "height": None, "text": {}, "exif": {}}
+            pointer = 8
+            while pointer + 8 <= file_size:
+                f.seek(pointer)
+                chunk_length, chunk_type = struct.unpack('>I4s', f.read(8))
+                if pointer + 12 + chunk_length > file_size:
+                    break
+                if chunk_type == b'IHDR':
+                    width, height, bit_depth, colour_type = struct.unpack('>IIBB', f.read(10))
+                    result["width"], result["height"] = width, height
+                    if colour_type == 0 and bit_depth == 1:
+                        result["mode"] = "1"
+                    elif colour_type == 0 and bit_depth == 16:
+                        result["mode"] = "I;16"
+                    else:
+                        result["mode"] = _PNG_MODES.get(colour_type)
+                elif chunk_type in (b'tEXt', b'zTXt', b'iTXt'):
+                    key, value = _read_png_text_chunk(chunk_type, f.read(chunk_length))
+                    result["text"][key] = value
+                elif chunk_type == b'eXIf':
+                    result["exif"] = parse_exif(f.read(chunk_length))
+                elif chunk_type == b'IEND':
+                    break
+                # Length, type, data and CRC
+                pointer += 12 + chunk_length
+
+        if result["width"] is None:
+            return "Error: Could not find resolution in PNG file."
+        for key, value in _exif_text(result["exif"]).items():
+            result["text"].setdefault(key, value)
+        return result
+
+    except (IOError, struct.error, zlib.error, ValueError) as e:
+        return f"Error: {e}"
+
+
+def read_webp_text(filename):
+    """
+    Read the EXIF and XMP chunks of a WebP without decoding any frames.
+
+    RIFF chunk headers are read one at a time and frame data is seeked
+    over. EXIF strings of the form 'key:{json}' (ComfyUI's way of storing
+    prompt and workflow in a WebP) are also returned as text entries.
+
+    Args:
+        filename (str): Path to the WebP file.
+
+    Returns:
+        dict: format, mode, width, height, text (key -> value), exif (tag id -> value), xmp.
+        str: Error message if the file cannot be processed.
+    """
+    if not os.path.isfile(filename):
+        return f"Error: File '{filename}' not found."
+
+    try:
+        file_size = os.path.getsize(filename)
+        with open(filename, 'rb') as f:
+            header = f.read(12)
+            if header[:4] != b'RIFF' or header[8:12] != b'WEBP':
+                return "Error: Not a valid WebP file (incorrect header)."
+
+            result = {"format": "WEBP", "mode": "RGB", "width": None, "height": None,
+                      "text": {}, "exif": {}, "xmp": None}
+            pointer = 12
+            while pointer + 8 <= file_size:
+                f.seek(pointer)
+                chunk_type, chunk_size = struct.unpack('<4sI', f.read(8))
+                if pointer + 8 + chunk_size > file_size:
+                    return "Error: Invalid chunk size, file may be corrupted."
+                if chunk_type == b'VP8X' and chunk_size >= 10:
+                    data = f.read(10)
+                    result["mode"] = "RGBA" if data[0] & 0x10 else "RGB"
+                    result["width"] = int.from_bytes(data[4:7], 'little') + 1
+                    result["height"] = int.from_bytes(data[7:10], 'little') + 1
+                elif chunk_type == b'VP8 ' and chunk_size >= 10 and result["width"] is None:
+                    # Frame tag, start code, then 14-bit width and height
+                    data = f.read(10)
+                    result["width"] = struct.unpack('<H', data[6:8])[0] & 0x3FFF
+                    result["height"] = struct.unpack('<H', data[8:10])[0] & 0x3FFF
+                elif chunk_type == b'VP8L' and chunk_size >= 5 and result["width"] is None:
+                    # Signature byte, then width-1 and height-1 (14 bits each) and the alpha bit
+                    bits = struct.unpack('<I', f.read(5)[1:5])[0]
+                    result["width"] = (bits & 0x3FFF) + 1
+                    result["height"] = ((bits >> 14) & 0x3FFF) + 1
+                    result["mode"] = "RGBA" if bits >> 28 & 1 else "RGB"
+                elif chunk_type == b'EXIF':
+                    result["exif"] = parse_exif(f.read(chunk_size))
+                elif chunk_type == b'XMP ':
+                    result["xmp"] = f.read(chunk_size).decode('utf-8', errors='ignore')
+                # Chunks are padded to an even size
+                pointer += 8 + chunk_size + (chunk_size & 1)
+
+        if result["width"] is None:
+            return "Error: Could not find resolution in WebP file."
+        result["text"] = _exif_text(result["exif"])
+        return result
+
+    except (IOError, struct.error) as e:
+        return f"Error: {e}"
+
+
+def read_image_text(filename):
+    """read_png_text() or read_webp_text() by extension; an error string for anything else."""
+    lower_name = filename.lower()
+    if lower_name.endswith('.png'):
+        return read_png_text(filename)
+    if lower_name.endswith('.webp'):
+        return read_webp_text(filename)
+    return "Error: File is not a PNG or WebP image (based on extension)."
+
+
+def _read_with_pil(filename):
+    from PIL import Image
+
+    with Image.open(filename) as img:
+        return dict(img.info), dict(img.getexif())
+
+
+def _create_samples(directory: str, size: int, frames: int):
+    """A large PNG and an animated WebP carrying a ComfyUI-sized workflow, as the nodes save them."""
+    import json
+    from PIL import Image, PngImagePlugin
+
+    workflow = json.dumps({"nodes": [{"id": i, "type": "KSampler", "widgets_values": [i] * 20} for i in range(1000)]})
+    prompt = json.dumps({"3": {"class_type": "KSampler", "inputs": {"seed": 42, "steps": 20}}})
+
+    png_path = os.path.join(directory, 'large.png')
+    info = PngImagePlugin.PngInfo()
+    info.add_text("prompt", prompt)
+    info.add_text("workflow", workflow)
+    Image.frombytes('RGB', (size, size), os.urandom(size * size * 3)).save(png_path, pnginfo=info)
+
+    webp_path = os.path.join(directory, 'animated.webp')
+    exif = Image.Exif()
+    exif[0x010F] = "workflow:" + workflow
+    exif[0x0110] = "prompt:" + prompt
+    images = [Image.frombytes('RGB', (size // 2, size // 2), os.urandom(size * size * 3 // 4)) for _ in range(frames)]
+    images[0].save(webp_path, save_all=True, append_images=images[1:], duration=50, exif=exif.tobytes())
+    return [png_path, webp_path]
+
+
+def benchmark(files, runs: int):
+    """
+    Compare reading text metadata through the chunk readers and through PIL.
+
+    The PIL path is what /metadata used before: Image.open() plus img.info
+    and getexif(). Each file is read runs times by each and the median
+    time reported.
+    """
+    print(f"{'File':<24} {'Size':>10} {'Chunks':>10} {'PIL':>10} {'Speed-up':>9}")
+    for filename in files:
+        result = read_image_text(filename)
+        if isinstance(result, str):
+            print(f"{os.path.basename(filename):<24} {result}")
+            continue
+        timings = []
+        for reader in (read_image_text, _read_with_pil):
+            samples = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                reader(filename)
+                samples.append(time.perf_counter() - start)
+            timings.append(statistics.median(samples))
+        chunk_time, pil_time = timings
+        size_mb = os.path.getsize(filename) / (1024 * 1024)
+        print(f"{os.path.basename(filename)[:24]:<24} {size_mb:>7.1f}MiB {chunk_time * 1000:>8.2f}ms "
+              f"{pil_time * 1000:>8.2f}ms {pil_time / chunk_time:>8.1f}x")
+
+
+def main():
+    """Print the text metadata of a PNG or WebP, or benchmark the chunk readers against PIL."""
+    parser = argparse.ArgumentParser(description="Read PNG/WebP text metadata without decoding the image")
+    parser.add_argument('files', nargs='*', help="Files to read (default with --benchmark: generated ones)")
+    parser.add_argument('--benchmark', action='store_true', help="Time the chunk readers against PIL")
+    parser.add_argument('--runs', type=int, default=20, help="Reads per file and reader (default: 20)")
+    parser.add_argument('--size', type=int, default=2048, help="Edge of the generated PNG in pixels (default: 2048)")
+    parser.add_argument('--frames', type=int, default=60, help="Frames of the generated WebP (default: 60)")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        if args.files:
+            benchmark(args.files, args.runs)
+        else:
+            with tempfile.TemporaryDirectory() as tmp:
+                print("Creating sample files...")
+                benchmark(_create_samples(tmp, args.size, args.frames), args.runs)
+        return
+
+    if not args.files:
+        parser.print_usage()
+        sys.exit(1)
+    for filename in args.files:
+        result = read_image_text(filename)
+        if isinstance(result, str):
+            print(result)
+            continue
+        print(f"File: {filename}")
+        print(f"Resolution: {result['width']}x{result['height']} pixels ({result['mode']})")
+        for key, value in result["text"].items():
+            print(f"{key}: {value[:200]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from gallery_source import read_media_info
+from hashing import HashCache
+from media_metadata import extract_media_metadata
+from mp4 import extract_mp4_first_frame
+from source_watcher import SourceWatcher
+
+INGEST_WORKERS = 4
+METADATA_EXTENSIONS = ('.webp', '.png', '.jpg', '.jpeg', '.mp4')
+THUMBNAIL_EXTENSIONS = ('.mp4',)
+METADATA_SUFFIX = '.json.gz'
+ARTIFACT_SUFFIXES = (METADATA_SUFFIX, '.png')
+METADATA_CACHE_BYTES = 64 * 1024 * 1024  # Uncompressed JSON kept parsed in memory, across all files
+
+
+def render_video_thumbnail(file_path: str) -> Optional[bytes]:
+    """First frame of an MP4 as PNG bytes, or None if no frame can be decoded."""
+    import cv2
+    from PIL import Image
+
+    frame = extract_mp4_first_frame(file_path)
+    if frame is None:
+        return None
+    output = io.BytesIO()
+    Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)).save(output, format='PNG')
+    return output.getvalue()
+
+
+class IngestIndex:
+    """
+    Everything the gallery derives from a new media file, prepared ahead of the first request.
+
+    submit() runs a file through a worker pool: header fields for /images
+    (resolution, frames, duration), the /metadata sections with their
+    prompt/workflow JSON, an MP4's first-frame thumbnail and, via the
+    source's HashCache, its content hash. The gallery calls submit() right
+    after an upload, archive extraction or move; watcher events cover files
+    that arrive any other way. Header fields are kept in a JSON sidecar keyed
+    on size+mtime; metadata (gzipped JSON) and thumbnails are files under
+    cache_dir named by a hash of path, size and mtime, and recently read
+    metadata is also kept parsed in a bounded LRU. Files that were never
+    ingested are handled inline on their first request and recorded the
+    same way. The sidecar is read on first use, not on construction.
+    """
+
+    INDEX_FILE = ".ingest_index.json"
+    INDEX_VERSION = 1
+    SAVE_DELAY = 2.0  # Seconds to batch ingested files before writing the sidecar
+
+    def __init__(self, watcher: SourceWatcher, cache_dir: str, hashes: Optional[HashCache] = None,
+                 workers: int = INGEST_WORKERS, include_ffprobe: bool = False):
+        self.watcher = watcher
+        self.include_ffprobe = include_ffprobe
+        self.directory = watcher.directory
+        self.hashes = hashes
+        self.index_path = os.path.join(self.directory, self.INDEX_FILE)
+        source_key = hashlib.sha1(self.directory.encode('utf-8')).hexdigest()[:16]
+        self.artifact_dir = os.path.join(os.path.abspath(cache_dir), 'ingest', source_key)
+        self._records: Dict[str, Dict] = {}  # relative path -> {"size", "mtime", "info"}
+        self._pending: Dict[str, Future] = {}
+        self._metadata: "OrderedDict[str, Tuple[Dict, int]]" = OrderedDict()  # artifact path -> (metadata, JSON size)
+        self._metadata_bytes = 0
+        self._lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ingest')
+        self._loaded = False
+        watcher.add_listener(self._on_file_event)
+
+    # ─── Persistence ─────────────────────────────────────────
+
+    @contextmanager
+    def _locked(self):
+        """Hold the lock, loading the sidecar first if it has not been read yet."""
+        with self._lock:
+            if not self._loaded:
+                self._load_unsafe()
+            yield
+
+    def _load_unsafe(self):
+        self._loaded = True
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.INDEX_VERSION:
+                self._records = data['files']
+        except (json.JSONDecodeError, IOError, KeyError) as e:
+            print(f"Error loading ingest index from {self.index_path}: {e}")
+
+    def _schedule_save_unsafe(self):
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.SAVE_DELAY, self.save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def save(self) -> bool:
+        with self._locked():
+            self._save_timer = None
+            files = dict(self._records)
+        try:
+            temp_path = self.index_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.INDEX_VERSION, 'files': files}, f)
+            os.replace(temp_path, self.index_path)
+            return True
+        except IOError as e:
+            print(f"Error saving ingest index to {self.index_path}: {e}")
+            return False
+
+    # ─── Artifacts ───────────────────────────────────────────
+
+    @staticmethod
+    def _key(relative_path: str, size: int, mtime: float) -> str:
+        return hashlib.sha1(f"{relative_path}\0{size}\0{mtime!r}".encode('utf-8')).hexdigest()
+
+    def _artifact_path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.artifact_dir, key + suffix)
+
+    def _write_artifact(self, path: str, data: bytes):
+        os.makedirs(self.artifact_dir, exist_ok=True)
+        # Inline requests and the pool may write the same artifact at once
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def _remove_artifacts(self, key: str):
+        for suffix in ARTIFACT_SUFFIXES:
+            try:
+                os.remove(self._artifact_path(key, suffix))
+            except OSError:
+                pass
+
+    def _stat(self, relative_path: str) -> Optional[Tuple[int, float]]:
+        # Not the watcher's entry: submit() runs before the watcher's debounced event
+        try:
+            stat = os.stat(os.path.join(self.directory, relative_path))
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime
+
+    # ─── Maintenance ─────────────────────────────────────────
+
+    def start(self):
+        """Drop records and artifacts of files that changed or vanished while stopped."""
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        self.watcher.wait_ready()
+        files = self.watcher.snapshot()
+        with self._locked():
+            for path in list(self._records):
+                record = self._records[path]
+                if files.get(path) != (record['size'], record['mtime']):
+                    del self._records[path]
+            current = {self._key(path, r['size'], r['mtime']) for path, r in self._records.items()}
+            self._schedule_save_unsafe()
+        if not os.path.isdir(self.artifact_dir):
+            return
+        for name in os.listdir(self.artifact_dir):
+            key, _, suffix = name.partition('.')
+            if (key not in current or '.' + suffix not in ARTIFACT_SUFFIXES) and not name.endswith('.tmp'):
+                try:
+                    os.remove(os.path.join(self.artifact_dir, name))
+                except OSError:
+                    pass
+
+    def _on_file_event(self, event: str, relative_path: str, previous_path: Optional[str]):
+        if event == 'deleted':
+            self.forget(relative_path)
+        elif event == 'moved':
+            self.rename(previous_path, relative_path)
+        else:
+            self.submit(relative_path)
+
+    def forget(self, relative_path: str):
+        with self._locked():
+            record = self._records.pop(relative_path, None)
+            if record is None:
+                return
+            self._schedule_save_unsafe()
+        self._remove_artifacts(self._key(relative_path, record['size'], record['mtime']))
+
+    def rename(self, old_path: str, new_path: str):
+        """Carry a file's record and artifacts over to its new path after a move; a no-op if already done."""
+        with self._locked():
+            record = self._records.pop(old_path, None)
+            if record is None:
+                return
+            self._records[new_path] = record
+            self._schedule_save_unsafe()
+        old_key = self._key(old_path, record['size'], record['mtime'])
+        new_key = self._key(new_path, record['size'], record['mtime'])
+        for suffix in ARTIFACT_SUFFIXES:
+            try:
+                os.replace(self._artifact_path(old_key, suffix), self._artifact_path(new_key, suffix))
+            except OSError:
+                pass
+
+    # ─── Ingestion ───────────────────────────────────────────
+
+    def submit(self, relative_path: str) -> Future:
+        """Queue a new or changed file for ingestion; returns a future for its completion."""
+        with self._locked():
+            future = self._pending.get(relative_path)
+            if future is None:
+                future = self._executor.submit(self._ingest, relative_path)
+                self._pending[relative_path] = future
+            return future
+
+    def _ingest(self, relative_path: str):
+        try:
+            if not self.watcher.is_media_file(relative_path) or self.get_media_info(relative_path) is None:
+                return
+            lower_path = relative_path.lower()
+            if lower_path.endswith(METADATA_EXTENSIONS):
+                self.get_metadata_path(relative_path)
+            if lower_path.endswith(THUMBNAIL_EXTENSIONS):
+                self.get_thumbnail(relative_path)
+            stamp = self._stat(relative_path)
+            if self.hashes is not None and stamp is not None:
+                self.hashes.submit(relative_path, *stamp)
+        except Exception as e:
+            print(f"Error ingesting {relative_path}: {e}")
+        finally:
+            with self._locked():
+                self._pending.pop(relative_path, None)
+
+    def get_media_info(self, relative_path: str) -> Optional[Dict]:
+        """read_media_info() for a file, from the index when current; None if the file is gone."""
+        stamp = self._stat(relative_path)
+        if stamp is None:
+            return None
+        with self._locked():
+            record = self._records.get(relative_path)
+            if record is not None and (record['size'], record['mtime']) == stamp:
+                return record['info']
+        info = read_media_info(os.path.join(self.directory, relative_path))
+        with self._locked():
+            stale = self._records.get(relative_path)
+            self._records[relative_path] = {'size': stamp[0], 'mtime': stamp[1], 'info': info}
+            self._schedule_save_unsafe()
+        if stale is not None and (stale['size'], stale['mtime']) != stamp:
+            self._remove_artifacts(self._key(relative_path, stale['size'], stale['mtime']))
+        return info
+
+    def _artifact(self, relative_path: str, suffix: str, build) -> Optional[str]:
+        """Path of a file's current artifact, building it first if needed; None if build() returns None."""
+        stamp = self._stat(relative_path)
+        if stamp is None or self.get_media_info(relative_path) is None:
+            return None
+        path = self._artifact_path(self._key(relative_path, *stamp), suffix)
+        if os.path.exists(path):
+            return path
+        data = build(os.path.join(self.directory, relative_path))
+        if data is None:
+            return None
+        self._write_artifact(path, data)
+        return path
+
+    def get_metadata_path(self, relative_path: str) -> Optional[str]:
+        """Path of a gzipped JSON file holding extract_media_metadata() for the file."""
+        return self._artifact(
+            relative_path, METADATA_SUFFIX,
+            lambda file_path: gzip.compress(json.dumps(
+                extract_media_metadata(file_path, self.include_ffprobe), default=str
+            ).encode('utf-8'), compresslevel=6, mtime=0)
+        )
+
+    def get_metadata(self, relative_path: str) -> Optional[Dict]:
+        """
+        extract_media_metadata() for the file, parsed; None if it has no artifact.
+
+        Served from memory when read recently. The dict is shared between
+        callers and must not be modified.
+        """
+        path = self.get_metadata_path(relative_path)
+        if path is None:
+            return None
+        with self._locked():
+            entry = self._metadata.get(path)
+            if entry is not None:
+                self._metadata.move_to_end(path)
+                return entry[0]
+        with open(path, 'rb') as f:
+            data = gzip.decompress(f.read())
+        metadata = json.loads(data)
+        with self._locked():
+            if path not in self._metadata:
+                self._metadata[path] = (metadata, len(data))
+                self._metadata_bytes += len(data)
+                while self._metadata_bytes > METADATA_CACHE_BYTES and len(self._metadata) > 1:
+                    _, (_, size) = self._metadata.popitem(last=False)
+                    self._metadata_bytes -= size
+        return metadata
+
+    def get_thumbnail(self, relative_path: str) -> Optional[str]:
+        """Path of an MP4's first-frame PNG; None if no frame can be decoded."""
+        return self._artifact(relative_path, '.png', render_video_thumbnail)
+
+    def status(self) -> Dict:
+        with self._locked():
+            return {"files": len(self._records), "pending": len(self._pending)}
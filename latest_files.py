@@ -0,0 +1,70 @@
+import heapq
+import threading
+from collections import deque
+from typing import List, Optional
+from source_watcher import SourceWatcher
+
+
+class LatestFiles:
+    """
+    Bounded newest-first list of a source's files, across all subdirectories.
+
+    Seeded once from the watcher snapshot (newest by mtime), then kept current
+    by watcher events: a created or modified file moves to the front and the
+    oldest entry falls off the end, so reading the newest N files costs O(N)
+    regardless of library size. If deletions drain it below half capacity it
+    is reseeded from the snapshot on the next read.
+    """
+
+    CAPACITY = 1000
+
+    def __init__(self, watcher: SourceWatcher, capacity: int = CAPACITY):
+        self.watcher = watcher
+        self.capacity = capacity
+        self._files: deque = deque(maxlen=capacity)
+        self._seeded = False
+        self._lock = threading.Lock()
+        watcher.add_listener(self._on_file_event)
+
+    def _on_file_event(self, event: str, relative_path: str, previous_path: Optional[str]):
+        with self._lock:
+            if event == 'moved':
+                try:
+                    self._files[self._files.index(previous_path)] = relative_path
+                except ValueError:
+                    pass
+                return
+            try:
+                self._files.remove(relative_path)
+            except ValueError:
+                pass
+            if event != 'deleted':
+                self._files.appendleft(relative_path)
+            elif self._seeded and len(self._files) < self.capacity // 2:
+                self._seeded = False
+
+    def _seed(self):
+        # Snapshot before taking our lock: listeners hold the watcher lock while taking ours
+        files = self.watcher.snapshot()
+        newest = heapq.nlargest(self.capacity, files.items(), key=lambda item: item[1][1])
+        with self._lock:
+            # Keep files that arrived since the snapshot in front of the seeded ones
+            arrived = [path for path in self._files if path not in files]
+            self._files.clear()
+            self._files.extend(arrived)
+            self._files.extend(path for path, _ in newest[:self.capacity - len(arrived)])
+            self._seeded = True
+
+    def latest(self, limit: int, subpath: str = "") -> List[str]:
+        """Return up to limit relative paths, newest first, optionally below a subpath."""
+        if not self._seeded and self.watcher.ready:
+            self._seed()
+        prefix = subpath.strip('/') + '/' if subpath.strip('/') else ''
+        with self._lock:
+            result = []
+            for path in self._files:
+                if path.startswith(prefix):
+                    result.append(path)
+                    if len(result) >= limit:
+                        break
+            return result
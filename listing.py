@@ -0,0 +1,208 @@
+import fnmatch
+import os
+import threading
+import urllib.parse
+from typing import Dict, FrozenSet, Iterator, List, Optional
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+
+
+def scan_directory(directory: str, excluded_names: FrozenSet[str] = frozenset()) -> Iterator[Dict]:
+    """
+    Recursively yield every file below a directory using os.scandir.
+
+    Entries are yielded as soon as they are found so callers can start
+    consuming the listing before the whole tree has been enumerated.
+
+    Args:
+        directory (str): Root directory to scan
+        excluded_names: File names to leave out of the listing (e.g. sidecar files)
+
+    Yields:
+        dict: {'path': relative path with forward slashes, 'size': bytes, 'mtime': float}
+    """
+    stack = [(directory, '')]
+    while stack:
+        current, prefix = stack.pop()
+        subdirs = []
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append((entry.path, prefix + entry.name + '/'))
+                            continue
+                        if not entry.is_file() or entry.name in excluded_names:
+                            continue
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    yield {'path': prefix + entry.name, 'size': stat.st_size, 'mtime': stat.st_mtime}
+        except (PermissionError, FileNotFoundError, NotADirectoryError):
+            continue
+        # Pop subdirectories in name order so listings are stable between scans
+        subdirs.sort(reverse=True)
+        stack.extend(subdirs)
+
+
+def make_entry(relative_path: str, size: int, mtime: float, directory_index: int) -> Dict:
+    """Build a listing entry in the format returned by serve.py."""
+    return {
+        'name': urllib.parse.quote(relative_path),  # URL-encode the path
+        'size': size,
+        'mtime': mtime,
+        'directory_index': directory_index
+    }
+
+
+class _ListingEventHandler(FileSystemEventHandler):
+    def __init__(self, listing, index: int):
+        self.listing = listing
+        self.index = index
+
+    def on_created(self, event):
+        if event.is_directory:
+            self.listing.invalidate(self.index)
+        else:
+            self.listing.update_file(self.index, event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.listing.update_file(self.index, event.src_path)
+
+    def on_deleted(self, event):
+        if event.is_directory:
+            self.listing.invalidate(self.index)
+        else:
+            self.listing.remove_file(self.index, event.src_path)
+
+    def on_moved(self, event):
+        if event.is_directory:
+            self.listing.invalidate(self.index)
+        else:
+            self.listing.remove_file(self.index, event.src_path)
+            self.listing.update_file(self.index, event.dest_path)
+
+
+class FileListing:
+    """
+    Cached recursive file listing for a set of served directories.
+
+    Each directory is scanned once with os.scandir and kept in memory.
+    A watchdog observer keeps the cache current by applying file events
+    incrementally; directory-level events drop that directory's cache so
+    it is rebuilt on the next request.
+    """
+
+    def __init__(self, directories: List[str], excluded_names: FrozenSet[str] = frozenset()):
+        self.directories = [os.path.abspath(d) for d in directories]
+        self.excluded_names = frozenset(excluded_names)
+        self._cache: Dict[int, Dict[str, Dict]] = {}
+        self._generation: Dict[int, int] = {i: 0 for i in range(len(self.directories))}
+        self._lock = threading.Lock()
+        self._observer: Optional[Observer] = None
+
+    def start_watching(self):
+        """Start a watchdog observer that keeps the cached listings current."""
+        if self._observer is not None:
+            return
+        observer = Observer()
+        for index, directory in enumerate(self.directories):
+            observer.schedule(_ListingEventHandler(self, index), directory, recursive=True)
+        observer.daemon = True
+        observer.start()
+        self._observer = observer
+
+    def stop_watching(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+    def invalidate(self, index: int):
+        """Drop the cached listing for one directory."""
+        with self._lock:
+            self._cache.pop(index, None)
+            self._generation[index] += 1
+
+    def _relative_path(self, index: int, full_path: str) -> Optional[str]:
+        directory = self.directories[index]
+        if not full_path.startswith(directory + os.sep):
+            return None
+        if os.path.basename(full_path) in self.excluded_names:
+            return None
+        return os.path.relpath(full_path, directory).replace(os.sep, '/')
+
+    def update_file(self, index: int, full_path: str):
+        """Refresh a single file's entry after a create/modify event."""
+        relative_path = self._relative_path(index, full_path)
+        if relative_path is None:
+            return
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            self.remove_file(index, full_path)
+            return
+        with self._lock:
+            files = self._cache.get(index)
+            if files is not None:
+                files[relative_path] = make_entry(relative_path, stat.st_size, stat.st_mtime, index)
+            else:
+                # A scan may be running; make sure it does not publish stale results
+                self._generation[index] += 1
+
+    def remove_file(self, index: int, full_path: str):
+        """Remove a single file's entry after a delete/move event."""
+        relative_path = self._relative_path(index, full_path)
+        if relative_path is None:
+            return
+        with self._lock:
+            files = self._cache.get(index)
+            if files is not None:
+                files.pop(relative_path, None)
+            else:
+                self._generation[index] += 1
+
+    def iter_directory(self, index: int) -> Iterator[Dict]:
+        """
+        Yield listing entries for one directory.
+
+        Served from the cache when warm; otherwise entries are yielded while
+        the directory is being scanned and the cache is filled at the end.
+        """
+        with self._lock:
+            files = self._cache.get(index)
+            snapshot = list(files.values()) if files is not None else None
+            generation = self._generation[index]
+        if snapshot is not None:
+            yield from snapshot
+            return
+
+        scanned: Dict[str, Dict] = {}
+        for item in scan_directory(self.directories[index], self.excluded_names):
+            entry = make_entry(item['path'], item['size'], item['mtime'], index)
+            scanned[item['path']] = entry
+            yield entry
+
+        with self._lock:
+            # Only publish the scan if nothing invalidated it while we were walking
+            if self._generation[index] == generation:
+                self._cache[index] = scanned
+
+    def iter_files(self, directory_index: Optional[int] = None, pattern: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Yield listing entries, optionally restricted to one directory and a glob.
+
+        Args:
+            directory_index: Only list this directory (all directories if None)
+            pattern: fnmatch-style glob matched against the decoded relative path
+        """
+        if directory_index is None:
+            indices = range(len(self.directories))
+        else:
+            indices = [directory_index]
+        for index in indices:
+            for entry in self.iter_directory(index):
+                if pattern and not fnmatch.fnmatch(urllib.parse.unquote(entry['name']), pattern):
+                    continue
+                yield entry
@@ -0,0 +1,205 @@
+import json
+import os
+import subprocess
+from datetime import datetime
+from typing import Dict
+from image_chunks import read_image_text
+from mp4 import read_mp4_info
+
+IMAGE_EXTENSIONS = ('.webp', '.png', '.jpg', '.jpeg')
+
+def try_parse_json(value):
+    """Try to parse a string as JSON, return original if it fails."""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except:
+            return value
+    return value
+
+def decode_value(value):
+    """Decode bytes to string if needed."""
+    if isinstance(value, bytes):
+        try:
+            return value.decode('utf-8', errors='ignore')
+        except:
+            return str(value)
+    return value
+
+def _add_text_metadata(metadata: Dict, items):
+    # Look for known workflow/generation keys
+    workflow_keys = ['workflow', 'prompt', 'Workflow', 'Prompt']
+    parameter_keys = ['parameters', 'Parameters', 'Dream', 'invokeai_metadata', 'sd-metadata']
+
+    for key, value in items:
+        decoded_value = decode_value(value)
+        parsed_value = try_parse_json(decoded_value)
+
+        # Prioritize workflow/generation data
+        if key in workflow_keys:
+            metadata[f"🔧 {key}"] = parsed_value
+        elif key in parameter_keys:
+            metadata[f"⚙️ {key}"] = parsed_value
+        else:
+            # Store other metadata
+            if "_other" not in metadata:
+                metadata["_other"] = {}
+            metadata["_other"][key] = parsed_value
+
+def _add_exif_metadata(metadata: Dict, exif):
+    from PIL.ExifTags import TAGS
+
+    exif_data = {}
+    for tag_id, value in exif.items():
+        tag = TAGS.get(tag_id, tag_id)
+        decoded_value = decode_value(value)
+        # Try to parse as JSON for UserComment and other fields
+        if tag in ['UserComment', 'ImageDescription', 'XPComment']:
+            decoded_value = try_parse_json(decoded_value)
+        exif_data[str(tag)] = decoded_value
+
+    if exif_data:
+        metadata["_exif"] = exif_data
+
+def _extract_image_metadata(file_path: str, metadata: Dict):
+    # PNG text chunks and WebP EXIF/XMP are read straight from the file, without opening the image
+    chunks = read_image_text(file_path) if file_path.lower().endswith(('.png', '.webp')) else None
+    if isinstance(chunks, dict):
+        metadata["_basic"] = {
+            "Format": chunks["format"],
+            "Mode": chunks["mode"],
+            "Size": f"{chunks['width']} × {chunks['height']}"
+        }
+        items = list(chunks["text"].items())
+        if chunks.get("xmp"):
+            items.append(("xmp", chunks["xmp"]))
+        _add_text_metadata(metadata, items)
+        _add_exif_metadata(metadata, chunks["exif"])
+        return
+
+    from PIL import Image
+
+    with Image.open(file_path) as img:
+        # Basic image info
+        metadata["_basic"] = {
+            "Format": img.format,
+            "Mode": img.mode,
+            "Size": f"{img.width} × {img.height}"
+        }
+
+        # Extract PNG info (this is where ComfyUI/InvokeAI store workflow data)
+        if hasattr(img, 'info') and img.info:
+            _add_text_metadata(metadata, img.info.items())
+
+        # Try to get EXIF data (some tools store data here too)
+        exif = img.getexif()
+        if exif:
+            _add_exif_metadata(metadata, exif)
+
+def _extract_mp4_metadata(file_path: str, metadata: Dict, include_ffprobe: bool):
+    # Stream parameters and tags in one pass over the moov box
+    info = read_mp4_info(file_path)
+    if isinstance(info, dict):
+        basic = {
+            "Format": "MP4",
+            "Size": f"{info['width']} × {info['height']}",
+            "FPS": f"{info['frame_rate']:.2f}",
+            "Frame Count": str(info['frame_count']),
+            "Duration": f"{info['duration_ms'] / 1000:.2f}s"
+        }
+        if info['video_codec']:
+            basic["Video Codec"] = info['video_codec']
+        if info['audio_codec']:
+            basic["Audio Codec"] = info['audio_codec']
+        metadata["_basic"] = basic
+
+        # Look for workflow data in various MP4 tags
+        workflow_keys = ['workflow', 'prompt', 'Workflow', 'Prompt', '©cmt', 'desc', 'comment']
+        parameter_keys = ['parameters', 'Parameters']
+
+        for key, value in info['tags'].items():
+            parsed_value = try_parse_json(str(value))
+
+            # Check if this is workflow/generation data
+            if any(wk.lower() in key.lower() for wk in workflow_keys):
+                metadata[f"🔧 {key}"] = parsed_value
+            elif any(pk.lower() in key.lower() for pk in parameter_keys):
+                metadata[f"⚙️ {key}"] = parsed_value
+            else:
+                # Store in other metadata
+                if "_mp4_tags" not in metadata:
+                    metadata["_mp4_tags"] = {}
+                metadata["_mp4_tags"][key] = parsed_value
+    else:
+        print(f"Error reading MP4 boxes of {file_path}: {info}")
+
+    # ffprobe is opt-in, and only asked when the boxes held no workflow or parameters
+    if not include_ffprobe or any(key.startswith(("🔧", "⚙️")) for key in metadata):
+        return
+
+    # Try using ffprobe for more comprehensive metadata extraction
+    try:
+        result = subprocess.run(
+            ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', file_path],
+            capture_output=True,
+            text=True,
+            timeout=5
+        )
+
+        if result.returncode == 0:
+            ffprobe_data = json.loads(result.stdout)
+            if 'format' in ffprobe_data and 'tags' in ffprobe_data['format']:
+                tags = ffprobe_data['format']['tags']
+
+                for key, value in tags.items():
+                    parsed_value = try_parse_json(value)
+
+                    # Look for workflow keywords in key names
+                    key_lower = key.lower()
+                    if any(wk in key_lower for wk in ['workflow', 'prompt', 'comfy']):
+                        metadata[f"🔧 {key}"] = parsed_value
+                    elif any(pk in key_lower for pk in ['parameter', 'setting']):
+                        metadata[f"⚙️ {key}"] = parsed_value
+                    elif "_ffprobe_tags" not in metadata:
+                        metadata["_ffprobe_tags"] = {}
+                        metadata["_ffprobe_tags"][key] = parsed_value
+                    else:
+                        metadata["_ffprobe_tags"][key] = parsed_value
+    except FileNotFoundError:
+        # ffprobe not available
+        pass
+    except Exception as e:
+        print(f"Error extracting metadata with ffprobe: {e}")
+        pass
+
+def extract_media_metadata(file_path: str, include_ffprobe: bool = False) -> Dict:
+    """
+    Extract display metadata for a media file, including workflow JSON.
+
+    Workflow/generation entries are keyed with a 🔧 or ⚙️ prefix; everything
+    else is grouped under underscore-prefixed sections such as "_basic".
+
+    Args:
+        file_path: Path to the media file
+        include_ffprobe: Query ffprobe for MP4 container tags the box reader found none of
+
+    Returns:
+        dict: Metadata sections as returned by the /metadata route
+    """
+    file_ext = os.path.splitext(file_path)[1].lower()
+    metadata = {}
+
+    # Extract metadata based on file type
+    if file_ext in IMAGE_EXTENSIONS:
+        _extract_image_metadata(file_path, metadata)
+    elif file_ext == '.mp4':
+        _extract_mp4_metadata(file_path, metadata, include_ffprobe)
+
+    # Add file system metadata to _basic section
+    file_stat = os.stat(file_path)
+    if "_basic" not in metadata:
+        metadata["_basic"] = {}
+    metadata["_basic"]["File Size"] = f"{file_stat.st_size:,} bytes"
+    metadata["_basic"]["Modified"] = datetime.fromtimestamp(file_stat.st_mtime).strftime("%Y-%m-%d %H:%M:%S")
+
+    return metadata
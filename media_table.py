@@ -0,0 +1,435 @@
+import json
+import os
+import queue
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from images import get_image_metadata
+from mp3 import extract_mp3_metadata
+from mp4 import extract_mp4_metadata
+from webp import extract_webp_animation_metadata
+from source_watcher import SourceWatcher
+
+# Numeric columns and their dtypes; frames == -1 marks a row whose media has not been probed yet
+COLUMNS = {
+    'dir_id': np.int32,
+    'ext': np.int16,
+    'size': np.int64,
+    'mtime': np.float64,
+    'width': np.int32,
+    'height': np.int32,
+    'duration': np.float32,
+    'frames': np.int32,
+    'rating': np.int8,
+}
+PROBED_COLUMNS = ('width', 'height', 'duration', 'frames')
+SORT_COLUMNS = {
+    'date': 'mtime', 'size': 'size', 'width': 'width', 'height': 'height',
+    'duration': 'duration', 'frames': 'frames', 'rating': 'rating', 'ext': 'ext',
+}
+
+
+def probe_media(file_path: str) -> Tuple[int, int, float, int]:
+    """
+    Read (width, height, duration_seconds, frames) using the gallery's header parsers.
+
+    Values that do not apply to a media type (e.g. width of an MP3) are 0;
+    -1 marks a file that could not be parsed.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == '.webp':
+        metadata = extract_webp_animation_metadata(file_path)
+        if isinstance(metadata, dict):
+            width, height = metadata['width'], metadata['height']
+            if width is None:
+                # Simple (non-VP8X) WebP files carry their size in the VP8/VP8L bitstream
+                from PIL import Image
+                with Image.open(file_path) as image:
+                    width, height = image.size
+            return width, height, metadata['total_duration_ms'] / 1000, max(metadata['frame_count'], 1)
+    elif ext in ('.png', '.jpg', '.jpeg'):
+        metadata = get_image_metadata(file_path)
+        if isinstance(metadata, dict):
+            return metadata['width'], metadata['height'], 0.0, 1
+    elif ext == '.mp4':
+        metadata = extract_mp4_metadata(file_path)
+        if isinstance(metadata, dict):
+            duration = metadata['duration_ms'] / 1000
+            return metadata['width'], metadata['height'], duration, int(round(duration * metadata['frame_rate']))
+    elif ext == '.mp3':
+        metadata = extract_mp3_metadata(file_path)
+        if isinstance(metadata, dict) and 'error' not in metadata:
+            return 0, 0, float(metadata['duration_seconds']), 0
+    return -1, -1, -1.0, -1
+
+
+class MediaTable:
+    """
+    Columnar, NumPy-backed table of every media file in one source.
+
+    One row per file with integer/float columns (directory id, extension code,
+    size, mtime, width, height, duration, frames, rating) and a tag bitset, so
+    combined filters and sorts are vectorized array operations. Rows are dense:
+    removing a file moves the last row into its slot.
+
+    Rows appear as soon as the SourceWatcher reports a file; dimensions and
+    durations are probed on a background thread and cached in a JSON sidecar
+    keyed on size+mtime. Ratings and tags are pushed in by the source's
+    RatingsManager/TagsManager listeners.
+    """
+
+    TABLE_FILE = ".media_table.json"
+    TABLE_VERSION = 1
+    SAVE_DELAY = 10.0  # Seconds to batch probe results before writing the sidecar
+
+    def __init__(self, watcher: SourceWatcher, ratings_manager=None, tags_manager=None):
+        self.watcher = watcher
+        self.directory = watcher.directory
+        self.ratings_manager = ratings_manager
+        self.tags_manager = tags_manager
+        self.table_path = os.path.join(self.directory, self.TABLE_FILE)
+        self._rows: Dict[str, int] = {}
+        self._paths: List[str] = []
+        self._columns = {name: np.zeros(1024, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self._tag_bits = np.zeros((1024, 1), dtype=np.uint64)
+        self._tag_ids: Dict[str, int] = {}
+        self._tag_names: List[str] = []
+        self._dir_ids: Dict[str, int] = {}
+        self._dir_names: List[str] = []
+        self._ext_codes: Dict[str, int] = {}
+        self._ext_names: List[str] = []
+        self._name_rank: Optional[np.ndarray] = None
+        self._version = 0
+        self._probe_cache: Dict[str, List] = {}
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._save_timer: Optional[threading.Timer] = None
+        self._ready = threading.Event()
+        watcher.add_listener(self._on_file_event)
+        if ratings_manager is not None:
+            ratings_manager.add_listener(self._on_rating_changed)
+        if tags_manager is not None:
+            tags_manager.add_listener(self._on_tags_changed)
+
+    @property
+    def ready(self) -> bool:
+        """True once every file in the source has a row (probing may still be running)."""
+        return self._ready.is_set()
+
+    @property
+    def version(self) -> int:
+        """Incremented on every change to the table; query results only change when it does."""
+        return self._version
+
+    # ─── Persistence ─────────────────────────────────────────
+
+    def _load(self):
+        if not os.path.exists(self.table_path):
+            return
+        try:
+            with open(self.table_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.TABLE_VERSION:
+                self._probe_cache = data['files']
+        except (json.JSONDecodeError, IOError, KeyError) as e:
+            print(f"Error loading media table from {self.table_path}: {e}")
+
+    def _schedule_save_unsafe(self):
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.SAVE_DELAY, self.save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def save(self) -> bool:
+        with self._lock:
+            self._save_timer = None
+            count = len(self._paths)
+            columns = [self._columns[name][:count].tolist() for name in ('size', 'mtime') + PROBED_COLUMNS]
+            files = {
+                path: [column[row] for column in columns]
+                for row, path in enumerate(self._paths) if columns[5][row] != -1
+            }
+        try:
+            temp_path = self.table_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.TABLE_VERSION, 'files': files}, f)
+            os.replace(temp_path, self.table_path)
+            return True
+        except IOError as e:
+            print(f"Error saving media table to {self.table_path}: {e}")
+            return False
+
+    # ─── Row maintenance ─────────────────────────────────────
+
+    def start(self):
+        """Fill the table from the watcher, then probe unprobed files in the background."""
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        self._load()
+        self.watcher.wait_ready()
+        files = self.watcher.snapshot()
+        with self._lock:
+            for path, (size, mtime) in files.items():
+                if path not in self._rows:
+                    self._insert_unsafe(path, size, mtime)
+            unprobed = [path for path, row in self._rows.items() if self._columns['frames'][row] == -1]
+        self._probe_cache = {}
+        self._ready.set()
+        for path in unprobed:
+            self._queue.put(path)
+        while True:
+            self._probe(self._queue.get())
+
+    def _on_file_event(self, event: str, relative_path: str, previous_path: Optional[str]):
+        with self._lock:
+            self._version += 1
+            if event == 'deleted':
+                self._remove_unsafe(relative_path)
+                return
+            if event == 'moved' and previous_path in self._rows:
+                self._remove_unsafe(relative_path)
+                self._rename_unsafe(previous_path, relative_path)
+                # The stores may have renamed their keys (and notified) before this event arrived
+                row = self._rows[relative_path]
+                if self.ratings_manager:
+                    self._columns['rating'][row] = self.ratings_manager.get_rating(relative_path)
+                if self.tags_manager:
+                    self._set_tags_unsafe(row, self.tags_manager.get_tags(relative_path))
+                return
+            entry = self.watcher.get_entry(relative_path)
+            if entry is None:
+                return
+            self._remove_unsafe(relative_path)
+            self._insert_unsafe(relative_path, *entry)
+        self._queue.put(relative_path)
+
+    def _on_rating_changed(self, filename: str):
+        with self._lock:
+            self._version += 1
+            row = self._rows.get(filename)
+            if row is not None:
+                self._columns['rating'][row] = self.ratings_manager.get_rating(filename)
+
+    def _on_tags_changed(self, filename: str):
+        with self._lock:
+            self._version += 1
+            row = self._rows.get(filename)
+            if row is not None:
+                self._set_tags_unsafe(row, self.tags_manager.get_tags(filename))
+
+    def _grow_unsafe(self):
+        capacity = len(self._columns['size'])
+        for name, column in self._columns.items():
+            self._columns[name] = np.concatenate([column, np.zeros(capacity, dtype=column.dtype)])
+        self._tag_bits = np.concatenate([self._tag_bits, np.zeros_like(self._tag_bits)])
+
+    def _code_unsafe(self, codes: Dict[str, int], names: List[str], value: str) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(names)
+            names.append(value)
+        return code
+
+    def _tag_id_unsafe(self, tag: str) -> int:
+        tag_id = self._code_unsafe(self._tag_ids, self._tag_names, tag)
+        if tag_id >= self._tag_bits.shape[1] * 64:
+            self._tag_bits = np.hstack([self._tag_bits, np.zeros((len(self._tag_bits), 1), dtype=np.uint64)])
+        return tag_id
+
+    def _set_tags_unsafe(self, row: int, tags: Iterable[str]):
+        self._tag_bits[row] = 0
+        for tag in tags:
+            tag_id = self._tag_id_unsafe(tag)
+            self._tag_bits[row, tag_id // 64] |= np.uint64(1 << (tag_id % 64))
+
+    def _set_path_unsafe(self, row: int, path: str):
+        directory, _, _ = path.rpartition('/')
+        ext = os.path.splitext(path)[1].lower()
+        self._columns['dir_id'][row] = self._code_unsafe(self._dir_ids, self._dir_names, directory)
+        self._columns['ext'][row] = self._code_unsafe(self._ext_codes, self._ext_names, ext)
+        self._name_rank = None
+
+    def _insert_unsafe(self, path: str, size: int, mtime: float):
+        row = len(self._paths)
+        if row == len(self._columns['size']):
+            self._grow_unsafe()
+        self._rows[path] = row
+        self._paths.append(path)
+        self._set_path_unsafe(row, path)
+        self._columns['size'][row] = size
+        self._columns['mtime'][row] = mtime
+        cached = self._probe_cache.get(path)
+        if cached is not None and cached[0] == size and cached[1] == mtime:
+            probed = cached[2:]
+        else:
+            probed = (-1, -1, -1, -1)
+        for name, value in zip(PROBED_COLUMNS, probed):
+            self._columns[name][row] = value
+        self._columns['rating'][row] = self.ratings_manager.get_rating(path) if self.ratings_manager else 0
+        self._set_tags_unsafe(row, self.tags_manager.get_tags(path) if self.tags_manager else [])
+
+    def _remove_unsafe(self, path: str):
+        row = self._rows.pop(path, None)
+        if row is None:
+            return
+        last = len(self._paths) - 1
+        if row != last:
+            moved = self._paths[last]
+            self._paths[row] = moved
+            self._rows[moved] = row
+            for column in self._columns.values():
+                column[row] = column[last]
+            self._tag_bits[row] = self._tag_bits[last]
+        self._paths.pop()
+        self._name_rank = None
+
+    def _rename_unsafe(self, old_path: str, new_path: str):
+        row = self._rows.pop(old_path)
+        self._rows[new_path] = row
+        self._paths[row] = new_path
+        self._set_path_unsafe(row, new_path)
+
+    def _probe(self, relative_path: str):
+        with self._lock:
+            row = self._rows.get(relative_path)
+            if row is None or self._columns['frames'][row] != -1:
+                return
+            stamp = (int(self._columns['size'][row]), float(self._columns['mtime'][row]))
+        try:
+            probed = probe_media(os.path.join(self.directory, relative_path))
+        except Exception as e:
+            print(f"Error probing {relative_path}: {e}")
+            probed = (-1, -1, -1.0, -1)
+        with self._lock:
+            row = self._rows.get(relative_path)
+            if row is None or (self._columns['size'][row], self._columns['mtime'][row]) != stamp:
+                return
+            for name, value in zip(PROBED_COLUMNS, probed):
+                self._columns[name][row] = value
+            self._version += 1
+            # Unparseable files keep width -1 but are marked as probed via frames
+            if probed[0] == -1:
+                self._columns['frames'][row] = 0
+            self._schedule_save_unsafe()
+
+    # ─── Queries ─────────────────────────────────────────────
+
+    def status(self) -> Dict:
+        with self._lock:
+            count = len(self._paths)
+            unprobed = int(np.count_nonzero(self._columns['frames'][:count] == -1))
+        return {"files": count, "unprobed": unprobed, "ready": self.ready}
+
+    def _tag_mask_unsafe(self, tags: Iterable[str]) -> Optional[np.ndarray]:
+        """Per-word bit mask for a set of tags; None if any tag is unknown."""
+        mask = np.zeros(self._tag_bits.shape[1], dtype=np.uint64)
+        for tag in tags:
+            tag_id = self._tag_ids.get(tag)
+            if tag_id is None:
+                return None
+            mask[tag_id // 64] |= np.uint64(1 << (tag_id % 64))
+        return mask
+
+    def _dir_mask_unsafe(self, count: int, subpath: str, recursive: bool) -> np.ndarray:
+        subpath = subpath.strip('/')
+        dir_ids = self._columns['dir_id'][:count]
+        if recursive:
+            if not subpath:
+                return np.ones(count, dtype=bool)
+            prefix = subpath + '/'
+            matching = [i for i, name in enumerate(self._dir_names) if name == subpath or name.startswith(prefix)]
+            return np.isin(dir_ids, matching)
+        dir_id = self._dir_ids.get(subpath)
+        if dir_id is None:
+            return np.zeros(count, dtype=bool)
+        return dir_ids == dir_id
+
+    def _filter_unsafe(self, subpath: str = "", recursive: bool = False,
+                       extensions: Optional[Iterable[str]] = None,
+                       rating: Optional[int] = None, rating_min: Optional[int] = None,
+                       rating_max: Optional[int] = None,
+                       tags_all: Iterable[str] = (), tags_any: Iterable[str] = (), tags_none: Iterable[str] = (),
+                       min_width: Optional[int] = None, max_width: Optional[int] = None,
+                       min_height: Optional[int] = None, max_height: Optional[int] = None,
+                       min_duration: Optional[float] = None, max_duration: Optional[float] = None) -> np.ndarray:
+        count = len(self._paths)
+        columns = {name: column[:count] for name, column in self._columns.items()}
+        mask = self._dir_mask_unsafe(count, subpath, recursive)
+
+        if extensions:
+            codes = [self._ext_codes[e] for e in (x.lower() for x in extensions) if e in self._ext_codes]
+            mask &= np.isin(columns['ext'], codes)
+        if rating is not None:
+            mask &= columns['rating'] == rating
+        if rating_min is not None:
+            mask &= columns['rating'] >= rating_min
+        if rating_max is not None:
+            mask &= columns['rating'] <= rating_max
+        for name, low, high in (('width', min_width, max_width), ('height', min_height, max_height),
+                                ('duration', min_duration, max_duration)):
+            if low is not None:
+                mask &= columns[name] >= low
+            if high is not None:
+                mask &= (columns[name] <= high) & (columns[name] >= 0)
+
+        bits = self._tag_bits[:count]
+        tags_all, tags_any, tags_none = set(tags_all), set(tags_any), set(tags_none)
+        if tags_all:
+            required = self._tag_mask_unsafe(tags_all)
+            if required is None:
+                return np.zeros(count, dtype=bool)
+            mask &= np.all((bits & required) == required, axis=1)
+        if tags_any:
+            known = [t for t in tags_any if t in self._tag_ids]
+            any_mask = self._tag_mask_unsafe(known)
+            mask &= np.any((bits & any_mask) != 0, axis=1)
+        if tags_none:
+            excluded = self._tag_mask_unsafe(t for t in tags_none if t in self._tag_ids)
+            mask &= np.all((bits & excluded) == 0, axis=1)
+        return mask
+
+    def _sort_unsafe(self, rows: np.ndarray, sort_by: str, reverse: bool) -> np.ndarray:
+        if sort_by == 'filename':
+            if self._name_rank is None:
+                names = np.array([p.lower() for p in self._paths], dtype=object)
+                self._name_rank = np.empty(len(names), dtype=np.int64)
+                self._name_rank[np.argsort(names, kind='stable')] = np.arange(len(names))
+            keys = self._name_rank[rows]
+        elif sort_by == 'resolution':
+            keys = self._columns['width'][rows].astype(np.int64) * self._columns['height'][rows]
+        else:
+            keys = self._columns[SORT_COLUMNS.get(sort_by, 'mtime')][rows]
+        order = np.argsort(keys, kind='stable')
+        if reverse:
+            order = order[::-1]
+        return rows[order]
+
+    def query(self, sort_by: str = 'date', reverse: bool = False, **filters) -> List[str]:
+        """
+        Return relative paths of files matching every filter, sorted by a column.
+
+        Filters: subpath/recursive, extensions, rating (exact), rating_min/rating_max,
+        tags_all/tags_any/tags_none, min_/max_width, min_/max_height,
+        min_/max_duration. sort_by is 'filename', 'resolution' or any key of SORT_COLUMNS.
+        """
+        with self._lock:
+            rows = np.flatnonzero(self._filter_unsafe(**filters))
+            rows = self._sort_unsafe(rows, sort_by, reverse)
+            return [self._paths[row] for row in rows.tolist()]
+
+    def tag_counts(self, **filters) -> Dict[str, int]:
+        """Count files per tag among the rows matching the filters."""
+        with self._lock:
+            bits = self._tag_bits[:len(self._paths)][self._filter_unsafe(**filters)]
+            if not len(bits) or not self._tag_names:
+                return {}
+            counts = np.unpackbits(bits.view(np.uint8), axis=1, bitorder='little').sum(axis=0)
+            return {name: int(counts[i]) for i, name in enumerate(self._tag_names) if counts[i]}
+
+    def extension_counts(self, **filters) -> Dict[str, int]:
+        """Count files per extension among the rows matching the filters."""
+        with self._lock:
+            codes = self._columns['ext'][:len(self._paths)][self._filter_unsafe(**filters)]
+            counts = np.bincount(codes, minlength=len(self._ext_names))
+            return {name: int(counts[i]) for i, name in enumerate(self._ext_names) if counts[i] and name}
@@ -1,8 +1,7 @@
-from mutagen.mp3 import MP3
-
-
 def extract_mp3_metadata(filepath: str) -> dict:
     """Extract metadata from an MP3 file using mutagen."""
+    from mutagen.mp3 import MP3
+
     try:
         audio = MP3(filepath)
         return {
@@ -1,10 +1,251 @@
 import os
-import cv2
+import struct
+
+MAX_MOOV_SIZE = 64 * 1024 * 1024  # Larger movie headers are not read into memory
+
+# Boxes whose payload is a plain list of child boxes
+_CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'minf', b'stbl', b'udta', b'edts'}
+
+# Well-known types of an ilst 'data' box
+_DATA_UTF8 = {1, 4}
+_DATA_UTF16 = {2, 5}
+_DATA_IMAGES = {13, 14, 27}
+_DATA_SIGNED = 21
+_DATA_UNSIGNED = 22
+
+
+def _iter_boxes(data, start=0, end=None):
+    """Yield (type, payload start, payload end) for each box in data[start:end]."""
+    end = len(data) if end is None else end
+    pointer = start
+    while pointer + 8 <= end:
+        size, box_type = struct.unpack('>I4s', data[pointer:pointer + 8])
+        header = 8
+        if size == 1:
+            if pointer + 16 > end:
+                return
+            size = struct.unpack('>Q', data[pointer + 8:pointer + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - pointer
+        if size < header or pointer + size > end:
+            return
+        yield box_type, pointer + header, pointer + size
+        pointer += size
+
+
+def _find_moov(f, file_size):
+    """Read the moov box, seeking past mdat and anything else at the top level."""
+    offset = 0
+    while offset + 8 <= file_size:
+        f.seek(offset)
+        header = f.read(16)
+        size, box_type = struct.unpack('>I4s', header[:8])
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', header[8:16])[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - offset
+        if size < header_size:
+            return None
+        if box_type == b'moov':
+            if size > MAX_MOOV_SIZE:
+                return None
+            f.seek(offset + header_size)
+            return f.read(size - header_size)
+        offset += size
+    return None
+
+
+def _decode_data(item_type, data, start, end):
+    """Value of the first 'data' box of an ilst item, or None."""
+    for box_type, payload, box_end in _iter_boxes(data, start, end):
+        if box_type != b'data' or box_end - payload < 8:
+            continue
+        kind = struct.unpack('>I', data[payload:payload + 4])[0] & 0xFFFFFF
+        value = data[payload + 8:box_end]
+        if kind in _DATA_UTF8:
+            return value.decode('utf-8', errors='ignore')
+        if kind in _DATA_UTF16:
+            return value.decode('utf-16-be', errors='ignore')
+        if kind in (_DATA_SIGNED, _DATA_UNSIGNED) and len(value) in (1, 2, 4, 8):
+            return int.from_bytes(value, 'big', signed=kind == _DATA_SIGNED)
+        if kind in _DATA_IMAGES:
+            return f"<{len(value)} bytes image>"
+        if item_type in ('trkn', 'disk') and len(value) >= 6:
+            number, total = struct.unpack('>HH', value[2:6])
+            return f"{number}/{total}"
+        return value.decode('utf-8', errors='ignore')
+    return None
+
+
+def _read_string_box(data, start, end):
+    # 'mean' and 'name' are full boxes: 4 bytes of version and flags, then the text
+    return data[start + 4:end].decode('utf-8', errors='ignore')
+
+
+def _parse_meta(data, start, end, tags):
+    """Collect ilst items of a meta box, resolving QuickTime 'keys' indexes to key names."""
+    # ISO meta is a full box; QuickTime's moov/meta is not and starts straight with a child
+    if data[start + 4:start + 8] not in (b'hdlr', b'keys', b'ilst'):
+        start += 4
+    keys = []
+    items = None
+    for box_type, payload, box_end in _iter_boxes(data, start, end):
+        if box_type == b'keys' and box_end - payload >= 8:
+            count = struct.unpack('>I', data[payload + 4:payload + 8])[0]
+            for key_type, key_start, key_end in _iter_boxes(data, payload + 8, box_end):
+                # Each entry is a box whose type is the key namespace ('mdta') and payload the key name
+                keys.append(data[key_start:key_end].decode('utf-8', errors='ignore'))
+                if len(keys) == count:
+                    break
+        elif box_type == b'ilst':
+            items = (payload, box_end)
+    if items is None:
+        return
+    for item_type, payload, box_end in _iter_boxes(data, *items):
+        if item_type == b'----':
+            mean = name = ''
+            for child_type, child_start, child_end in _iter_boxes(data, payload, box_end):
+                if child_type == b'mean':
+                    mean = _read_string_box(data, child_start, child_end)
+                elif child_type == b'name':
+                    name = _read_string_box(data, child_start, child_end)
+            key = f"----:{mean}:{name}"
+        elif keys and 1 <= struct.unpack('>I', item_type)[0] <= len(keys):
+            key = keys[struct.unpack('>I', item_type)[0] - 1]
+        else:
+            key = item_type.decode('latin-1')
+        value = _decode_data(key, data, payload, box_end)
+        if value is not None:
+            tags.setdefault(key, value)
+
+
+def _parse_udta_text(data, start, end, tags):
+    """QuickTime text atoms ('©cmt' and friends) stored directly in udta."""
+    for box_type, payload, box_end in _iter_boxes(data, start, end):
+        if box_type[:1] != b'\xa9' or box_end - payload < 4:
+            continue
+        length = struct.unpack('>H', data[payload:payload + 2])[0]
+        text = data[payload + 4:min(payload + 4 + length, box_end)]
+        tags.setdefault(box_type.decode('latin-1'), text.decode('utf-8', errors='ignore'))
+
+
+def _parse_track(data, start, end):
+    """Handler, codec, dimensions, timescale, duration and sample count of one trak box."""
+    track = {}
+    for box_type, payload, box_end in _iter_boxes(data, start, end):
+        if box_type == b'tkhd':
+            # Width and height are 16.16 fixed point, at the end of the box
+            width, height = struct.unpack('>II', data[box_end - 8:box_end])
+            track['width'], track['height'] = width >> 16, height >> 16
+        elif box_type == b'mdia':
+            for mdia_type, mdia_start, mdia_end in _iter_boxes(data, payload, box_end):
+                if mdia_type == b'mdhd':
+                    if data[mdia_start] == 1:
+                        track['timescale'], track['duration'] = struct.unpack('>IQ', data[mdia_start + 20:mdia_start + 32])
+                    else:
+                        track['timescale'], track['duration'] = struct.unpack('>II', data[mdia_start + 12:mdia_start + 20])
+                elif mdia_type == b'hdlr':
+                    track['handler'] = data[mdia_start + 8:mdia_start + 12]
+                elif mdia_type == b'minf':
+                    _parse_sample_table(data, mdia_start, mdia_end, track)
+    return track
+
+
+def _parse_sample_table(data, start, end, track):
+    for box_type, payload, box_end in _iter_boxes(data, start, end):
+        if box_type in (b'minf', b'stbl'):
+            _parse_sample_table(data, payload, box_end, track)
+        elif box_type == b'stsd' and box_end - payload >= 16:
+            # First sample entry: size, codec fourcc, then for video 24 bytes before width and height
+            track['codec'] = data[payload + 12:payload + 16].decode('latin-1')
+            if payload + 44 <= box_end:
+                track['coded_width'], track['coded_height'] = struct.unpack('>HH', data[payload + 40:payload + 44])
+        elif box_type == b'stts' and box_end - payload >= 8:
+            count = struct.unpack('>I', data[payload + 4:payload + 8])[0]
+            entries = data[payload + 8:min(box_end, payload + 8 + count * 8)]
+            track['samples'] = sum(struct.unpack(f'>{len(entries) // 4}I', entries)[0::2])
+
+
+def read_mp4_info(filename):
+    """
+    Read stream parameters and metadata tags of an MP4 file from its box structure.
+
+    Only the moov box is read: mvhd and each track's tkhd, mdhd, hdlr, stsd
+    and stts give the size, duration, frame count and codecs, and ilst items
+    (iTunes-style udta/meta, QuickTime moov/meta with a keys table, or bare
+    '©xxx' udta atoms) give the tags, keyed as mutagen names them ('©cmt',
+    '----:mean:name') or by their QuickTime key ('comment', 'workflow').
+
+    Args:
+        filename (str): Path to the MP4 file.
+
+    Returns:
+        dict: width, height, duration_ms, frame_rate, frame_count, video_codec,
+            audio_codec (missing values are 0 or None) and tags.
+        str: Error message if the file cannot be processed.
+    """
+    if not os.path.isfile(filename):
+        return f"Error: File '{filename}' not found."
+
+    try:
+        file_size = os.path.getsize(filename)
+        with open(filename, 'rb') as f:
+            moov = _find_moov(f, file_size)
+        if moov is None:
+            return "Error: No readable moov box."
+
+        movie_timescale = movie_duration = 0
+        tracks = []
+        tags = {}
+        for box_type, payload, box_end in _iter_boxes(moov):
+            if box_type == b'mvhd':
+                if moov[payload] == 1:
+                    movie_timescale, movie_duration = struct.unpack('>IQ', moov[payload + 20:payload + 32])
+                else:
+                    movie_timescale, movie_duration = struct.unpack('>II', moov[payload + 12:payload + 20])
+            elif box_type == b'trak':
+                tracks.append(_parse_track(moov, payload, box_end))
+            elif box_type == b'meta':
+                _parse_meta(moov, payload, box_end, tags)
+            elif box_type == b'udta':
+                for udta_type, udta_start, udta_end in _iter_boxes(moov, payload, box_end):
+                    if udta_type == b'meta':
+                        _parse_meta(moov, udta_start, udta_end, tags)
+                _parse_udta_text(moov, payload, box_end, tags)
+
+        video = next((t for t in tracks if t.get('handler') == b'vide'), {})
+        audio = next((t for t in tracks if t.get('handler') == b'soun'), {})
+        if video.get('timescale'):
+            duration_ms = video.get('duration', 0) * 1000 / video['timescale']
+        elif movie_timescale:
+            duration_ms = movie_duration * 1000 / movie_timescale
+        else:
+            duration_ms = 0.0
+        frame_count = video.get('samples', 0)
+        return {
+            "width": video.get('width') or video.get('coded_width', 0),
+            "height": video.get('height') or video.get('coded_height', 0),
+            "duration_ms": duration_ms,
+            "frame_rate": frame_count * 1000 / duration_ms if duration_ms > 0 else 0.0,
+            "frame_count": frame_count,
+            "video_codec": video.get('codec'),
+            "audio_codec": audio.get('codec'),
+            "tags": tags,
+        }
+    except (OSError, struct.error, IndexError) as e:
+        return f"Error: {e}"
 
 
 def extract_mp4_metadata(filename):
     """
-    Extract metadata from an MP4 video file using opencv-python.
+    Extract metadata from an MP4 video file.
+
+    Read from the box structure by read_mp4_info(); files it cannot size
+    (fragmented MP4s, whose samples live in moof boxes) fall back to
+    opencv-python.
 
     Args:
         filename (str): Path to the MP4 file.
@@ -19,6 +260,18 @@ def extract_mp4_metadata(filename):
     if not filename.lower().endswith('.mp4'):
         return "Error: File is not an MP4 video (based on extension)."
 
+    info = read_mp4_info(filename)
+    if isinstance(info, dict) and info['width'] and info['frame_rate'] > 0:
+        return {
+            "file_size": os.path.getsize(filename),
+            "width": info['width'],
+            "height": info['height'],
+            "duration_ms": info['duration_ms'],
+            "frame_rate": info['frame_rate'],
+        }
+
+    import cv2
+
     try:
         cap = cv2.VideoCapture(filename)
         if not cap.isOpened():
@@ -56,6 +309,8 @@ def extract_mp4_first_frame(filename):
     Returns:
         numpy.ndarray: BGR frame, or None on failure.
     """
+    import cv2
+
     try:
         cap = cv2.VideoCapture(filename)
         if not cap.isOpened():
@@ -0,0 +1,237 @@
+import hashlib
+import io
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
+from source_watcher import SourceWatcher
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+PREVIEW_EXTENSIONS = ('.webp', '.mp4')
+PREVIEW_SIZE = 256        # Longest side in pixels
+PREVIEW_FPS = 8           # Frames per second kept from the source
+PREVIEW_SECONDS = 8.0     # Longest stretch of a video that is previewed
+PREVIEW_QUALITY = 60
+
+
+def _encode_frames(frames: List["Image.Image"], durations: List[int]) -> bytes:
+    output = io.BytesIO()
+    frames[0].save(
+        output, format='WEBP', save_all=True, append_images=frames[1:],
+        duration=durations, loop=0, quality=PREVIEW_QUALITY, method=4
+    )
+    return output.getvalue()
+
+
+def _webp_preview(path: str) -> Optional[bytes]:
+    from PIL import Image
+
+    with Image.open(path) as img:
+        if not getattr(img, 'is_animated', False):
+            return None
+        min_interval = 1000 / PREVIEW_FPS
+        frames: List[Image.Image] = []
+        durations: List[int] = []
+        elapsed = 0.0
+        next_sample = 0.0
+        for index in range(img.n_frames):
+            img.seek(index)
+            img.load()  # Frame duration is only filled in once the frame is decoded
+            if elapsed >= next_sample:
+                frame = img.convert('RGBA')
+                frame.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE))
+                frames.append(frame)
+                durations.append(0)
+                next_sample = elapsed + min_interval
+            # Each kept frame lasts until the next kept one
+            frame_duration = img.info.get('duration') or 100
+            durations[-1] += frame_duration
+            elapsed += frame_duration
+    return _encode_frames(frames, durations)
+
+
+def _mp4_preview(path: str) -> Optional[bytes]:
+    import cv2
+    from PIL import Image
+
+    capture = cv2.VideoCapture(path)
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 24.0
+        step = max(1, round(fps / PREVIEW_FPS))
+        frames: List[Image.Image] = []
+        for index in range(int(PREVIEW_SECONDS * fps)):
+            # grab() skips decoding to pixels for the frames we drop
+            if not capture.grab():
+                break
+            if index % step:
+                continue
+            ok, frame = capture.retrieve()
+            if not ok:
+                break
+            image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            image.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE))
+            frames.append(image)
+    finally:
+        capture.release()
+    if not frames:
+        return None
+    return _encode_frames(frames, [round(1000 * step / fps)] * len(frames))
+
+
+def render_preview(path: str) -> Optional[bytes]:
+    """
+    Encode a small, low-framerate animated WebP of an animated WebP or MP4.
+
+    Returns None for files with nothing to animate (still WebPs, unreadable videos).
+    """
+    if path.lower().endswith('.mp4'):
+        return _mp4_preview(path)
+    return _webp_preview(path)
+
+
+class PreviewCache:
+    """
+    Disk cache of hover previews for one source's animated WebPs and MP4s.
+
+    Previews are stored outside the source tree (where the watcher would
+    list them as media) under cache_dir, one file per source file named by a
+    hash of its path, size and mtime, so an edited file never serves a stale
+    preview. A background thread pre-renders missing previews newest first;
+    a request for one that isn't ready renders it immediately, sharing the
+    work with the background thread if it is already underway.
+    """
+
+    def __init__(self, watcher: SourceWatcher, cache_dir: str):
+        self.watcher = watcher
+        source_key = hashlib.sha1(watcher.directory.encode('utf-8')).hexdigest()[:16]
+        self.directory = os.path.join(os.path.abspath(cache_dir), 'previews', source_key)
+        self._keys: Dict[str, str] = {}       # relative path -> preview key for its current size+mtime
+        self._no_preview: Set[str] = set()    # keys of files with nothing to animate
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        watcher.add_listener(self._on_file_event)
+
+    @staticmethod
+    def _key(relative_path: str, size: int, mtime: float) -> str:
+        return hashlib.sha1(f"{relative_path}\0{size}\0{mtime!r}".encode('utf-8')).hexdigest()
+
+    def _preview_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.webp')
+
+    def _remove_unsafe(self, relative_path: str):
+        key = self._keys.pop(relative_path, None)
+        if key is None:
+            return
+        self._no_preview.discard(key)
+        try:
+            os.remove(self._preview_path(key))
+        except OSError:
+            pass
+
+    def _on_file_event(self, event: str, relative_path: str, previous_path: Optional[str]):
+        if not relative_path.lower().endswith(PREVIEW_EXTENSIONS):
+            return
+        with self._lock:
+            if event == 'moved':
+                self._rename_unsafe(previous_path, relative_path)
+                return
+            self._remove_unsafe(relative_path)
+        if event != 'deleted':
+            self._queue.put(relative_path)
+
+    def _rename_unsafe(self, old_path: str, new_path: str):
+        old_key = self._keys.pop(old_path, None)
+        entry = self.watcher.get_entry(new_path)
+        if old_key is None or entry is None:
+            return
+        new_key = self._keys[new_path] = self._key(new_path, *entry)
+        if old_key in self._no_preview:
+            self._no_preview.discard(old_key)
+            self._no_preview.add(new_key)
+            return
+        try:
+            os.replace(self._preview_path(old_key), self._preview_path(new_key))
+        except OSError:
+            pass
+
+    def start(self):
+        """Drop previews of files that changed while stopped, then render the missing ones."""
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.watcher.wait_ready()
+        files = self.watcher.snapshot()
+        candidates = sorted(
+            (path for path in files if path.lower().endswith(PREVIEW_EXTENSIONS)),
+            key=lambda path: files[path][1], reverse=True
+        )
+        with self._lock:
+            for path in candidates:
+                self._keys.setdefault(path, self._key(path, *files[path]))
+            current = set(self._keys.values())
+        for name in os.listdir(self.directory):
+            if name.endswith('.webp') and name[:-len('.webp')] not in current:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+        for path in candidates:
+            self._queue.put(path)
+        while True:
+            relative_path = self._queue.get()
+            try:
+                self.get_preview(relative_path)
+            except Exception as e:
+                print(f"Error rendering preview for {relative_path}: {e}")
+
+    def get_preview(self, relative_path: str) -> Optional[str]:
+        """
+        Return the path of a file's preview, rendering it first if needed.
+
+        Returns None for unknown files and files with nothing to animate.
+        """
+        entry = self.watcher.get_entry(relative_path)
+        if entry is None or not relative_path.lower().endswith(PREVIEW_EXTENSIONS):
+            return None
+        key = self._key(relative_path, *entry)
+        preview_path = self._preview_path(key)
+        with self._lock:
+            if self._keys.get(relative_path) != key:
+                self._remove_unsafe(relative_path)
+                self._keys[relative_path] = key
+            if key in self._no_preview:
+                return None
+            if os.path.exists(preview_path):
+                return preview_path
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                future = self._pending[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            data = render_preview(os.path.join(self.watcher.directory, relative_path))
+            if data is None:
+                with self._lock:
+                    self._no_preview.add(key)
+                result = None
+            else:
+                os.makedirs(self.directory, exist_ok=True)
+                temp_path = preview_path + '.tmp'
+                with open(temp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(temp_path, preview_path)
+                result = preview_path
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
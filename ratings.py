@@ -1,10 +1,17 @@
 import json
 import os
 import threading
-from typing import Dict, Optional
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional
 
 class RatingsManager:
-    """Manages star ratings (0-3) for media files using a JSON file for persistence."""
+    """
+    Manages star ratings (0-3) for media files using a JSON file for persistence.
+
+    ratings.json is read on first use rather than on construction, so a
+    server can start answering before a large library's ratings are parsed;
+    preload() reads it in the background.
+    """
     
     RATINGS_FILE = "ratings.json"
     MIN_RATING = 0  # 0 = unrated
@@ -21,26 +28,46 @@ class RatingsManager:
         self.ratings_path = os.path.join(self.directory, self.RATINGS_FILE)
         self._ratings: Dict[str, int] = {}
         self._lock = threading.Lock()
-        self.load_ratings()
-    
+        self._listeners: List[Callable[[str], None]] = []
+        self._loaded = False
+
+    @contextmanager
+    def _locked(self):
+        """Hold the lock, loading ratings.json first if it has not been read yet."""
+        with self._lock:
+            if not self._loaded:
+                self._load_ratings_unsafe()
+            yield
+
+    def preload(self):
+        """Read ratings.json in a background thread."""
+        def load():
+            with self._locked():
+                pass
+        threading.Thread(target=load, daemon=True).start()
+
     def load_ratings(self) -> Dict[str, int]:
         """Load ratings from the JSON file into memory."""
         with self._lock:
-            if os.path.exists(self.ratings_path):
-                try:
-                    with open(self.ratings_path, 'r', encoding='utf-8') as f:
-                        self._ratings = json.load(f)
-                    # Validate loaded data
-                    self._ratings = {
-                        k: v for k, v in self._ratings.items()
-                        if isinstance(v, int) and self.MIN_RATING <= v <= self.MAX_RATING
-                    }
-                except (json.JSONDecodeError, IOError) as e:
-                    print(f"Error loading ratings from {self.ratings_path}: {e}")
-                    self._ratings = {}
-            else:
+            self._load_ratings_unsafe()
+            return self._ratings.copy()
+
+    def _load_ratings_unsafe(self):
+        self._loaded = True
+        if os.path.exists(self.ratings_path):
+            try:
+                with open(self.ratings_path, 'r', encoding='utf-8') as f:
+                    self._ratings = json.load(f)
+                # Validate loaded data
+                self._ratings = {
+                    k: v for k, v in self._ratings.items()
+                    if isinstance(v, int) and self.MIN_RATING <= v <= self.MAX_RATING
+                }
+            except (json.JSONDecodeError, IOError) as e:
+                print(f"Error loading ratings from {self.ratings_path}: {e}")
                 self._ratings = {}
-        return self._ratings.copy()
+        else:
+            self._ratings = {}
     
     def get_rating(self, filename: str) -> int:
         """
@@ -54,7 +81,7 @@ class RatingsManager:
         """
         # Normalize path separators to forward slashes for consistency
         filename = filename.replace(os.sep, '/')
-        with self._lock:
+        with self._locked():
             return self._ratings.get(filename, 0)
     
     def set_rating(self, filename: str, rating: int) -> bool:
@@ -76,7 +103,7 @@ class RatingsManager:
         # Normalize path separators to forward slashes for consistency
         filename = filename.replace(os.sep, '/')
         
-        with self._lock:
+        with self._locked():
             # Remove rating if set to 0 (unrated)
             if rating == 0:
                 if filename in self._ratings:
@@ -85,7 +112,9 @@ class RatingsManager:
                 self._ratings[filename] = rating
             
             # Save immediately
-            return self._save_ratings_unsafe()
+            saved = self._save_ratings_unsafe()
+        self._notify(filename)
+        return saved
     
     def delete_rating(self, filename: str) -> bool:
         """
@@ -100,21 +129,93 @@ class RatingsManager:
         # Normalize path separators to forward slashes for consistency
         filename = filename.replace(os.sep, '/')
         
-        with self._lock:
-            if filename in self._ratings:
-                del self._ratings[filename]
-                self._save_ratings_unsafe()
-                return True
-            return False
+        with self._locked():
+            if filename not in self._ratings:
+                return False
+            del self._ratings[filename]
+            self._save_ratings_unsafe()
+        self._notify(filename)
+        return True
 
     def rename_file_key(self, old_filename: str, new_filename: str) -> bool:
-        old_filename = old_filename.replace(os.sep, '/')
-        new_filename = new_filename.replace(os.sep, '/')
-        with self._lock:
-            if old_filename in self._ratings:
-                self._ratings[new_filename] = self._ratings.pop(old_filename)
-                return self._save_ratings_unsafe()
+        return self.rename_file_keys({old_filename: new_filename})
+
+    def rename_file_keys(self, renames: Dict[str, str]) -> bool:
+        """
+        Move ratings from old to new filenames for a batch of moved files.
+
+        Args:
+            renames: Mapping of old relative path to new relative path
+
+        Returns:
+            True if successful (or nothing was rated), False if saving failed
+        """
+        renames = {old.replace(os.sep, '/'): new.replace(os.sep, '/') for old, new in renames.items()}
+        with self._locked():
+            moved = {old: self._ratings.pop(old) for old in renames if old in self._ratings}
+            if not moved:
+                return True
+            for old, rating in moved.items():
+                self._ratings[renames[old]] = rating
+            saved = self._save_ratings_unsafe()
+        self._notify(*moved, *(renames[old] for old in moved))
+        return saved
+
+    def pop_ratings(self, filenames: Iterable[str]) -> Dict[str, int]:
+        """
+        Remove the ratings of a batch of files with a single save.
+
+        Args:
+            filenames: Relative paths of the files
+
+        Returns:
+            The removed ratings, by filename (unrated files are left out)
+        """
+        with self._locked():
+            removed = {}
+            for filename in filenames:
+                filename = filename.replace(os.sep, '/')
+                if filename in self._ratings:
+                    removed[filename] = self._ratings.pop(filename)
+            if removed:
+                self._save_ratings_unsafe()
+        self._notify(*removed)
+        return removed
+
+    def set_ratings(self, ratings: Dict[str, int]) -> bool:
+        """
+        Set the ratings of a batch of files with a single save.
+
+        Args:
+            ratings: Rating (1-3) by relative path; invalid values are skipped
+
+        Returns:
+            True if successful, False otherwise
+        """
+        ratings = {
+            filename.replace(os.sep, '/'): rating for filename, rating in ratings.items()
+            if isinstance(rating, int) and self.MIN_RATING < rating <= self.MAX_RATING
+        }
+        if not ratings:
             return True
+        with self._locked():
+            self._ratings.update(ratings)
+            saved = self._save_ratings_unsafe()
+        self._notify(*ratings)
+        return saved
+
+    def add_listener(self, listener: Callable[[str], None]):
+        """
+        Register a callback invoked with a filename after its rating changes.
+
+        Listeners run after the lock is released, so they may call back into the manager.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, *filenames: str):
+        for listener in self._listeners:
+            for filename in filenames:
+                listener(filename)
     
     def save_ratings(self) -> bool:
         """
@@ -123,7 +224,7 @@ class RatingsManager:
         Returns:
             True if successful, False otherwise
         """
-        with self._lock:
+        with self._locked():
             return self._save_ratings_unsafe()
     
     def _save_ratings_unsafe(self) -> bool:
@@ -161,7 +262,7 @@ class RatingsManager:
         Returns:
             Dictionary mapping filenames to ratings
         """
-        with self._lock:
+        with self._locked():
             return self._ratings.copy()
     
     def get_rated_count(self) -> int:
@@ -171,5 +272,5 @@ class RatingsManager:
         Returns:
             Number of files with ratings
         """
-        with self._lock:
+        with self._locked():
             return len(self._ratings)
@@ -1,91 +1,622 @@
 import argparse
+import hashlib
+import heapq
+import itertools
+import json
 import requests
+from requests.adapters import HTTPAdapter
 import os
 from tqdm import tqdm
 import sys
+import threading
+import time
 import urllib.parse
+from delta import DEFAULT_BLOCK_SIZE, MIN_BLOCK_SIZE, MAX_BLOCK_SIZE, compute_signature, apply_delta
+from hashing import hash_file, HASH_ALGORITHM
 
-# Use argparse to handle command-line arguments
-parser = argparse.ArgumentParser(description="Download files from a specified server.")
-parser.add_argument('--host', '-H', default='http://localhost:3138', help="Host of the server")
-parser.add_argument('--directory', '-d', action='append', required=True, help="Directories to save downloaded files")
-args = parser.parse_args()
-
-server_url = args.host
-save_directories = [os.path.abspath(d) for d in args.directory]
-
-# Validate that all specified save directories exist
-create_all = None
-for save_directory in save_directories:
-    if not os.path.isdir(save_directory):
-        if create_all is None:
-            choice = input(f"Directory '{save_directory}' does not exist. Create it? (y/n/all): ").strip().lower()
-            if choice == "all":
-                create_all = True
-            elif choice == "n":
-                print(f"Error: '{save_directory}' is not a valid directory.")
-                sys.exit(1)
-            elif choice != "y":
-                print("Invalid choice. Exiting.")
-                sys.exit(1)
-        if create_all or choice == "y":
-            os.makedirs(save_directory)
-            print(f"Created directory: {save_directory}")
-
-# Get the list of files and validate the number of directories
-response = requests.get(f"{server_url}/")
-response.raise_for_status()
-response_data = response.json()
-files = response_data.get('files', [])
-directories_count = len(response_data.get('directories', []))
-
-if len(save_directories) != directories_count:
-    print(f"Error: Number of save directories ({len(save_directories)}) does not match the number of directories ({directories_count}) returned by the server.")
-    sys.exit(1)
-
-# List the files to be retrieved
-print("Files to be downloaded:")
-for file in files:
-    print(f" - {file['name']} ({file['size']} bytes)")
-
-# Calculate total size of all files to be downloaded
-total_size = sum(file['size'] for file in files)
-total_downloaded = 0
-
-# Create an overall progress bar
-with tqdm(
-    total=total_size, unit='B', unit_scale=True, unit_divisor=1024, desc="Overall Progress"
-) as overall_progress:
-    # Download each file
-    for file in files:
-        filename = file['name']  # URL-encoded relative path of the file
-        file_size = file['size']
-        directory_index = file['directory_index']
-        download_url = f"{server_url}/{directory_index}/{filename}"
-        decoded_filename = urllib.parse.unquote(filename)  # URL-decode the filename
-        save_path = os.path.join(save_directories[directory_index], decoded_filename)
-
-        # Ensure subdirectories exist
-        os.makedirs(os.path.dirname(save_path), exist_ok=True)
-
-        # Check if the file already exists
-        if os.path.isfile(save_path):
-            existing_size = os.path.getsize(save_path)
-            if existing_size == file_size:
-                print(f"Skipping: {decoded_filename} (already exists with the same size)")
+CHUNK_SIZE = 1024 * 1024  # 1 MiB reads from the response stream
+STATE_SAVE_INTERVAL = 64 * 1024 * 1024  # Persist segment progress every 64 MiB
+MAX_ATTEMPTS = 3
+PART_SUFFIX = '.part'
+STATE_SUFFIX = '.part.json'
+DELTA_SUFFIX = '.delta'
+
+def create_session(jobs):
+    """
+    Create a requests session whose connection pool can serve every worker.
+
+    Args:
+        jobs (int): Number of concurrent workers
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=jobs, pool_maxsize=jobs, max_retries=3)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def iter_listing(session, server_url, hashes=False):
+    """
+    Stream the server's file listing as NDJSON.
+
+    Yields the header dict (containing 'directories') first, then one dict
+    per file as the server enumerates them. With hashes=True every entry
+    carries its content hash, which makes the server hash its whole tree.
+    """
+    params = {'format': 'ndjson'}
+    if hashes:
+        params['hashes'] = '1'
+    with session.get(f"{server_url}/", params=params, stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)
+
+def fetch_hash(session, server_url, directory_index, filename):
+    """Return the server's content hash for one URL-encoded file, or None if unavailable."""
+    try:
+        response = session.get(f"{server_url}/hash/{directory_index}/{filename}")
+        response.raise_for_status()
+        return response.json().get(HASH_ALGORITHM)
+    except (requests.RequestException, ValueError) as e:
+        tqdm.write(f"Error fetching hash of {urllib.parse.unquote(filename)}: {e}")
+        return None
+
+def plan_segments(file_size, split_size, jobs):
+    """
+    Split a file into byte ranges that can be fetched on separate connections.
+
+    Returns:
+        list: [start, end, position] triples, end exclusive
+    """
+    if jobs <= 1 or file_size <= split_size:
+        return [[0, file_size, 0]]
+    count = min(jobs, -(-file_size // split_size))
+    step = -(-file_size // count)
+    return [[start, min(start + step, file_size), start] for start in range(0, file_size, step)]
+
+class DownloadStats:
+    """Thread-safe counters for the end-of-run summary."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+        self.bytes_transferred = 0
+        self.downloaded = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def add_bytes(self, count):
+        with self.lock:
+            self.bytes_transferred += count
+
+    def count(self, field):
+        with self.lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def summary(self):
+        elapsed = time.time() - self.start_time
+        speed = self.bytes_transferred / elapsed if elapsed > 0 else 0
+        return (f"Downloaded {self.downloaded} files, skipped {self.skipped}, failed {self.failed} | "
+                f"Transferred: {self.bytes_transferred:,} bytes | Time: {elapsed:.2f}s | "
+                f"Speed: {speed / (1024 * 1024):.2f} MB/s")
+
+class ReceiveState:
+    """
+    Local record of the content hash of every file received into a directory.
+
+    Entries are keyed on relative path and remember the local size and mtime
+    the hash was taken at, so a file edited locally is detected and re-hashed.
+    """
+
+    STATE_FILE = ".receive_state.json"
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.state_path = os.path.join(directory, self.STATE_FILE)
+        self.lock = threading.Lock()
+        self.files = {}
+        if os.path.isfile(self.state_path):
+            try:
+                with open(self.state_path, 'r', encoding='utf-8') as f:
+                    self.files = json.load(f)
+            except (json.JSONDecodeError, IOError) as e:
+                print(f"Error loading receive state from {self.state_path}: {e}")
+
+    def local_hash(self, relative_path):
+        """Return the hash of the local copy, hashing it only if it changed since it was recorded."""
+        full_path = os.path.join(self.directory, relative_path)
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            return None
+        with self.lock:
+            entry = self.files.get(relative_path)
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            return entry[HASH_ALGORITHM]
+        digest = hash_file(full_path)
+        self.record(relative_path, digest)
+        return digest
+
+    def record(self, relative_path, digest):
+        stat = os.stat(os.path.join(self.directory, relative_path))
+        with self.lock:
+            self.files[relative_path] = {'size': stat.st_size, 'mtime': stat.st_mtime, HASH_ALGORITHM: digest}
+
+    def save(self):
+        with self.lock:
+            temp_path = self.state_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.files, f)
+            os.replace(temp_path, self.state_path)
+
+class FileDownload:
+    """
+    One file being downloaded into a .part file, possibly as several ranges.
+
+    Single-range downloads resume from the size of the .part file. Multi-range
+    downloads preallocate the .part file and record per-range progress in a
+    .part.json sidecar so every range can resume after an interruption.
+    """
+
+    def __init__(self, url, save_path, display_name, file_size, split_size, jobs, expected_hash=None, on_complete=None):
+        self.url = url
+        self.save_path = save_path
+        self.display_name = display_name
+        self.file_size = file_size
+        self.part_path = save_path + PART_SUFFIX
+        self.state_path = save_path + STATE_SUFFIX
+        self.lock = threading.Lock()
+        self.failed = False
+        self.segments = self._load_segments(split_size, jobs)
+        self.remaining = sum(1 for start, end, position in self.segments if position < end)
+        self.expected_hash = expected_hash
+        self.on_complete = on_complete
+        # Single-range downloads are hashed while streaming; resumed bytes are hashed up front
+        self.hasher = None
+        if expected_hash and not self.multi_range:
+            self.hasher = hashlib.new(HASH_ALGORITHM)
+            position = self.segments[0][2]
+            if position:
+                with open(self.part_path, 'rb') as f:
+                    while f.tell() < position:
+                        chunk = f.read(min(CHUNK_SIZE, position - f.tell()))
+                        if not chunk:
+                            break
+                        self.hasher.update(chunk)
+
+    def _load_segments(self, split_size, jobs):
+        if os.path.isfile(self.part_path) and os.path.isfile(self.state_path):
+            try:
+                with open(self.state_path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+                if state.get('size') == self.file_size:
+                    return state['segments']
+            except (json.JSONDecodeError, IOError, KeyError):
+                pass
+
+        segments = plan_segments(self.file_size, split_size, jobs)
+        if len(segments) == 1:
+            if os.path.isfile(self.state_path):
+                os.remove(self.state_path)
+            existing = os.path.getsize(self.part_path) if os.path.isfile(self.part_path) else 0
+            if existing > self.file_size:
+                existing = 0
+            segments[0][2] = existing
+            if existing == 0:
+                open(self.part_path, 'wb').close()
+            return segments
+
+        # Preallocate so every range can be written at its own offset
+        with open(self.part_path, 'wb') as f:
+            f.truncate(self.file_size)
+        self.segments = segments
+        self.save_state()
+        return segments
+
+    @property
+    def multi_range(self):
+        return len(self.segments) > 1
+
+    def resumed_bytes(self):
+        return sum(position - start for start, end, position in self.segments)
+
+    def save_state(self):
+        if not self.multi_range:
+            return
+        with self.lock:
+            state = {'size': self.file_size, 'segments': [list(s) for s in self.segments]}
+        temp_path = self.state_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.state_path)
+
+    def segment_done(self):
+        """Mark one range finished; returns True when the whole file is complete."""
+        with self.lock:
+            self.remaining -= 1
+            return self.remaining == 0 and not self.failed
+
+    def finalize(self):
+        """Verify the .part file against the expected size and hash, then move it into place."""
+        if os.path.getsize(self.part_path) != self.file_size:
+            raise IOError(f"Size mismatch for {self.display_name}")
+        digest = None
+        if self.expected_hash:
+            # Multi-range downloads arrive out of order, so they are verified after the fact
+            digest = self.hasher.hexdigest() if self.hasher else hash_file(self.part_path)
+            if digest != self.expected_hash:
+                os.remove(self.part_path)
+                if os.path.isfile(self.state_path):
+                    os.remove(self.state_path)
+                raise IOError(f"Hash mismatch for {self.display_name}; corrupt data discarded")
+        os.replace(self.part_path, self.save_path)
+        if os.path.isfile(self.state_path):
+            os.remove(self.state_path)
+        if self.on_complete:
+            self.on_complete(digest)
+
+    def tasks(self):
+        return [SegmentTask(self, segment) for segment in self.segments if segment[2] < segment[1]]
+
+class SegmentTask:
+    """Scheduler task fetching one byte range of a FileDownload."""
+
+    def __init__(self, download, segment):
+        self.download = download
+        self.segment = segment
+
+    @property
+    def display_name(self):
+        return self.download.display_name
+
+    @property
+    def failed(self):
+        return self.download.failed
+
+    def mark_failed(self):
+        self.download.failed = True
+
+    def remaining_bytes(self):
+        start, end, position = self.segment
+        return end - position
+
+    def run(self, session, overall_progress, stats):
+        """Fetch the range; returns True once every range of the file has arrived."""
+        download_segment(session, self.download, self.segment, overall_progress, stats)
+        return self.download.segment_done()
+
+    def finalize(self):
+        self.download.finalize()
+
+class _CountingReader:
+    """File-like wrapper counting the bytes read from a response stream."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.bytes_read = 0
+
+    def read(self, size):
+        data = self.stream.read(size)
+        self.bytes_read += len(data)
+        return data
+
+class DeltaSync:
+    """
+    Scheduler task that updates an existing local file with block-level deltas.
+
+    The local file's block signature is posted to serve.py, which replies
+    with copy instructions and only the literal data that changed. When
+    every unchanged block stays at its offset the local file is patched in
+    place; otherwise the result is rebuilt next to it and moved into place.
+    """
+
+    def __init__(self, url, save_path, display_name, file_size, expected_hash, block_size, on_complete=None):
+        self.url = url
+        self.save_path = save_path
+        self.display_name = display_name
+        self.file_size = file_size
+        self.expected_hash = expected_hash
+        self.block_size = block_size
+        self.on_complete = on_complete
+        self.temp_path = save_path + DELTA_SUFFIX
+        self.failed = False
+        self.in_place = False
+        self.transferred = 0
+
+    def mark_failed(self):
+        self.failed = True
+
+    def remaining_bytes(self):
+        return self.file_size
+
+    def run(self, session, overall_progress, stats):
+        signature = compute_signature(self.save_path, self.block_size)
+        with session.post(self.url, data=signature, stream=True, timeout=600) as r:
+            r.raise_for_status()
+            self.in_place = r.headers.get('X-Delta-In-Place') == '1'
+            target_size = int(r.headers['X-File-Size'])
+            r.raw.decode_content = True
+            stream = _CountingReader(r.raw)
+            apply_delta(self.save_path, stream, self.block_size, target_size,
+                        None if self.in_place else self.temp_path)
+        self.transferred = len(signature) + stream.bytes_read
+        stats.add_bytes(self.transferred)
+        overall_progress.update(self.file_size)
+        return True
+
+    def finalize(self):
+        """Verify the rebuilt file against the server's hash and move it into place."""
+        path = self.save_path if self.in_place else self.temp_path
+        digest = hash_file(path)
+        if digest != self.expected_hash:
+            # A failed in-place patch leaves the local copy unusable; drop it so the next run fetches it whole
+            os.remove(path)
+            raise IOError(f"Hash mismatch for {self.display_name} after delta; corrupt data discarded")
+        if not self.in_place:
+            os.replace(self.temp_path, self.save_path)
+        tqdm.write(f"Delta: {self.display_name} ({self.transferred:,} of {self.file_size:,} bytes transferred)")
+        if self.on_complete:
+            self.on_complete(digest)
+
+def download_segment(session, download, segment, overall_progress, stats):
+    """
+    Fetch one byte range of a file into its .part file, resuming via HTTP Range.
+    """
+    start, end, position = segment
+    if position >= end:
+        return
+    headers = {}
+    if position > 0 or end < download.file_size:
+        headers['Range'] = f"bytes={position}-{end - 1}"
+
+    with session.get(download.url, headers=headers, stream=True, timeout=60) as r:
+        r.raise_for_status()
+        if headers and r.status_code != 206:
+            if download.multi_range:
+                raise IOError("Server does not support range requests")
+            # Server ignored the Range header; restart this file from byte zero
+            overall_progress.update(-position)
+            position = 0
+            segment[2] = 0
+            if download.hasher:
+                download.hasher = hashlib.new(HASH_ALGORITHM)
+        unsaved = 0
+        with open(download.part_path, 'r+b' if position > 0 or download.multi_range else 'wb') as f:
+            f.seek(position)
+            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+                if download.hasher:
+                    download.hasher.update(chunk)
+                position += len(chunk)
+                segment[2] = position
+                unsaved += len(chunk)
+                overall_progress.update(len(chunk))
+                stats.add_bytes(len(chunk))
+                if unsaved >= STATE_SAVE_INTERVAL:
+                    f.flush()
+                    download.save_state()
+                    unsaved = 0
+        download.save_state()
+
+    if position < end:
+        raise IOError(f"Connection closed after {position - start} of {end - start} bytes")
+
+class DownloadScheduler:
+    """
+    Worker pool that always fetches the largest pending range first.
+
+    Files are added while the listing is still streaming in; each file's
+    ranges are queued individually so large files are spread across
+    connections while small files fill the gaps.
+    """
+
+    def __init__(self, session, jobs, overall_progress, stats):
+        self.session = session
+        self.jobs = jobs
+        self.overall_progress = overall_progress
+        self.stats = stats
+        self.heap = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.workers = [threading.Thread(target=self._worker, daemon=True) for _ in range(jobs)]
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    def add(self, task):
+        """Queue a SegmentTask or DeltaSync."""
+        with self.condition:
+            heapq.heappush(self.heap, (-task.remaining_bytes(), next(self.counter), task, 1))
+            self.condition.notify()
+
+    def close(self):
+        """Signal that no more files will be added and wait for the queue to drain."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        for worker in self.workers:
+            worker.join()
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                while not self.heap and not self.closed:
+                    self.condition.wait()
+                if not self.heap:
+                    return
+                _, _, task, attempt = heapq.heappop(self.heap)
+
+            if task.failed:
                 continue
-            else:
-                size_difference = file_size - existing_size
-                print(f"Replacing: {decoded_filename} (size difference: {size_difference} bytes)")
-
-        # Use tqdm to display the starting download message
-        with tqdm(
-            total=file_size, unit='B', unit_scale=True, unit_divisor=1024, desc=f"Downloading: {decoded_filename}"
-        ) as file_progress:
-            with requests.get(download_url, stream=True) as r:
-                r.raise_for_status()
-                with open(save_path, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                        file_progress.update(len(chunk))
-                        overall_progress.update(len(chunk))
+            try:
+                complete = task.run(self.session, self.overall_progress, self.stats)
+            except (requests.RequestException, IOError) as e:
+                if attempt < MAX_ATTEMPTS:
+                    tqdm.write(f"Retrying: {task.display_name} ({e})")
+                    with self.condition:
+                        heapq.heappush(self.heap, (-task.remaining_bytes(), next(self.counter), task, attempt + 1))
+                        self.condition.notify()
+                    continue
+                task.mark_failed()
+                self.stats.count('failed')
+                tqdm.write(f"Failed: {task.display_name} ({e})")
+                continue
+
+            if complete:
+                try:
+                    task.finalize()
+                    self.stats.count('downloaded')
+                    tqdm.write(f"Downloaded: {task.display_name}")
+                except (IOError, OSError) as e:
+                    self.stats.count('failed')
+                    tqdm.write(f"Failed: {e}")
+
+def prepare_save_directories(directories):
+    """Validate that all specified save directories exist, offering to create them."""
+    create_all = None
+    for save_directory in directories:
+        if not os.path.isdir(save_directory):
+            if create_all is None:
+                choice = input(f"Directory '{save_directory}' does not exist. Create it? (y/n/all): ").strip().lower()
+                if choice == "all":
+                    create_all = True
+                elif choice == "n":
+                    print(f"Error: '{save_directory}' is not a valid directory.")
+                    sys.exit(1)
+                elif choice != "y":
+                    print("Invalid choice. Exiting.")
+                    sys.exit(1)
+            if create_all or choice == "y":
+                os.makedirs(save_directory)
+                print(f"Created directory: {save_directory}")
+
+def receive_all(server_url, save_directories, jobs=1, split_size=1024 ** 3, verify=False,
+                delta=False, delta_min_size=64 * 1024 * 1024, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Download every file listed by a serve.py instance into the save directories.
+
+    Args:
+        server_url (str): Base URL of the serve.py instance
+        save_directories (list): One local directory per served directory
+        jobs (int): Number of parallel connections
+        split_size (int): Files larger than this are split into ranges across connections
+        verify (bool): Compare existing files by content hash and verify every download
+        delta (bool): Update changed files of at least delta_min_size bytes with block-level deltas
+        delta_min_size (int): Smallest local copy worth a delta transfer
+        block_size (int): Delta block size in bytes
+    """
+    session = create_session(jobs)
+    stats = DownloadStats()
+    states = [ReceiveState(d) for d in save_directories]
+
+    listing = iter_listing(session, server_url, hashes=verify)
+    header = next(listing)
+    directories_count = len(header.get('directories', []))
+
+    if len(save_directories) != directories_count:
+        print(f"Error: Number of save directories ({len(save_directories)}) does not match the number of directories ({directories_count}) returned by the server.")
+        sys.exit(1)
+
+    # Create an overall progress bar; its total grows as the listing streams in
+    with tqdm(
+        total=0, unit='B', unit_scale=True, unit_divisor=1024, desc="Overall Progress"
+    ) as overall_progress:
+        scheduler = DownloadScheduler(session, jobs, overall_progress, stats)
+        scheduler.start()
+        try:
+            for file in listing:
+                filename = file['name']  # URL-encoded relative path of the file
+                file_size = file['size']
+                directory_index = file['directory_index']
+                download_url = f"{server_url}/{directory_index}/{filename}"
+                decoded_filename = urllib.parse.unquote(filename)  # URL-decode the filename
+                save_path = os.path.join(save_directories[directory_index], decoded_filename)
+
+                overall_progress.total += file_size
+                overall_progress.refresh()
+
+                # Ensure subdirectories exist
+                os.makedirs(os.path.dirname(save_path), exist_ok=True)
+
+                remote_hash = file.get(HASH_ALGORITHM)
+                state = states[directory_index]
+
+                # Check if the file already exists
+                if os.path.isfile(save_path):
+                    existing_size = os.path.getsize(save_path)
+                    if existing_size == file_size and (remote_hash is None or state.local_hash(decoded_filename) == remote_hash):
+                        reason = "same hash" if remote_hash else "same size"
+                        tqdm.write(f"Skipping: {decoded_filename} (already exists with the {reason})")
+                        overall_progress.update(file_size)
+                        stats.count('skipped')
+                        continue
+                    elif existing_size == file_size:
+                        tqdm.write(f"Replacing: {decoded_filename} (content hash differs)")
+                    else:
+                        size_difference = file_size - existing_size
+                        tqdm.write(f"Replacing: {decoded_filename} (size difference: {size_difference} bytes)")
+
+                def record(digest, state=state, relative_path=decoded_filename):
+                    if digest:
+                        state.record(relative_path, digest)
+
+                if (delta and os.path.isfile(save_path)
+                        and min(os.path.getsize(save_path), file_size) >= delta_min_size):
+                    # A delta is checked against the server's hash, so fetch it if the listing had none
+                    if remote_hash is None:
+                        remote_hash = fetch_hash(session, server_url, directory_index, filename)
+                    if remote_hash:
+                        delta_url = f"{server_url}/delta/{directory_index}/{filename}"
+                        scheduler.add(DeltaSync(delta_url, save_path, decoded_filename, file_size,
+                                                remote_hash, block_size, on_complete=record))
+                        continue
+
+                download = FileDownload(download_url, save_path, decoded_filename, file_size, split_size, jobs,
+                                        expected_hash=remote_hash, on_complete=record)
+                resumed = download.resumed_bytes()
+                if resumed:
+                    tqdm.write(f"Resuming: {decoded_filename} ({resumed:,} of {file_size:,} bytes present)")
+                    overall_progress.update(resumed)
+                if download.remaining == 0:
+                    try:
+                        download.finalize()
+                        stats.count('downloaded')
+                    except (IOError, OSError) as e:
+                        stats.count('failed')
+                        tqdm.write(f"Failed: {e}")
+                    continue
+                for task in download.tasks():
+                    scheduler.add(task)
+        finally:
+            scheduler.close()
+            for state in states:
+                state.save()
+
+    print(stats.summary())
+    return stats
+
+if __name__ == "__main__":
+    # Use argparse to handle command-line arguments
+    parser = argparse.ArgumentParser(description="Download files from a specified server.")
+    parser.add_argument('--host', '-H', default='http://localhost:3138', help="Host of the server")
+    parser.add_argument('--directory', '-d', action='append', required=True, help="Directories to save downloaded files")
+    parser.add_argument('--jobs', '-j', type=int, default=1, help="Number of parallel downloads (default: 1)")
+    parser.add_argument('--split-size', type=int, default=1024, help="Split files larger than this many MiB across connections (default: 1024)")
+    parser.add_argument('--verify', action='store_true', help="Compare existing files by content hash and verify every download (the server hashes its whole tree)")
+    parser.add_argument('--delta', action='store_true', help="Transfer only changed blocks of large files that already exist locally")
+    parser.add_argument('--delta-min-size', type=int, default=64, help="Smallest file in MiB to update with --delta (default: 64)")
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE // 1024, help="Delta block size in KiB")
+    args = parser.parse_args()
+    if not MIN_BLOCK_SIZE <= args.block_size * 1024 <= MAX_BLOCK_SIZE:
+        parser.error(f"--block-size must be between {MIN_BLOCK_SIZE // 1024} and {MAX_BLOCK_SIZE // 1024} KiB")
+
+    save_directories = [os.path.abspath(d) for d in args.directory]
+    prepare_save_directories(save_directories)
+
+    stats = receive_all(args.host, save_directories, jobs=max(1, args.jobs), split_size=args.split_size * 1024 * 1024,
+                        verify=args.verify, delta=args.delta, delta_min_size=args.delta_min_size * 1024 * 1024,
+                        block_size=args.block_size * 1024)
+    if stats.failed:
+        sys.exit(1)
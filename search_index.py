@@ -0,0 +1,503 @@
+import json
+import os
+import queue
+import re
+import threading
+from array import array
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from media_metadata import extract_media_metadata, try_parse_json
+from source_watcher import SourceWatcher
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+QUERY_PATTERN = re.compile(r'(-?)(?:(\w+):)?(?:"([^"]*)"|(\S+))')
+LORA_TAG_PATTERN = re.compile(r'<lora:([^:>]+)(?::[^>]*)?>', re.IGNORECASE)
+
+# Structured fields that can be queried as field:value
+SEARCH_FIELDS = ('model', 'lora', 'seed', 'sampler', 'scheduler', 'steps', 'cfg')
+
+# ComfyUI node inputs that hold model file names, mapped to their search field
+MODEL_INPUTS = {
+    'ckpt_name': 'model', 'unet_name': 'model', 'model_name': 'model', 'vae_name': 'model',
+    'clip_name': 'model', 'clip_name1': 'model', 'clip_name2': 'model', 'clip_name3': 'model',
+    'control_net_name': 'model', 'upscale_model_name': 'model', 'lora_name': 'lora',
+}
+SETTING_INPUTS = {
+    'seed': 'seed', 'noise_seed': 'seed', 'sampler_name': 'sampler', 'scheduler': 'scheduler',
+    'steps': 'steps', 'cfg': 'cfg',
+}
+PROMPT_INPUTS = {'text', 'text_g', 'text_l', 'prompt', 'positive', 'negative', 'string'}
+MODEL_EXTENSIONS = ('.safetensors', '.ckpt', '.pt', '.pth', '.bin', '.gguf')
+# A1111-style "Key: value" settings on the last line of a parameters string
+A1111_SETTINGS = {
+    'seed': 'seed', 'sampler': 'sampler', 'schedule type': 'scheduler', 'steps': 'steps',
+    'cfg scale': 'cfg', 'model': 'model',
+}
+# Summary sections of summarize_metadata(), in display order
+SUMMARY_LABELS = (
+    ('model', 'Models'), ('lora', 'LoRAs'), ('seed', 'Seed'), ('sampler', 'Sampler'),
+    ('scheduler', 'Scheduler'), ('steps', 'Steps'), ('cfg', 'CFG'), ('prompt', 'Prompts'),
+)
+SUMMARY_MAX_VALUES = 20  # Per field; large graphs can hold hundreds of samplers
+
+
+def _model_values(value: str) -> List[str]:
+    """Field values for a model file name: the file name itself and its stem."""
+    name = value.replace('\\', '/').rsplit('/', 1)[-1].lower()
+    stem, ext = os.path.splitext(name)
+    return [name, stem] if ext.lower() in MODEL_EXTENSIONS else [name]
+
+
+def _setting_value(value) -> Optional[str]:
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip().lower() or None
+
+
+class _SearchFields:
+    """Accumulates free text and field:value pairs extracted from one file."""
+
+    def __init__(self):
+        self.text: List[str] = []
+        self.fields: Set[Tuple[str, str]] = set()
+        self.values: Dict[str, List[str]] = {}  # field -> distinct values as written, for summaries
+
+    def _remember(self, field: str, value: str):
+        values = self.values.setdefault(field, [])
+        if value not in values:
+            values.append(value)
+
+    def add_model(self, field: str, value: str):
+        for v in _model_values(value):
+            self.fields.add((field, v))
+        self.text.append(value)
+        self._remember(field, value)
+
+    def add_setting(self, field: str, value):
+        v = _setting_value(value)
+        if v is not None:
+            self.fields.add((field, v))
+            self.text.append(v)
+            self._remember(field, value.strip() if isinstance(value, str) else v)
+
+    def add_prompt(self, text: str):
+        self.text.append(text)
+        if text.strip():
+            self._remember('prompt', text.strip())
+        for lora in LORA_TAG_PATTERN.findall(text):
+            self.add_model('lora', lora)
+
+    def tokens(self) -> Set[str]:
+        tokens = set()
+        for text in self.text:
+            tokens.update(TOKEN_PATTERN.findall(text.lower()))
+        tokens.update(f"{field}:{value}" for field, value in self.fields)
+        return tokens
+
+
+def _collect_comfy_prompt(prompt: Dict, fields: _SearchFields):
+    for node in prompt.values():
+        inputs = node.get('inputs')
+        if not isinstance(inputs, dict):
+            continue
+        for name, value in inputs.items():
+            if isinstance(value, list):
+                continue  # Link to another node's output
+            if name in MODEL_INPUTS and isinstance(value, str):
+                fields.add_model(MODEL_INPUTS[name], value)
+            elif name in SETTING_INPUTS:
+                fields.add_setting(SETTING_INPUTS[name], value)
+            elif name in PROMPT_INPUTS and isinstance(value, str):
+                fields.add_prompt(value)
+
+
+def _collect_comfy_workflow(workflow: Dict, fields: _SearchFields):
+    # UI workflows only carry positional widget values, so classify by shape
+    for node in workflow.get('nodes', []):
+        if not isinstance(node, dict):
+            continue
+        node_type = str(node.get('type', ''))
+        widgets = node.get('widgets_values')
+        if not isinstance(widgets, list):
+            continue
+        if node_type in ('KSampler', 'KSamplerAdvanced') and len(widgets) >= 6:
+            offset = 1 if node_type == 'KSamplerAdvanced' else 0
+            seed, _, steps, cfg, sampler, scheduler = widgets[offset:offset + 6]
+            fields.add_setting('seed', seed)
+            fields.add_setting('steps', steps)
+            fields.add_setting('cfg', cfg)
+            fields.add_setting('sampler', sampler)
+            fields.add_setting('scheduler', scheduler)
+            continue
+        for value in widgets:
+            if not isinstance(value, str):
+                continue
+            if value.lower().endswith(MODEL_EXTENSIONS):
+                fields.add_model('lora' if 'lora' in node_type.lower() else 'model', value)
+            elif 'TextEncode' in node_type or 'Prompt' in node_type:
+                fields.add_prompt(value)
+
+
+def _collect_a1111_parameters(parameters: str, fields: _SearchFields):
+    lines = parameters.strip().split('\n')
+    settings_line = lines[-1] if len(lines) > 1 and 'Steps:' in lines[-1] else ''
+    prompt_lines = lines[:-1] if settings_line else lines
+    fields.add_prompt('\n'.join(line.replace('Negative prompt:', '', 1) for line in prompt_lines))
+    for part in settings_line.split(','):
+        key, _, value = part.partition(':')
+        field = A1111_SETTINGS.get(key.strip().lower())
+        if field == 'model':
+            fields.add_model('model', value.strip())
+        elif field:
+            fields.add_setting(field, value.strip())
+
+
+def _collect_value(value, fields: _SearchFields, depth: int = 0):
+    if depth > 3:
+        return
+    if isinstance(value, str):
+        parsed = try_parse_json(value) if value.lstrip().startswith('{') else value
+        if isinstance(parsed, str):
+            if 'Steps:' in parsed or len(parsed.split()) > 2:
+                _collect_a1111_parameters(parsed, fields)
+            return
+        value = parsed
+    if not isinstance(value, dict):
+        return
+    if value and all(isinstance(v, dict) and 'class_type' in v for v in value.values()):
+        _collect_comfy_prompt(value, fields)
+    elif isinstance(value.get('nodes'), list):
+        _collect_comfy_workflow(value, fields)
+    else:
+        # Wrappers such as an MP4 comment holding {"prompt": ..., "workflow": ...}
+        for nested in value.values():
+            _collect_value(nested, fields, depth + 1)
+
+
+def _collect_metadata(metadata: Dict, fields: _SearchFields):
+    for key, value in metadata.items():
+        if key.startswith('_'):
+            continue
+        _collect_value(value, fields)
+    for value in (metadata.get('_other') or {}).values():
+        _collect_value(value, fields)
+    for value in (metadata.get('_mp4_tags') or {}).values():
+        _collect_value(value, fields)
+    exif = metadata.get('_exif') or {}
+    for key in ('UserComment', 'ImageDescription', 'XPComment'):
+        if key in exif:
+            _collect_value(exif[key], fields)
+
+
+def extract_search_tokens(file_path: str) -> Set[str]:
+    """
+    Extract searchable tokens from a media file's generation metadata.
+
+    Free text (prompts, model names) is split into lowercase words; model,
+    lora, seed and sampler settings are also indexed as "field:value" tokens.
+    """
+    fields = _SearchFields()
+    _collect_metadata(extract_media_metadata(file_path, include_ffprobe=False), fields)
+    return fields.tokens()
+
+
+def summarize_metadata(metadata: Dict) -> Dict[str, str]:
+    """
+    Display summary of extract_media_metadata() output: the models, loras,
+    seed, sampler, scheduler, steps, cfg and prompt text the search index
+    reads, without the workflow graph. Missing fields are left out.
+    """
+    fields = _SearchFields()
+    _collect_metadata(metadata, fields)
+    summary = {}
+    for field, label in SUMMARY_LABELS:
+        values = fields.values.get(field)
+        if values:
+            summary[label] = ('\n\n' if field == 'prompt' else ', ').join(values[:SUMMARY_MAX_VALUES])
+    return summary
+
+
+class SearchIndex:
+    """
+    Inverted index over prompt text and generation settings for one source.
+
+    Documents get increasing integer ids, so every posting list is a sorted
+    uint32 array and queries are NumPy intersections. Changed or removed files
+    are tombstoned and the arrays are compacted once enough ids are dead.
+    The index is persisted to a JSON sidecar and kept current from a
+    SourceWatcher; parsing happens on a single background thread.
+    """
+
+    INDEX_FILE = ".search_index.json"
+    INDEX_VERSION = 1
+    SAVE_DELAY = 30.0  # Seconds to batch index updates before writing the sidecar
+    COMPACT_MIN_DEAD = 10000
+
+    def __init__(self, watcher: SourceWatcher):
+        self.watcher = watcher
+        self.directory = watcher.directory
+        self.index_path = os.path.join(self.directory, self.INDEX_FILE)
+        self._ids: Dict[str, int] = {}
+        self._paths: List[Optional[str]] = []
+        self._sizes = array('q')
+        self._mtimes = array('d')
+        self._alive = bytearray()
+        self._postings: Dict[str, array] = {}
+        self._dead = 0
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._save_timer: Optional[threading.Timer] = None
+        self._building = True
+        watcher.add_listener(self._on_file_event)
+
+    # ─── Persistence ─────────────────────────────────────────
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != self.INDEX_VERSION:
+                return
+            with self._lock:
+                for path, size, mtime in data['files']:
+                    self._ids[path] = len(self._paths)
+                    self._paths.append(path)
+                    self._sizes.append(size)
+                    self._mtimes.append(mtime)
+                    self._alive.append(1)
+                self._postings = {token: array('I', ids) for token, ids in data['postings'].items()}
+        except (json.JSONDecodeError, IOError, KeyError, ValueError, TypeError) as e:
+            print(f"Error loading search index from {self.index_path}: {e}")
+            self._ids, self._paths, self._postings = {}, [], {}
+            self._sizes, self._mtimes, self._alive = array('q'), array('d'), bytearray()
+
+    def _schedule_save_unsafe(self):
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.SAVE_DELAY, self.save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def save(self) -> bool:
+        with self._lock:
+            self._save_timer = None
+            self._compact_unsafe()
+            data = {
+                'version': self.INDEX_VERSION,
+                'files': [[p, s, m] for p, s, m in zip(self._paths, self._sizes, self._mtimes)],
+                'postings': {token: ids.tolist() for token, ids in self._postings.items()},
+            }
+        try:
+            temp_path = self.index_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(temp_path, self.index_path)
+            return True
+        except IOError as e:
+            print(f"Error saving search index to {self.index_path}: {e}")
+            return False
+
+    # ─── Index maintenance ───────────────────────────────────
+
+    def start(self):
+        """Index new and changed files in the background, then follow watcher events."""
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        self._load()
+        self.watcher.wait_ready()
+        files = self.watcher.snapshot()
+        with self._lock:
+            stale = [p for p in self._ids if p not in files]
+            for path in stale:
+                self._remove_unsafe(path)
+            changed = [p for p, (size, mtime) in files.items() if not self._is_current_unsafe(p, size, mtime)]
+            # Nothing to build: the sidecar already matches, so skip rewriting it
+            self._building = bool(changed)
+            if stale:
+                self._schedule_save_unsafe()
+        for path in changed:
+            self._queue.put(path)
+        if changed:
+            print(f"Search index: indexing {len(changed)} files in {self.directory}")
+        while True:
+            if self._queue.empty() and self._building:
+                self._building = False
+                self.save()
+            path = self._queue.get()
+            self._index_file(path)
+
+    def _on_file_event(self, event: str, relative_path: str, previous_path: Optional[str]):
+        if event in ('created', 'modified'):
+            self._queue.put(relative_path)
+        elif event == 'deleted':
+            with self._lock:
+                if self._remove_unsafe(relative_path):
+                    self._schedule_save_unsafe()
+        elif event == 'moved':
+            with self._lock:
+                # Drop the overwritten target first: removal may compact and renumber ids
+                self._remove_unsafe(relative_path)
+                doc_id = self._ids.pop(previous_path, None)
+                if doc_id is not None:
+                    self._ids[relative_path] = doc_id
+                    self._paths[doc_id] = relative_path
+                    self._schedule_save_unsafe()
+                else:
+                    self._queue.put(relative_path)
+
+    def _is_current_unsafe(self, path: str, size: int, mtime: float) -> bool:
+        doc_id = self._ids.get(path)
+        return doc_id is not None and self._sizes[doc_id] == size and self._mtimes[doc_id] == mtime
+
+    def _index_file(self, relative_path: str):
+        full_path = os.path.join(self.directory, relative_path)
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            return
+        with self._lock:
+            if self._is_current_unsafe(relative_path, stat.st_size, stat.st_mtime):
+                return
+        try:
+            tokens = extract_search_tokens(full_path)
+        except Exception as e:
+            print(f"Error indexing {relative_path}: {e}")
+            tokens = set()
+        with self._lock:
+            self._remove_unsafe(relative_path)
+            doc_id = len(self._paths)
+            self._ids[relative_path] = doc_id
+            self._paths.append(relative_path)
+            self._sizes.append(stat.st_size)
+            self._mtimes.append(stat.st_mtime)
+            self._alive.append(1)
+            for token in tokens:
+                posting = self._postings.get(token)
+                if posting is None:
+                    posting = self._postings[token] = array('I')
+                posting.append(doc_id)
+            self._schedule_save_unsafe()
+
+    def _remove_unsafe(self, relative_path: str) -> bool:
+        doc_id = self._ids.pop(relative_path, None)
+        if doc_id is None:
+            return False
+        self._alive[doc_id] = 0
+        self._paths[doc_id] = None
+        self._dead += 1
+        if self._dead >= self.COMPACT_MIN_DEAD and self._dead * 4 >= len(self._paths):
+            self._compact_unsafe()
+        return True
+
+    def _compact_unsafe(self):
+        """Drop tombstoned ids and renumber the remaining documents densely."""
+        if self._dead == 0:
+            return
+        alive = np.frombuffer(self._alive, dtype=np.uint8).astype(bool)
+        remap = np.cumsum(alive, dtype=np.int64) - 1
+        postings = {}
+        for token, ids in self._postings.items():
+            arr = np.frombuffer(ids, dtype=np.uint32)
+            arr = arr[alive[arr]]
+            if len(arr):
+                postings[token] = array('I', remap[arr].astype(np.uint32).tobytes())
+        self._postings = postings
+        keep = np.flatnonzero(alive)
+        self._paths = [self._paths[i] for i in keep]
+        self._sizes = array('q', np.frombuffer(self._sizes, dtype=np.int64)[keep].tobytes())
+        self._mtimes = array('d', np.frombuffer(self._mtimes, dtype=np.float64)[keep].tobytes())
+        self._alive = bytearray(b'\x01' * len(self._paths))
+        self._ids = {path: i for i, path in enumerate(self._paths)}
+        self._dead = 0
+
+    # ─── Queries ─────────────────────────────────────────────
+
+    def status(self) -> Dict:
+        with self._lock:
+            indexed = len(self._ids)
+        return {"indexed": indexed, "pending": self._queue.qsize(), "building": self._building}
+
+    def _term_ids_unsafe(self, field: Optional[str], term: str) -> Optional[np.ndarray]:
+        """Posting ids for one query term; None means the term imposes no constraint."""
+        term = term.lower()
+        if field:
+            keys_prefix = f"{field.lower()}:"
+            if term.endswith('*'):
+                return self._prefix_ids_unsafe(keys_prefix + term[:-1])
+            return self._posting_unsafe(keys_prefix + term)
+        words = TOKEN_PATTERN.findall(term.rstrip('*'))
+        if not words:
+            return None
+        result = None
+        for i, word in enumerate(words):
+            if term.endswith('*') and i == len(words) - 1:
+                ids = self._prefix_ids_unsafe(word)
+            else:
+                ids = self._posting_unsafe(word)
+            result = ids if result is None else np.intersect1d(result, ids, assume_unique=True)
+        return result
+
+    def _posting_unsafe(self, token: str) -> np.ndarray:
+        ids = self._postings.get(token)
+        if ids is None:
+            return np.empty(0, dtype=np.uint32)
+        return np.frombuffer(ids, dtype=np.uint32).copy()
+
+    def _prefix_ids_unsafe(self, prefix: str) -> np.ndarray:
+        parts = [np.frombuffer(ids, dtype=np.uint32) for token, ids in self._postings.items()
+                 if token.startswith(prefix)]
+        if not parts:
+            return np.empty(0, dtype=np.uint32)
+        return np.unique(np.concatenate(parts))
+
+    def search(self, query: str, sort_by: str = "date", reverse: bool = True) -> List[str]:
+        """
+        Return relative paths of files matching every term of the query.
+
+        Terms are words ("castle"), quoted phrases whose words must all match
+        ("red dress"), field terms (lora:detail_tweaker, seed:1234, sampler:euler)
+        and may end in * for a prefix match. A leading - excludes a term.
+        """
+        include, exclude = [], []
+        for negate, field, quoted, bare in QUERY_PATTERN.findall(query):
+            if field and field.lower() not in SEARCH_FIELDS:
+                # Not a known field, so treat "a:b" as plain text
+                bare = f"{field}:{quoted or bare}"
+                field, quoted = '', ''
+            (exclude if negate else include).append((field, quoted or bare))
+        if not include:
+            return []
+
+        with self._lock:
+            result = None
+            for field, term in sorted(include, key=lambda t: t[0] == ''):
+                ids = self._term_ids_unsafe(field, term)
+                if ids is None:
+                    continue
+                result = ids if result is None else np.intersect1d(result, ids, assume_unique=True)
+                if len(result) == 0:
+                    return []
+            if result is None:
+                return []
+            for field, term in exclude:
+                ids = self._term_ids_unsafe(field, term)
+                if ids is not None:
+                    result = np.setdiff1d(result, ids, assume_unique=True)
+            # Index without keeping a buffer view alive, which would block appends
+            result = result[np.frombuffer(self._alive, dtype=np.uint8)[result] == 1]
+
+            if sort_by == "filename":
+                order = sorted(result.tolist(), key=lambda i: self._paths[i].lower(), reverse=reverse)
+                return [self._paths[i] for i in order]
+            if sort_by == "size":
+                keys = np.frombuffer(self._sizes, dtype=np.int64)[result]
+            else:
+                keys = np.frombuffer(self._mtimes, dtype=np.float64)[result]
+            order = np.argsort(keys, kind='stable')
+            if reverse:
+                order = order[::-1]
+            return [self._paths[i] for i in result[order].tolist()]
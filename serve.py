@@ -1,8 +1,14 @@
 # save as serve.py
 import argparse
-from flask import Flask, send_from_directory
+from flask import Flask, send_from_directory, request, Response
+from collections import deque
+import json
 import os
+import threading
 import urllib.parse
+from delta import Signature, generate_plan, encode_delta, plan_is_in_place, plan_literal_bytes
+from hashing import HashCache, HASH_ALGORITHM
+from listing import FileListing
 
 app = Flask(__name__)
 
@@ -12,6 +18,7 @@ parser = argparse.ArgumentParser(description="Serve files from a specified direc
 parser.add_argument('--directory', '-d', action='append', help="Directories to serve files from")
 # Add a port argument to argparse
 parser.add_argument('--port', '-p', type=int, default=3138, help="Port to run the server on")
+parser.add_argument('--hash-workers', type=int, default=4, help="Threads used to hash files in the background")
 args = parser.parse_args()
 files_directories = [os.path.abspath(d) for d in args.directory] if args.directory else [os.path.abspath('.')]
 port = args.port
@@ -27,6 +34,47 @@ for directory in files_directories:
         print(f"Error: '{directory}' is not a valid directory.")
         exit(1)
 
+# Sidecar files written by the server itself are never listed
+hash_caches = [HashCache(d, workers=args.hash_workers) for d in files_directories]
+file_listing = FileListing(files_directories, excluded_names={HashCache.HASHES_FILE, HashCache.HASHES_FILE + '.tmp'})
+
+# Maximum number of files hashed ahead of the one currently being streamed
+HASH_WINDOW = 64
+
+def with_hashes(entries):
+    """
+    Attach content hashes to listing entries.
+
+    Hashes are computed in the background pools a window ahead of the
+    stream, and entries are yielded in listing order as their hashes land.
+    """
+    window = deque()
+
+    def attach(entry, future):
+        try:
+            return dict(entry, **{HASH_ALGORITHM: future.result()})
+        except OSError:
+            return None  # File vanished or became unreadable while hashing
+
+    for entry in entries:
+        relative_path = urllib.parse.unquote(entry['name'])
+        future = hash_caches[entry['directory_index']].submit(relative_path, entry['size'], entry['mtime'])
+        window.append((entry, future))
+        while window and (window[0][1].done() or len(window) >= HASH_WINDOW):
+            hashed = attach(*window.popleft())
+            if hashed:
+                yield hashed
+    while window:
+        hashed = attach(*window.popleft())
+        if hashed:
+            yield hashed
+
+def warm_hashes():
+    """Hash every served file in the background so manifests are ready when requested."""
+    for entry in file_listing.iter_files():
+        relative_path = urllib.parse.unquote(entry['name'])
+        hash_caches[entry['directory_index']].submit(relative_path, entry['size'], entry['mtime'])
+
 @app.route('/<int:directory_index>/<path:filename>')
 def get_file(directory_index, filename):
     # URL-decode the filename
@@ -39,21 +87,107 @@ def get_file(directory_index, filename):
             return send_from_directory(directory_path, filename)
     return {'error': 'File not found'}, 404
 
+@app.route('/hash/<int:directory_index>/<path:filename>')
+def get_hash(directory_index, filename):
+    filename = urllib.parse.unquote(filename)
+    if not 0 <= directory_index < len(files_directories):
+        return {'error': 'File not found'}, 404
+    directory_path = files_directories[directory_index]
+    filepath = os.path.join(directory_path, filename)
+    if not os.path.isfile(filepath) or not os.path.abspath(filepath).startswith(directory_path + os.sep):
+        return {'error': 'File not found'}, 404
+    digest = hash_caches[directory_index].get_hash(filename.replace(os.sep, '/'))
+    if digest is None:
+        return {'error': 'File not found'}, 404
+    return {'name': urllib.parse.quote(filename), HASH_ALGORITHM: digest}
+
+@app.route('/delta/<int:directory_index>/<path:filename>', methods=['POST'])
+def get_delta(directory_index, filename):
+    """
+    Return only the data needed to rebuild a file from the client's copy.
+
+    The request body is the block signature of the client's file (see
+    delta.compute_signature). The response streams copy instructions and
+    literal data; headers carry the target size and content hash and say
+    whether the client may patch its copy in place.
+    """
+    filename = urllib.parse.unquote(filename)
+    if not 0 <= directory_index < len(files_directories):
+        return {'error': 'File not found'}, 404
+    directory_path = files_directories[directory_index]
+    filepath = os.path.join(directory_path, filename)
+    if not os.path.isfile(filepath) or not os.path.abspath(filepath).startswith(directory_path + os.sep):
+        return {'error': 'File not found'}, 404
+
+    try:
+        signature = Signature(request.get_data())
+    except ValueError as e:
+        return {'error': f'Invalid signature: {e}'}, 400
+
+    ops = generate_plan(filepath, signature)
+    headers = {
+        'X-File-Size': str(os.path.getsize(filepath)),
+        'X-Delta-In-Place': '1' if plan_is_in_place(ops, signature.block_size) else '0',
+        'X-Delta-Literal-Bytes': str(plan_literal_bytes(ops)),
+    }
+    digest = hash_caches[directory_index].get_hash(filename.replace(os.sep, '/'))
+    if digest:
+        headers['X-Content-Hash'] = digest
+    return Response(encode_delta(filepath, ops), mimetype='application/octet-stream', headers=headers)
+
 @app.route('/')
 def list_files():
-    files = []
-    for index, directory in enumerate(files_directories):
-        for root, _, filenames in os.walk(directory):  # Recursively walk through subdirectories
-            for filename in filenames:
-                filepath = os.path.join(root, filename)
-                if os.path.isfile(filepath):
-                    relative_path = os.path.relpath(filepath, directory).replace(os.sep, '/')  # Use Linux-style paths
-                    files.append({
-                        'name': urllib.parse.quote(relative_path),  # URL-encode the path
-                        'size': os.path.getsize(filepath),
-                        'directory_index': index
-                    })
-    return {'files': files, 'directories': files_directories}
+    """
+    List served files.
+
+    Query parameters:
+        format: 'json' (default) or 'ndjson' to stream one entry per line
+        directory: only list the directory with this index
+        glob: fnmatch pattern matched against the relative path
+        hashes: include each file's content hash
+        page, page_size: paginate the JSON listing
+    """
+    output_format = request.args.get('format', 'json')
+    pattern = request.args.get('glob') or None
+    directory_index = request.args.get('directory', type=int)
+    if directory_index is not None and not 0 <= directory_index < len(files_directories):
+        return {'error': 'Invalid directory index'}, 400
+
+    page = request.args.get('page', type=int)
+    page_size = request.args.get('page_size', 1000, type=int)
+    if page is not None and (page < 0 or page_size < 1):
+        return {'error': 'page must be >= 0 and page_size >= 1'}, 400
+    include_hashes = request.args.get('hashes', '').lower() in ('1', 'true')
+
+    files = file_listing.iter_files(directory_index, pattern)
+
+    if output_format == 'ndjson':
+        if include_hashes:
+            files = with_hashes(files)
+
+        def generate():
+            # The header line lets clients validate directories before any file arrives
+            yield json.dumps({'directories': files_directories}) + '\n'
+            for entry in files:
+                yield json.dumps(entry) + '\n'
+        return Response(generate(), mimetype='application/x-ndjson')
+
+    if page is None:
+        return {'files': list(with_hashes(files) if include_hashes else files), 'directories': files_directories}
+
+    # Only the requested page is hashed, not the whole tree
+    all_files = list(files)
+    start = page * page_size
+    page_files = all_files[start:start + page_size]
+    return {
+        'files': list(with_hashes(page_files)) if include_hashes else page_files,
+        'directories': files_directories,
+        'total': len(all_files),
+        'page': page,
+        'page_size': page_size
+    }
 
 if __name__ == '__main__':
+    file_listing.start_watching()
+    threading.Thread(target=warm_hashes, daemon=True).start()
     app.run(host='0.0.0.0', port=port)
@@ -0,0 +1,334 @@
+import json
+import os
+import queue
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+import numpy as np
+from mp4 import extract_mp4_first_frame
+from source_watcher import SourceWatcher
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+HASH_WIDTH = 8  # dHash grid: 8x8 gradient bits = 64-bit hash
+DEFAULT_MAX_DISTANCE = 10
+DEFAULT_CLUSTER_DISTANCE = 4
+MAX_CLUSTER_DISTANCE = 8
+CLUSTER_BLOCK_ROWS = 1024  # Rows per pairwise-distance block inside one band bucket
+IMAGE_EXTENSIONS = ('.webp', '.png', '.jpg', '.jpeg')
+
+if hasattr(np, 'bitwise_count'):
+    def _popcount(values: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(values)
+else:
+    _POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(values: np.ndarray) -> np.ndarray:
+        as_bytes = values.view(np.uint8).reshape(values.shape + (8,))
+        return _POPCOUNT_TABLE[as_bytes].sum(axis=-1, dtype=np.uint8)
+
+
+def hamming_distances(hashes: np.ndarray, value: int) -> np.ndarray:
+    """Bit distance between one 64-bit hash and every hash in a uint64 array."""
+    return _popcount(np.bitwise_xor(hashes, np.uint64(value)))
+
+
+def load_first_frame(file_path: str) -> Optional["Image.Image"]:
+    """
+    Load the first frame of an image, animated WebP or MP4 as a grayscale image.
+
+    WebP animations use the same PIL seek(0) path as /static-frame and MP4s use
+    extract_mp4_first_frame, so the hash matches the thumbnail the grid shows.
+    """
+    import cv2
+    from PIL import Image
+
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == '.mp4':
+        frame = extract_mp4_first_frame(file_path)
+        if frame is None:
+            return None
+        return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+    if ext in IMAGE_EXTENSIONS:
+        with Image.open(file_path) as img:
+            img.draft('L', (HASH_WIDTH * 8, HASH_WIDTH * 8))  # Fast JPEG downscale; no-op for other formats
+            img.seek(0)
+            return img.convert('L')
+    return None
+
+
+def dhash(image: "Image.Image") -> int:
+    """
+    Compute a 64-bit difference hash: each bit says whether a pixel of the
+    9x8 downscaled image is brighter than its right-hand neighbour.
+    """
+    from PIL import Image
+
+    small = np.asarray(image.resize((HASH_WIDTH + 1, HASH_WIDTH), Image.BOX), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def compute_file_hash(file_path: str) -> Optional[int]:
+    frame = load_first_frame(file_path)
+    return dhash(frame) if frame is not None else None
+
+
+class SimilarityIndex:
+    """
+    Perceptual hashes for every image/video in one source.
+
+    Hashes live in a dense uint64 NumPy array (removals swap the last entry
+    into the freed slot) so a nearest-neighbour query is one vectorized XOR +
+    popcount over the whole source. Hashes are computed on a background thread,
+    cached in a JSON sidecar keyed on size+mtime and kept current from a
+    SourceWatcher.
+    """
+
+    HASHES_FILE = ".phash.json"
+    HASHES_VERSION = 1
+    SAVE_DELAY = 10.0  # Seconds to batch hash updates before writing the sidecar
+
+    def __init__(self, watcher: SourceWatcher):
+        self.watcher = watcher
+        self.directory = watcher.directory
+        self.hashes_path = os.path.join(self.directory, self.HASHES_FILE)
+        self._slots: Dict[str, int] = {}
+        self._paths: List[str] = []
+        self._stamps: Dict[str, Tuple[int, float]] = {}
+        self._hashes = np.zeros(1024, dtype=np.uint64)
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._save_timer: Optional[threading.Timer] = None
+        self._building = True
+        watcher.add_listener(self._on_file_event)
+
+    # ─── Persistence ─────────────────────────────────────────
+
+    def _load(self):
+        if not os.path.exists(self.hashes_path):
+            return
+        try:
+            with open(self.hashes_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != self.HASHES_VERSION:
+                return
+            with self._lock:
+                for path, (size, mtime, value) in data['hashes'].items():
+                    self._set_unsafe(path, size, mtime, int(value, 16))
+        except (json.JSONDecodeError, IOError, KeyError, ValueError, TypeError) as e:
+            print(f"Error loading perceptual hashes from {self.hashes_path}: {e}")
+
+    def _schedule_save_unsafe(self):
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.SAVE_DELAY, self.save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def save(self) -> bool:
+        with self._lock:
+            self._save_timer = None
+            hashes = {
+                path: [*self._stamps[path], f"{int(self._hashes[slot]):016x}"]
+                for path, slot in self._slots.items()
+            }
+        try:
+            temp_path = self.hashes_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.HASHES_VERSION, 'hashes': hashes}, f)
+            os.replace(temp_path, self.hashes_path)
+            return True
+        except IOError as e:
+            print(f"Error saving perceptual hashes to {self.hashes_path}: {e}")
+            return False
+
+    # ─── Index maintenance ───────────────────────────────────
+
+    def start(self):
+        """Hash new and changed files in the background, then follow watcher events."""
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        self._load()
+        self.watcher.wait_ready()
+        files = self.watcher.snapshot()
+        with self._lock:
+            stale = [p for p in self._slots if p not in files]
+            for path in stale:
+                self._remove_unsafe(path)
+            changed = [p for p, stamp in files.items() if self._stamps.get(p) != stamp]
+            # Nothing to build: the sidecar already matches, so skip rewriting it
+            self._building = bool(changed)
+            if stale:
+                self._schedule_save_unsafe()
+        for path in changed:
+            self._queue.put(path)
+        while True:
+            if self._queue.empty() and self._building:
+                self._building = False
+                self.save()
+            self._hash_file(self._queue.get())
+
+    def _on_file_event(self, event: str, relative_path: str, previous_path: Optional[str]):
+        if event in ('created', 'modified'):
+            self._queue.put(relative_path)
+            return
+        with self._lock:
+            if event == 'deleted':
+                self._remove_unsafe(relative_path)
+            elif event == 'moved' and previous_path in self._slots:
+                self._remove_unsafe(relative_path)
+                slot = self._slots.pop(previous_path)
+                self._slots[relative_path] = slot
+                self._paths[slot] = relative_path
+                self._stamps[relative_path] = self._stamps.pop(previous_path)
+            else:
+                self._queue.put(relative_path)
+                return
+            self._schedule_save_unsafe()
+
+    def _hash_file(self, relative_path: str) -> Optional[int]:
+        full_path = os.path.join(self.directory, relative_path)
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            return None
+        stamp = (stat.st_size, stat.st_mtime)
+        with self._lock:
+            slot = self._slots.get(relative_path)
+            if slot is not None and self._stamps[relative_path] == stamp:
+                return int(self._hashes[slot])
+        try:
+            value = compute_file_hash(full_path)
+        except Exception as e:
+            print(f"Error hashing {relative_path}: {e}")
+            value = None
+        if value is None:
+            return None
+        with self._lock:
+            self._set_unsafe(relative_path, stamp[0], stamp[1], value)
+            self._schedule_save_unsafe()
+        return value
+
+    def _set_unsafe(self, path: str, size: int, mtime: float, value: int):
+        slot = self._slots.get(path)
+        if slot is None:
+            slot = len(self._paths)
+            if slot == len(self._hashes):
+                self._hashes = np.concatenate([self._hashes, np.zeros(len(self._hashes), dtype=np.uint64)])
+            self._slots[path] = slot
+            self._paths.append(path)
+        self._hashes[slot] = np.uint64(value)
+        self._stamps[path] = (size, mtime)
+
+    def _remove_unsafe(self, path: str):
+        slot = self._slots.pop(path, None)
+        if slot is None:
+            return
+        del self._stamps[path]
+        last = len(self._paths) - 1
+        if slot != last:
+            moved = self._paths[last]
+            self._paths[slot] = moved
+            self._hashes[slot] = self._hashes[last]
+            self._slots[moved] = slot
+        self._paths.pop()
+
+    # ─── Queries ─────────────────────────────────────────────
+
+    def status(self) -> Dict:
+        with self._lock:
+            hashed = len(self._paths)
+        return {"hashed": hashed, "pending": self._queue.qsize(), "building": self._building}
+
+    def get_hash(self, relative_path: str) -> Optional[int]:
+        """Return a file's hash, computing it now if the background pass has not reached it."""
+        return self._hash_file(relative_path)
+
+    def snapshot(self) -> Tuple[List[str], np.ndarray]:
+        """Return (paths, hashes) for every hashed file."""
+        with self._lock:
+            return list(self._paths), self._hashes[:len(self._paths)].copy()
+
+    def nearest(self, value: int, max_distance: int) -> List[Tuple[str, int]]:
+        """Return (path, distance) for every file within max_distance bits of value."""
+        with self._lock:
+            distances = hamming_distances(self._hashes[:len(self._paths)], value)
+            matches = np.flatnonzero(distances <= max_distance)
+            return [(self._paths[i], int(distances[i])) for i in matches]
+
+
+def _connected_labels(count: int, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Label connected components of an undirected edge list by min-label propagation."""
+    labels = np.arange(count)
+    if len(left) == 0:
+        return labels
+    while True:
+        previous = labels.copy()
+        low = np.minimum(labels[left], labels[right])
+        np.minimum.at(labels, left, low)
+        np.minimum.at(labels, right, low)
+        labels = labels[labels]  # Pointer jumping shortens chains each round
+        if np.array_equal(labels, previous):
+            return labels
+
+
+def find_clusters(hash_sets: List[Tuple[str, List[str], np.ndarray]],
+                  max_distance: int = DEFAULT_CLUSTER_DISTANCE) -> List[List[Tuple[str, str]]]:
+    """
+    Group near-duplicate files across sources.
+
+    Uses the pigeonhole principle: hashes within max_distance bits must agree
+    exactly on at least one of max_distance + 1 bit bands, so only hashes that
+    share a band value are compared instead of every pair.
+
+    Args:
+        hash_sets: (dir_name, paths, hashes) for each source
+        max_distance: Largest Hamming distance treated as a near-duplicate
+            (capped at MAX_CLUSTER_DISTANCE, beyond which bands get too coarse)
+
+    Returns:
+        Clusters of (dir_name, path), largest first
+    """
+    keys = [(dir_name, path) for dir_name, paths, _ in hash_sets for path in paths]
+    if not keys:
+        return []
+    max_distance = max(0, min(max_distance, MAX_CLUSTER_DISTANCE))
+    # Identical hashes (e.g. repeated blank frames) collapse to one node up front
+    unique_hashes, inverse = np.unique(np.concatenate([h for _, _, h in hash_sets]), return_inverse=True)
+    count = len(unique_hashes)
+
+    lefts, rights = [], []
+    bands = max_distance + 1
+    band_bits = 64 // bands
+    for band in range(bands):
+        shift = band * band_bits
+        width = 64 - shift if band == bands - 1 else band_bits
+        values = (unique_hashes >> np.uint64(shift)) & np.uint64((1 << width) - 1)
+        order = np.argsort(values, kind='stable')
+        sorted_values = values[order]
+        starts = np.flatnonzero(np.r_[True, sorted_values[1:] != sorted_values[:-1]])
+        ends = np.r_[starts[1:], count]
+        multi = ends - starts > 1
+        for start, end in zip(starts[multi], ends[multi]):
+            members = order[start:end]
+            group = unique_hashes[members]
+            for row in range(0, len(group), CLUSTER_BLOCK_ROWS):
+                block = group[row:row + CLUSTER_BLOCK_ROWS]
+                distances = _popcount(np.bitwise_xor(block[:, None], group[None, row:]))
+                rows, cols = np.nonzero(distances <= max_distance)
+                upper = cols > rows  # Each pair once, and no self-pairs
+                lefts.append(members[row + rows[upper]])
+                rights.append(members[row + cols[upper]])
+
+    if lefts:
+        labels = _connected_labels(count, np.concatenate(lefts), np.concatenate(rights))
+    else:
+        labels = np.arange(count)
+
+    groups: Dict[int, List[Tuple[str, str]]] = {}
+    for key, label in zip(keys, labels[inverse].tolist()):
+        groups.setdefault(label, []).append(key)
+    clusters = [members for members in groups.values() if len(members) > 1]
+    clusters.sort(key=len, reverse=True)
+    return clusters
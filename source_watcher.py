@@ -0,0 +1,245 @@
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+from listing import scan_directory
+
+# listener(event, relative_path, previous_path) where event is one of
+# 'created', 'modified', 'deleted' or 'moved' (previous_path is only set for moves)
+Listener = Callable[[str, str, Optional[str]], None]
+
+
+class _SourceEventHandler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if event.is_directory:
+            self.watcher._directory_created(event.src_path)
+        else:
+            self.watcher._file_changed(event.src_path, 'created')
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher._file_changed(event.src_path, 'modified')
+
+    def on_deleted(self, event):
+        if event.is_directory:
+            self.watcher._directory_removed(event.src_path)
+        else:
+            self.watcher._file_removed(event.src_path)
+
+    def on_moved(self, event):
+        if event.is_directory:
+            self.watcher._directory_moved(event.src_path, event.dest_path)
+        else:
+            self.watcher._file_moved(event.src_path, event.dest_path)
+
+
+class SourceWatcher:
+    """
+    Live view of the media files below a gallery source directory.
+
+    The tree is scanned once in the background and then kept current by a
+    watchdog observer. Create/modify events are debounced so listeners see a
+    single event once a file has stopped changing; directory moves and deletes
+    are expanded into per-file events.
+
+    Listeners are called on watcher threads while the watcher lock is held, so
+    they must return quickly (queue work rather than doing it inline).
+    """
+
+    DEBOUNCE_SECONDS = 1.0
+
+    def __init__(self, directory: str, allowed_extensions: Iterable[str]):
+        self.directory = os.path.abspath(directory)
+        self.allowed_extensions = {ext.lower().lstrip('.') for ext in allowed_extensions}
+        self._files: Dict[str, Tuple[int, float]] = {}
+        self._listeners: List[Listener] = []
+        self._pending: Dict[str, str] = {}
+        # Paths (and 'dir/' prefixes) deleted while the initial scan is running
+        self._scan_removed: Set[str] = set()
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.RLock()
+        self._ready = threading.Event()
+        self._observer: Optional[Observer] = None
+
+    def add_listener(self, listener: Listener):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def start(self):
+        """Start watching and scan the existing tree in a background thread."""
+        if self._observer is not None:
+            return
+        observer = Observer()
+        observer.schedule(_SourceEventHandler(self), self.directory, recursive=True)
+        observer.daemon = True
+        observer.start()
+        self._observer = observer
+        threading.Thread(target=self._initial_scan, daemon=True).start()
+
+    def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until the initial scan has finished."""
+        return self._ready.wait(timeout)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def snapshot(self) -> Dict[str, Tuple[int, float]]:
+        """Return a copy of the known files as {relative_path: (size, mtime)}."""
+        with self._lock:
+            return dict(self._files)
+
+    def get_entry(self, relative_path: str) -> Optional[Tuple[int, float]]:
+        """Return (size, mtime) for one known file, or None."""
+        with self._lock:
+            return self._files.get(relative_path)
+
+    def is_media_file(self, path: str) -> bool:
+        ext = os.path.splitext(path)[1].lower().lstrip('.')
+        return ext in self.allowed_extensions
+
+    def _initial_scan(self):
+        scanned = {}
+        for item in scan_directory(self.directory):
+            if self.is_media_file(item['path']):
+                scanned[item['path']] = (item['size'], item['mtime'])
+        with self._lock:
+            # Entries added by events during the scan are newer than the scan's view
+            scanned.update(self._files)
+            # ...and files deleted during the scan must not come back from it
+            removed_dirs = tuple(p for p in self._scan_removed if p.endswith('/'))
+            for path in [p for p in scanned if p not in self._files]:
+                if path in self._scan_removed or (removed_dirs and path.startswith(removed_dirs)):
+                    del scanned[path]
+            self._scan_removed = set()
+            self._files = scanned
+        self._ready.set()
+
+    def _note_removed_unsafe(self, relative_path: str):
+        if not self._ready.is_set():
+            self._scan_removed.add(relative_path)
+
+    def _relative_path(self, full_path: str) -> Optional[str]:
+        if not full_path.startswith(self.directory + os.sep):
+            return None
+        return os.path.relpath(full_path, self.directory).replace(os.sep, '/')
+
+    def _emit(self, event: str, relative_path: str, previous_path: Optional[str] = None):
+        for listener in list(self._listeners):
+            try:
+                listener(event, relative_path, previous_path)
+            except Exception as e:
+                print(f"Error in source watcher listener for {relative_path}: {e}")
+
+    def _file_changed(self, full_path: str, event: str):
+        relative_path = self._relative_path(full_path)
+        if relative_path is None or not self.is_media_file(relative_path):
+            return
+        with self._lock:
+            # A file created and then written to is still a single 'created' event
+            if self._pending.get(relative_path) != 'created':
+                self._pending[relative_path] = event
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.DEBOUNCE_SECONDS, self._flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush(self):
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._timer = None
+            for relative_path, event in pending.items():
+                try:
+                    stat = os.stat(os.path.join(self.directory, relative_path))
+                except OSError:
+                    continue
+                entry = (stat.st_size, stat.st_mtime)
+                previous = self._files.get(relative_path)
+                if previous == entry:
+                    continue
+                self._files[relative_path] = entry
+                self._emit('created' if previous is None else 'modified', relative_path)
+
+    def _file_removed(self, full_path: str):
+        relative_path = self._relative_path(full_path)
+        if relative_path is None:
+            return
+        with self._lock:
+            self._note_removed_unsafe(relative_path)
+            self._pending.pop(relative_path, None)
+            if self._files.pop(relative_path, None) is not None:
+                self._emit('deleted', relative_path)
+
+    def _file_moved(self, src_path: str, dest_path: str):
+        old_path = self._relative_path(src_path)
+        new_path = self._relative_path(dest_path)
+        with self._lock:
+            known = None
+            if old_path is not None:
+                self._note_removed_unsafe(old_path)
+                self._pending.pop(old_path, None)
+                known = self._files.pop(old_path, None)
+            if new_path is None or not self.is_media_file(new_path):
+                if known is not None:
+                    self._emit('deleted', old_path)
+                return
+            if known is None:
+                # Renamed into place from a temp name or from outside the tree
+                self._file_changed(dest_path, 'created')
+                return
+            self._files[new_path] = known
+            self._emit('moved', new_path, old_path)
+
+    def _directory_created(self, full_path: str):
+        # Directories moved in from outside the tree arrive without per-file events
+        relative_dir = self._relative_path(full_path)
+        if relative_dir is None:
+            return
+        for item in scan_directory(full_path):
+            self._file_changed(os.path.join(full_path, item['path']), 'created')
+
+    def _directory_removed(self, full_path: str):
+        relative_dir = self._relative_path(full_path)
+        if relative_dir is None:
+            return
+        prefix = relative_dir + '/'
+        with self._lock:
+            self._note_removed_unsafe(prefix)
+            for relative_path in [p for p in self._files if p.startswith(prefix)]:
+                self._pending.pop(relative_path, None)
+                del self._files[relative_path]
+                self._emit('deleted', relative_path)
+
+    def _directory_moved(self, src_path: str, dest_path: str):
+        old_dir = self._relative_path(src_path)
+        new_dir = self._relative_path(dest_path)
+        if old_dir is None:
+            self._directory_created(dest_path)
+            return
+        if new_dir is None:
+            self._directory_removed(src_path)
+            return
+        old_prefix = old_dir + '/'
+        new_prefix = new_dir + '/'
+        with self._lock:
+            # The initial scan may have seen either side of the move; rescan the new side
+            rescan = not self._ready.is_set()
+            self._note_removed_unsafe(old_prefix)
+            for old_path in [p for p in self._files if p.startswith(old_prefix)]:
+                new_path = new_prefix + old_path[len(old_prefix):]
+                self._files[new_path] = self._files.pop(old_path)
+                self._emit('moved', new_path, old_path)
+        if rescan:
+            self._directory_created(dest_path)
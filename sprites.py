@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from mp4 import extract_mp4_first_frame
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+SPRITE_TILE_SIZE = 320    # Longest side of each thumbnail in the sheet
+SPRITE_COLUMNS = 4
+SPRITE_QUALITY = 80
+SPRITE_EXTENSIONS = ('.webp', '.png', '.jpg', '.jpeg', '.mp4')
+
+# (relative path, size, mtime, tile width, tile height)
+SpriteTile = Tuple[str, int, float, int, int]
+
+
+def fit_tile(width: int, height: int) -> Tuple[int, int]:
+    """Size of a width x height image scaled down to fit one sprite tile."""
+    scale = min(1.0, SPRITE_TILE_SIZE / max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def load_thumbnail(path: str, size: Tuple[int, int]) -> "Image.Image":
+    """First frame of an image, animated WebP or MP4, resized to exactly size."""
+    import cv2
+    from PIL import Image
+
+    if path.lower().endswith('.mp4'):
+        frame = extract_mp4_first_frame(path)
+        if frame is None:
+            raise ValueError("no decodable frame")
+        return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)).resize(size, Image.BILINEAR)
+    with Image.open(path) as img:
+        # Lets JPEG decode at a reduced scale instead of full resolution
+        img.draft('RGB', size)
+        return img.convert('RGBA').resize(size, Image.BILINEAR)
+
+
+class SpriteSheets:
+    """
+    One WebP sprite sheet per grid page of thumbnails.
+
+    layout() is called while building an /images page: from the files'
+    known resolutions it places each thumbnail in a fixed grid of tiles and
+    returns the offset map without touching any pixels. The sheet's key is
+    a hash of the page's files, sizes and mtimes, so its URL can be cached
+    forever; the sheet itself is composed on its first request and kept as
+    a file under cache_dir (oldest sheets are dropped past MAX_SHEETS).
+    """
+
+    MAX_LAYOUTS = 1024  # Pages remembered for sheets not rendered yet
+    MAX_SHEETS = 2000
+
+    def __init__(self, cache_dir: str):
+        self.directory = os.path.join(os.path.abspath(cache_dir), 'sprites')
+        self._layouts: "OrderedDict[str, Tuple[str, List[SpriteTile]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _sheet_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.webp')
+
+    def layout(self, source_dir: str, files: List[Tuple[str, int, float, int, int]]) -> Optional[Dict]:
+        """
+        Lay out a page's thumbnails; files are (relative path, size, mtime, width, height).
+
+        Returns {"key", "width", "height", "tiles": {path: [x, y, w, h]}} or
+        None if no file on the page can go in a sheet.
+        """
+        tiles: List[SpriteTile] = [
+            (path, size, mtime, *fit_tile(width, height))
+            for path, size, mtime, width, height in files
+            if path.lower().endswith(SPRITE_EXTENSIONS) and width > 0 and height > 0
+        ]
+        if not tiles:
+            return None
+        key = hashlib.sha1(json.dumps([source_dir, tiles]).encode('utf-8')).hexdigest()
+        with self._lock:
+            self._layouts[key] = (source_dir, tiles)
+            self._layouts.move_to_end(key)
+            while len(self._layouts) > self.MAX_LAYOUTS:
+                self._layouts.popitem(last=False)
+        columns = min(len(tiles), SPRITE_COLUMNS)
+        rows = (len(tiles) + columns - 1) // columns
+        return {
+            "key": key,
+            "width": columns * SPRITE_TILE_SIZE,
+            "height": rows * SPRITE_TILE_SIZE,
+            "tiles": {
+                path: [(i % columns) * SPRITE_TILE_SIZE, (i // columns) * SPRITE_TILE_SIZE, width, height]
+                for i, (path, _, _, width, height) in enumerate(tiles)
+            },
+        }
+
+    def get_sheet(self, key: str) -> Optional[str]:
+        """Path of a laid-out sheet, composing it on first use; None for unknown keys."""
+        from PIL import Image
+
+        sheet_path = self._sheet_path(key)
+        if os.path.exists(sheet_path):
+            return sheet_path
+        with self._lock:
+            layout = self._layouts.get(key)
+        if layout is None:
+            return None
+        source_dir, tiles = layout
+        columns = min(len(tiles), SPRITE_COLUMNS)
+        rows = (len(tiles) + columns - 1) // columns
+        sheet = Image.new('RGBA', (columns * SPRITE_TILE_SIZE, rows * SPRITE_TILE_SIZE))
+        for i, (path, _, _, width, height) in enumerate(tiles):
+            try:
+                thumbnail = load_thumbnail(os.path.join(source_dir, path), (width, height))
+            except Exception as e:
+                # Leave the tile transparent rather than failing the whole page
+                print(f"Error adding {path} to sprite sheet: {e}")
+                continue
+            sheet.paste(thumbnail, ((i % columns) * SPRITE_TILE_SIZE, (i // columns) * SPRITE_TILE_SIZE))
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f"{sheet_path}.{threading.get_ident()}.tmp"
+        sheet.save(temp_path, format='WEBP', quality=SPRITE_QUALITY, method=4)
+        os.replace(temp_path, sheet_path)
+        self._prune()
+        return sheet_path
+
+    def _prune(self):
+        try:
+            sheets = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.webp')]
+            if len(sheets) <= self.MAX_SHEETS:
+                return
+            sheets.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in sheets[:len(sheets) - self.MAX_SHEETS]:
+                os.remove(entry.path)
+        except OSError as e:
+            print(f"Error pruning sprite sheets in {self.directory}: {e}")
@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from typing import Optional
+
+GALLERY_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gallery.py')
+POLL_INTERVAL = 0.01
+TIMEOUT_SECONDS = 60.0
+
+# Smallest valid PNG (1x1, RGBA), so a large library costs inodes rather than disk
+_PNG_1X1 = bytes.fromhex(
+    '89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c489'
+    '0000000d4944415478da63606060600000000500017aa857500000000049454e44ae426082'
+)
+
+
+def create_library(directory: str, file_count: int, files_per_folder: int = 500):
+    """Fill directory with file_count tiny PNGs, each rated and tagged like a curated library."""
+    ratings = {}
+    tags = {}
+    for index in range(file_count):
+        relative_path = f"batch_{index // files_per_folder:04d}/image_{index:06d}.png"
+        full_path = os.path.join(directory, relative_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'wb') as f:
+            f.write(_PNG_1X1)
+        ratings[relative_path] = index % 4
+        tags[relative_path] = [f"tag_{index % 50}", f"batch_{index // files_per_folder}"]
+    with open(os.path.join(directory, 'ratings.json'), 'w', encoding='utf-8') as f:
+        json.dump(ratings, f)
+    with open(os.path.join(directory, 'tags.json'), 'w', encoding='utf-8') as f:
+        json.dump(tags, f)
+
+
+def _wait_for(url: str, start: float, process: subprocess.Popen) -> Optional[float]:
+    """Seconds from start until url answers 200; None if the server died or timed out."""
+    while time.perf_counter() - start < TIMEOUT_SECONDS:
+        if process.poll() is not None:
+            return None
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                response.read()
+                if response.status == 200:
+                    return time.perf_counter() - start
+        except (urllib.error.URLError, ConnectionError, TimeoutError):
+            pass
+        time.sleep(POLL_INTERVAL)
+    return None
+
+
+def _start_server(gallery_dir: str, cache_dir: str, port: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, GALLERY_SCRIPT, gallery_dir, '--cache-dir', cache_dir, '--port', str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def _stop_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def benchmark(gallery_dir: str, cache_dir: str, port: int, runs: int, warmup: float):
+    """
+    Measure how long a restarted gallery takes to answer its first requests.
+
+    A warm-up run is left up for warmup seconds so the background indexes
+    write their sidecars, as they would have on a pod that ran before. Each
+    measured run then starts gallery.py afresh and times, from process
+    start, the first response of the page itself (/) and of the first page
+    of the grid (/images).
+    """
+    base_url = f"http://127.0.0.1:{port}"
+    if warmup > 0:
+        print(f"Warm-up run ({warmup:.0f}s)...")
+        process = _start_server(gallery_dir, cache_dir, port)
+        try:
+            if _wait_for(base_url + '/', time.perf_counter(), process) is None:
+                print("Server did not start")
+                sys.exit(1)
+            time.sleep(warmup)
+        finally:
+            _stop_server(process)
+
+    print(f"{'Run':<6} {'First /':>10} {'First /images':>15}")
+    page_times = []
+    images_times = []
+    for run in range(1, runs + 1):
+        start = time.perf_counter()
+        process = _start_server(gallery_dir, cache_dir, port)
+        try:
+            page_time = _wait_for(base_url + '/', start, process)
+            images_time = _wait_for(base_url + '/images?dir=gallery&page=0', start, process)
+        finally:
+            _stop_server(process)
+        if page_time is None or images_time is None:
+            print(f"{run:<6} server did not answer")
+            sys.exit(1)
+        page_times.append(page_time)
+        images_times.append(images_time)
+        print(f"{run:<6} {page_time:>9.3f}s {images_time:>14.3f}s")
+    print(f"{'Median':<6} {statistics.median(page_times):>9.3f}s {statistics.median(images_times):>14.3f}s")
+
+
+def main():
+    """Command-line benchmark for gallery startup."""
+    parser = argparse.ArgumentParser(description="Benchmark gallery.py time-to-first-response")
+    parser.add_argument('gallery_dir', nargs='?', help="Library to serve (default: a generated one)")
+    parser.add_argument('--files', type=int, default=20000, help="Files in the generated library (default: 20000)")
+    parser.add_argument('--runs', type=int, default=5, help="Measured restarts (default: 5)")
+    parser.add_argument('--warmup', type=float, default=15.0, help="Seconds the warm-up run stays up (0 to skip)")
+    parser.add_argument('--port', type=int, default=3138, help="Port for the benchmarked server (default: 3138)")
+    args = parser.parse_args()
+
+    temp_dir = tempfile.mkdtemp(prefix='gallery-startup-')
+    try:
+        gallery_dir = args.gallery_dir
+        if gallery_dir is None:
+            gallery_dir = os.path.join(temp_dir, 'gallery')
+            print(f"Creating library of {args.files:,} files...")
+            create_library(gallery_dir, args.files)
+        benchmark(gallery_dir, os.path.join(temp_dir, 'cache'), args.port, args.runs, args.warmup)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
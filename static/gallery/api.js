@@ -1,4 +1,63 @@
 import { state } from './state.js';
+import { LruCache } from './utils.js';
+
+// ─── Request cache ─────────────────────────────────────────
+
+const RESPONSE_CACHE_SIZE = 200;
+const RESPONSE_CACHE_BYTES = 8 * 1024 * 1024;  // Full /metadata bodies alone can be 500 KB each
+const responseCache = new LruCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_BYTES);  // url → { etag, data } from the last 200 response
+const inFlight = new Map();                               // url → { request, signal } shared by concurrent callers
+const channels = new Map();                               // channel → AbortController of its latest request
+
+function supersede(channel) {
+    channels.get(channel)?.abort();
+    const controller = new AbortController();
+    channels.set(channel, controller);
+    return controller.signal;
+}
+
+/**
+ * GET a JSON endpoint. Concurrent calls for the same url share one request,
+ * and the ETag of the last response is sent back so an unchanged resource
+ * costs a 304 instead of a rebuild and re-parse. Starting a request on a
+ * channel aborts the channel's previous one. Resolves to null if the server
+ * returned an error or the request was superseded.
+ */
+async function getJson(url, { channel = null } = {}) {
+    const pending = inFlight.get(url);
+    const live = pending && !pending.signal?.aborted ? pending : null;
+    // The channel's own latest request has nothing newer to be superseded by
+    if (live && (!channel || channels.get(channel)?.signal === live.signal)) return live.request;
+    const signal = channel ? supersede(channel) : undefined;
+    // Superseding may just have aborted the shared request; never hand that one out
+    if (live && !live.signal?.aborted) return live.request;
+    const cached = responseCache.get(url);
+    const entry = { signal };
+    entry.request = (async () => {
+        try {
+            const response = await fetch(url, {
+                signal,
+                cache: 'no-store',
+                headers: cached ? { 'If-None-Match': cached.etag } : {},
+            });
+            if (response.status === 304 && cached) return cached.data;
+            if (!response.ok) return null;
+            const text = await response.text();
+            const data = JSON.parse(text);
+            const etag = response.headers.get('ETag');
+            if (etag) responseCache.set(url, { etag, data }, text.length);
+            return data;
+        } catch (err) {
+            if (err.name === 'AbortError') return null;
+            throw err;
+        } finally {
+            if (inFlight.get(url) === entry) inFlight.delete(url);
+        }
+    })();
+    inFlight.set(url, entry);
+    return entry.request;
+}
+
 
 export async function addTagRequest(dir, filename, tag) {
     try {
@@ -10,9 +69,8 @@ export async function addTagRequest(dir, filename, tag) {
         const data = await response.json();
         if (data.success) {
             const cacheKey = `${dir}/${filename}`;
-            if (state.fileMetadataCache[cacheKey]) {
-                state.fileMetadataCache[cacheKey].tags = data.tags;
-            }
+            const fileMetadata = state.fileMetadataCache.get(cacheKey);
+            if (fileMetadata) fileMetadata.tags = data.tags;
             return data.tags;
         }
         return null;
@@ -32,9 +90,8 @@ export async function removeTagRequest(dir, filename, tag) {
         const data = await response.json();
         if (data.success) {
             const cacheKey = `${dir}/${filename}`;
-            if (state.fileMetadataCache[cacheKey]) {
-                state.fileMetadataCache[cacheKey].tags = data.tags;
-            }
+            const fileMetadata = state.fileMetadataCache.get(cacheKey);
+            if (fileMetadata) fileMetadata.tags = data.tags;
             return data.tags;
         }
         return null;
@@ -54,9 +111,8 @@ export async function setRatingRequest(dir, filename, rating) {
         const data = await response.json();
         if (data.success) {
             const cacheKey = `${dir}/${filename}`;
-            if (state.fileMetadataCache[cacheKey]) {
-                state.fileMetadataCache[cacheKey].rating = rating;
-            }
+            const fileMetadata = state.fileMetadataCache.get(cacheKey);
+            if (fileMetadata) fileMetadata.rating = rating;
             return true;
         }
         console.error('Failed to set rating:', data.message);
@@ -67,15 +123,16 @@ export async function setRatingRequest(dir, filename, rating) {
     }
 }
 
-export async function fetchMetadataRequest(filename, dir) {
+// summary: only _basic and _summary (models, sampler settings, prompts), not the workflow graph
+export async function fetchMetadataRequest(filename, dir, summary = false) {
     try {
-        const response = await fetch(`/metadata/${dir}/${filename}`);
-        const data = await response.json();
-        if (data.success) {
-            state.metadataCache[`${dir}/${filename}`] = data.metadata;
+        const query = summary ? '?summary=true' : '';
+        const data = await getJson(`/metadata/${dir}/${filename}${query}`, { channel: 'metadata' });
+        if (data && data.success) {
+            state.metadataCache.set(`${dir}/${filename}`, data.metadata);
             return data.metadata;
         }
-        console.error('Metadata fetch failed:', data.message);
+        if (data) console.error('Metadata fetch failed:', data.message);
         return null;
     } catch (err) {
         console.error('Error fetching metadata:', err);
@@ -83,21 +140,44 @@ export async function fetchMetadataRequest(filename, dir) {
     }
 }
 
-export async function fetchTagsRequest(dir, subpath, tagFilter = new Set()) {
+// channel: requests that replace each other (the tag filter after every change); null to never abort
+export async function fetchTagsRequest(dir, subpath, tagFilter = new Set(), recursive = false, channel = 'tag-filter') {
     const tagParam = tagFilter.size > 0 ? `&tag_filter=${[...tagFilter].join(',')}` : '';
-    const response = await fetch(`/tags?dir=${dir}&subpath=${encodeURIComponent(subpath)}${tagParam}`);
-    if (!response.ok) return null;
-    return response.json();
+    return getJson(`/tags?dir=${dir}&subpath=${encodeURIComponent(subpath)}&recursive=${recursive}${tagParam}`, { channel });
+}
+
+// Superseded lookups (the next keystroke) resolve to null
+export async function fetchTagSuggestionsRequest(prefix, limit) {
+    return getJson(`/tags/suggest?prefix=${encodeURIComponent(prefix)}&limit=${limit}`, { channel: 'tag-suggest' });
 }
 
-export async function fetchExtensionsRequest(dir, subpath) {
-    const response = await fetch(`/extensions?dir=${dir}&subpath=${encodeURIComponent(subpath)}`);
-    if (!response.ok) return null;
-    return response.json();
+export async function fetchExtensionsRequest(dir, subpath, recursive = false) {
+    return getJson(`/extensions?dir=${dir}&subpath=${encodeURIComponent(subpath)}&recursive=${recursive}`, { channel: 'ext-filter' });
 }
 
-export async function uploadFilesRequest(formData) {
-    return fetch('/upload', { method: 'POST', body: formData });
+export async function initUploadRequest(filename, size, subdir, fingerprint) {
+    return fetch('/upload/init', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ filename, size, subdir, fingerprint }),
+    });
+}
+
+// digest: hex SHA-256 of the chunk, or null to let the server skip the check
+export async function uploadChunkRequest(uploadId, index, blob, digest) {
+    return fetch(`/upload/${uploadId}/chunks/${index}`, {
+        method: 'PUT',
+        headers: digest ? { 'X-Chunk-SHA256': digest } : {},
+        body: blob,
+    });
+}
+
+export async function completeUploadRequest(uploadId, checksum) {
+    return fetch(`/upload/${uploadId}/complete`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(checksum ? { checksum } : {}),
+    });
 }
 
 export async function deleteFilesRequest(files, directory) {
@@ -121,12 +201,11 @@ export async function applyMoveRequest(files, sourceDir, targetDir, targetSubpat
     });
 }
 
+// Always revalidates (a 304 when unchanged) so folders created or moved elsewhere show up
 export async function fetchDirTree(dir) {
-    if (state.dirTreeCache[dir]) return state.dirTreeCache[dir];
-    const res = await fetch(`/dirs?dir=${dir}`);
-    if (!res.ok) throw new Error(`Failed to fetch ${dir} tree`);
-    const data = await res.json();
-    state.dirTreeCache[dir] = data.tree;
+    const data = await getJson(`/dirs?dir=${dir}`);
+    if (!data) throw new Error(`Failed to fetch ${dir} tree`);
+    state.dirTreeCache.set(dir, data.tree);
     return data.tree;
 }
 
@@ -158,12 +237,35 @@ export async function mkdirRequest(dir, subdir, name) {
     });
 }
 
+export async function searchRequest(params) {
+    const { dir, query, page, sortBy, sortDir, ratingFilter, tagFilter, extFilter } = params;
+    const tagParam = tagFilter.size > 0 ? `&tag_filter=${[...tagFilter].join(',')}` : '';
+    const extParam = extFilter ? `&ext_filter=${encodeURIComponent(extFilter)}` : '';
+    return fetch(
+        `/search?dir=${dir}&q=${encodeURIComponent(query)}&page=${page}&sort_by=${sortBy}&sort_dir=${sortDir}&rating_filter=${ratingFilter}${tagParam}${extParam}`,
+        { signal: state.fetchController?.signal }
+    );
+}
+
 export async function fetchImagesRequest(params) {
-    const { dir, page, sortBy, sortDir, subpath, ratingFilter, tagFilter, extFilter } = params;
+    const { dir, page, sortBy, sortDir, subpath, recursive, ratingFilter, tagFilter, extFilter } = params;
     const tagParam = tagFilter.size > 0 ? `&tag_filter=${[...tagFilter].join(',')}` : '';
     const extParam = extFilter ? `&ext_filter=${encodeURIComponent(extFilter)}` : '';
     return fetch(
-        `/images?dir=${dir}&page=${page}&sort_by=${sortBy}&sort_dir=${sortDir}&subpath=${encodeURIComponent(subpath)}&rating_filter=${ratingFilter}${tagParam}${extParam}`,
+        `/images?dir=${dir}&page=${page}&sort_by=${sortBy}&sort_dir=${sortDir}&subpath=${encodeURIComponent(subpath)}&recursive=${recursive}&rating_filter=${ratingFilter}${tagParam}${extParam}`,
         { signal: state.fetchController?.signal }
     );
 }
+
+// Live change feed; the browser reconnects (resuming from Last-Event-ID) on its own
+export function subscribeToChanges(onChange) {
+    const source = new EventSource('/events');
+    source.onmessage = e => {
+        try {
+            onChange(JSON.parse(e.data));
+        } catch (err) {
+            console.error('Error applying change event:', err);
+        }
+    };
+    return source;
+}
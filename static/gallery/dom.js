@@ -28,6 +28,8 @@ export const ratingFilter = document.getElementById('rating-filter');
 export const tagFilterBtn = document.getElementById('tag-filter-btn');
 export const tagFilterDropdown = document.getElementById('tag-filter-dropdown');
 export const extFilter = document.getElementById('ext-filter');
+export const searchInput = document.getElementById('search-input');
+export const recursiveToggle = document.getElementById('recursive-toggle');
 export const loadingText = document.getElementById('loading');
 export const dirPanel = document.getElementById('dir-panel');
 export const dirList = document.getElementById('dir-list');
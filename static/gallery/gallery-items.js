@@ -1,30 +1,27 @@
 import { state } from './state.js';
-import { lightbox, lightboxImg, lightboxVideo, lightboxAudio, lightboxInfo } from './dom.js';
+import {
+    lightbox, lightboxImg, lightboxVideo, lightboxAudio, lightboxInfo, sortBy, ratingFilter, extFilter,
+} from './dom.js';
 import { createTagChipsElement, showLightboxTags } from './tags.js';
 import { createRatingWidget, showLightboxRating } from './ratings.js';
 import { closeMetadataPanel } from './metadata.js';
-import { debounce } from './utils.js';
-
-const observer = new IntersectionObserver(
-    entries => {
-        entries.forEach(entry => {
-            const imgContainer = entry.target;
-            if (imgContainer.dataset.mediaType !== 'image') return;
-            const img = imgContainer.querySelector('img');
-            if (entry.isIntersecting) {
-                if (!img.dataset.src) return;
-                img.src = img.dataset.static || img.dataset.src;
-                state.loadedImages.set(imgContainer, true);
-            } else {
-                if (state.loadedImages.has(imgContainer)) {
-                    img.removeAttribute('src');
-                    state.loadedImages.delete(imgContainer);
-                }
-            }
-        });
-    },
-    { rootMargin: '1000px 0px', threshold: 0.01 }
-);
+import { debounce, getSortLabel } from './utils.js';
+import {
+    findItemIndex, getFileMetadata, insertItem, removeItem, updateItem, setSelected, setSelectedRange,
+} from './virtual-grid.js';
+
+// Selection lives in state.selectedFiles so it survives items being unmounted by the virtual grid
+function attachSelectionHandlers(container, checkbox, fileName) {
+    checkbox.addEventListener('click', e => {
+        const index = Number(container.dataset.index);
+        if (e.shiftKey && state.lastSelectedIndex !== -1) {
+            setSelectedRange(state.lastSelectedIndex, index, checkbox.checked);
+        }
+        state.lastSelectedIndex = index;
+    });
+
+    checkbox.addEventListener('change', () => setSelected(fileName, checkbox.checked));
+}
 
 function handleMouseLeave(img, loadingIndicator) {
     img.dataset.hovering = 'false';
@@ -39,24 +36,77 @@ const debouncedMouseEnter = debounce((img, loadingIndicator) => {
     }
 }, 500);
 
-export function createVideoElement(fileName, sortValue = null, duration = null, rating = 0, tags = []) {
+const BLANK_IMAGE = 'data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7';
+
+function spriteOffset(offset, free) {
+    return free > 0 ? `${offset / free * 100}%` : '0%';
+}
+
+/**
+ * Paint a thumbnail from its page's sprite sheet (one request and one decode
+ * per page) as the img background, leaving the img itself blank. If the sheet
+ * can't be loaded the card falls back to its own thumbnail URL.
+ */
+function showSpriteTile(img, sprite) {
+    const [x, y, width, height] = sprite.tile;
+    const frame = img.getAttribute('src');
+    img.dataset.frame = frame;
+    img.style.aspectRatio = `${width} / ${height}`;
+    img.style.backgroundImage = `url(${sprite.url})`;
+    img.style.backgroundRepeat = 'no-repeat';
+    img.style.backgroundSize = `${sprite.width / width * 100}% ${sprite.height / height * 100}%`;
+    img.style.backgroundPosition = `${spriteOffset(x, sprite.width - width)} ${spriteOffset(y, sprite.height - height)}`;
+    img.src = BLANK_IMAGE;
+    if (img.dataset.static) img.dataset.static = BLANK_IMAGE;
+
+    const sheet = new Image();
+    sheet.addEventListener('error', () => {
+        img.style.backgroundImage = '';
+        if (img.dataset.static === BLANK_IMAGE) img.dataset.static = frame;
+        if (img.getAttribute('src') === BLANK_IMAGE) img.src = frame;
+    });
+    sheet.src = sprite.url;
+}
+
+// Hover plays a small /preview rendering; the full file is only loaded by the lightbox
+function attachHoverPreview(container, img, loadingIndicator) {
+    container.addEventListener('mouseenter', () => {
+        img.dataset.hovering = 'true';
+        debouncedMouseEnter(img, loadingIndicator);
+    });
+    container.addEventListener('mouseleave', () => handleMouseLeave(img, loadingIndicator));
+    img.addEventListener('error', () => {
+        // No preview (a still WebP or an unreadable video): keep showing the static frame
+        if (img.getAttribute('src') !== img.dataset.animated) return;
+        img.dataset.animated = img.dataset.static;
+        handleMouseLeave(img, loadingIndicator);
+    });
+}
+
+export function createVideoElement(fileName, sortValue = null, duration = null, rating = 0, tags = [], sprite = null) {
     const container = document.createElement('div');
     container.className = 'image-container';
 
     const imageWrapper = document.createElement('div');
     imageWrapper.className = 'image-wrapper';
 
-    const video = document.createElement('video');
-    video.muted = true;
-    video.loop = true;
-    video.preload = 'none';
-    video.poster = `/video-thumbnail/${state.currentDir}/${fileName}`;
-    video.src = `/${state.currentDir}/${fileName}`;
-    video.dataset.filename = fileName;
-    video.style.cssText = 'width:100%;height:100%;object-fit:cover;border-radius:8px;';
-
-    video.draggable = true;
-    video.addEventListener('dragstart', e => {
+    const thumbnail = document.createElement('img');
+    thumbnail.alt = fileName;
+    thumbnail.src = `/video-thumbnail/${state.currentDir}/${fileName}`;
+    thumbnail.dataset.static = thumbnail.src;
+    thumbnail.dataset.animated = `/preview/${state.currentDir}/${fileName}`;
+    thumbnail.dataset.filename = fileName;
+    thumbnail.style.cssText = 'width:100%;height:100%;object-fit:cover;border-radius:8px;';
+    if (sprite) showSpriteTile(thumbnail, sprite);
+
+    const loadingIndicator = document.createElement('div');
+    loadingIndicator.className = 'loading-indicator';
+    thumbnail.addEventListener('load', () => {
+        loadingIndicator.style.display = 'none';
+    });
+
+    thumbnail.draggable = true;
+    thumbnail.addEventListener('dragstart', e => {
         e.dataTransfer.setData(
             'DownloadURL',
             `${container.dataset.mimeType || 'video/mp4'}:${fileName}:${window.location.origin}/${state.currentDir}/${fileName}`
@@ -67,22 +117,7 @@ export function createVideoElement(fileName, sortValue = null, duration = null,
     checkbox.type = 'checkbox';
     checkbox.className = 'checkbox';
 
-    checkbox.addEventListener('click', e => {
-        if (e.shiftKey && state.lastSelectedIndex !== -1) {
-            const checkboxes = Array.from(document.querySelectorAll('.gallery .checkbox'));
-            const currentIndex = checkboxes.indexOf(checkbox);
-            const [start, end] = [state.lastSelectedIndex, currentIndex].sort((a, b) => a - b);
-            for (let i = start; i <= end; i++) {
-                checkboxes[i].checked = checkbox.checked;
-                checkboxes[i].closest('.image-container').classList.toggle('selected', checkbox.checked);
-            }
-        }
-        state.lastSelectedIndex = Array.from(document.querySelectorAll('.gallery .checkbox')).indexOf(checkbox);
-    });
-
-    checkbox.addEventListener('change', () => {
-        container.classList.toggle('selected', checkbox.checked);
-    });
+    attachSelectionHandlers(container, checkbox, fileName);
 
     if (sortValue || duration) {
         const infoBar = document.createElement('div');
@@ -102,16 +137,11 @@ export function createVideoElement(fileName, sortValue = null, duration = null,
         imageWrapper.appendChild(infoBar);
     }
 
-    container.addEventListener('mouseenter', () => video.play());
-    container.addEventListener('mouseleave', () => {
-        video.pause();
-        video.currentTime = 0;
-    });
+    attachHoverPreview(container, thumbnail, loadingIndicator);
 
-    video.addEventListener('click', e => {
+    thumbnail.addEventListener('click', e => {
         if (e.target.className === 'checkbox') return;
-        const cacheKey = `${state.currentDir}/${fileName}`;
-        const fileMetadata = state.fileMetadataCache[cacheKey];
+        const fileMetadata = getFileMetadata(fileName);
 
         lightboxImg.style.display = 'none';
         lightboxVideo.style.display = 'block';
@@ -130,7 +160,8 @@ export function createVideoElement(fileName, sortValue = null, duration = null,
         lightbox.style.display = 'flex';
     });
 
-    imageWrapper.appendChild(video);
+    imageWrapper.appendChild(thumbnail);
+    imageWrapper.appendChild(loadingIndicator);
     container.appendChild(imageWrapper);
     container.appendChild(checkbox);
     imageWrapper.appendChild(createRatingWidget(fileName, rating));
@@ -150,7 +181,8 @@ export function createImageElement(
     sortValue = null,
     duration = null,
     rating = 0,
-    tags = []
+    tags = [],
+    sprite = null
 ) {
     const container = document.createElement('div');
     container.className = 'image-container';
@@ -168,22 +200,7 @@ export function createImageElement(
     const loadingIndicator = document.createElement('div');
     loadingIndicator.className = 'loading-indicator';
 
-    checkbox.addEventListener('click', e => {
-        if (e.shiftKey && state.lastSelectedIndex !== -1) {
-            const checkboxes = Array.from(document.querySelectorAll('.gallery .checkbox'));
-            const currentIndex = checkboxes.indexOf(checkbox);
-            const [start, end] = [state.lastSelectedIndex, currentIndex].sort((a, b) => a - b);
-            for (let i = start; i <= end; i++) {
-                checkboxes[i].checked = checkbox.checked;
-                checkboxes[i].closest('.image-container').classList.toggle('selected', checkbox.checked);
-            }
-        }
-        state.lastSelectedIndex = Array.from(document.querySelectorAll('.gallery .checkbox')).indexOf(checkbox);
-    });
-
-    checkbox.addEventListener('change', () => {
-        container.classList.toggle('selected', checkbox.checked);
-    });
+    attachSelectionHandlers(container, checkbox, fileName);
 
     if (sortValue || duration) {
         const infoBar = document.createElement('div');
@@ -208,13 +225,9 @@ export function createImageElement(
     if (isWebP && animatedPath) {
         img.dataset.static = filePath;
         img.dataset.animated = animatedPath;
-
-        container.addEventListener('mouseenter', () => {
-            img.dataset.hovering = 'true';
-            debouncedMouseEnter(img, loadingIndicator);
-        });
-        container.addEventListener('mouseleave', () => handleMouseLeave(img, loadingIndicator));
+        attachHoverPreview(container, img, loadingIndicator);
     }
+    if (sprite) showSpriteTile(img, sprite);
 
     img.addEventListener('load', () => {
         loadingIndicator.style.display = 'none';
@@ -223,10 +236,9 @@ export function createImageElement(
     img.addEventListener('click', e => {
         if (e.target.className === 'checkbox') return;
         lightboxImg.dataset.filename = fileName;
-        lightboxImg.src = container.dataset.isAnimated === 'true' ? img.dataset.animated : img.src;
+        lightboxImg.src = `/${state.currentDir}/${fileName}`;
 
-        const cacheKey = `${state.currentDir}/${fileName}`;
-        const fileMetadata = state.fileMetadataCache[cacheKey];
+        const fileMetadata = getFileMetadata(fileName);
         showLightboxRating(fileName, fileMetadata?.rating || 0);
         showLightboxTags(state.currentDir, fileName, JSON.parse(container.dataset.tags || '[]'));
 
@@ -283,22 +295,7 @@ export function createAudioElement(fileName, sortValue = null, duration = null,
     checkbox.type = 'checkbox';
     checkbox.className = 'checkbox';
 
-    checkbox.addEventListener('click', e => {
-        if (e.shiftKey && state.lastSelectedIndex !== -1) {
-            const checkboxes = Array.from(document.querySelectorAll('.gallery .checkbox'));
-            const currentIndex = checkboxes.indexOf(checkbox);
-            const [start, end] = [state.lastSelectedIndex, currentIndex].sort((a, b) => a - b);
-            for (let i = start; i <= end; i++) {
-                checkboxes[i].checked = checkbox.checked;
-                checkboxes[i].closest('.image-container').classList.toggle('selected', checkbox.checked);
-            }
-        }
-        state.lastSelectedIndex = Array.from(document.querySelectorAll('.gallery .checkbox')).indexOf(checkbox);
-    });
-
-    checkbox.addEventListener('change', () => {
-        container.classList.toggle('selected', checkbox.checked);
-    });
+    attachSelectionHandlers(container, checkbox, fileName);
 
     if (sortValue || duration) {
         const infoBar = document.createElement('div');
@@ -322,8 +319,7 @@ export function createAudioElement(fileName, sortValue = null, duration = null,
     imageWrapper.addEventListener('click', e => {
         if (e.target === audio || audio.contains(e.target)) return;
         if (e.target.className === 'checkbox') return;
-        const cacheKey = `${state.currentDir}/${fileName}`;
-        const fileMetadata = state.fileMetadataCache[cacheKey];
+        const fileMetadata = getFileMetadata(fileName);
 
         lightboxImg.style.display = 'none';
         lightboxVideo.style.display = 'none';
@@ -353,3 +349,81 @@ export function createAudioElement(fileName, sortValue = null, duration = null,
 
     return container;
 }
+
+// ─── Grid items from /images metadata ──────────────────────
+
+export function createFileElement(file, dir) {
+    const fileName = file.name;
+    const fileExt = fileName.split('.').pop().toLowerCase();
+    const isMp4 = fileExt === 'mp4';
+    const isWebP = fileExt === 'webp';
+    const isMp3 = fileExt === 'mp3';
+    const filePath = isWebP
+        ? `/static-frame/${dir}/${fileName}`
+        : `/${dir}/${fileName}`;
+    const animatedPath = isWebP ? `/preview/${dir}/${fileName}` : null;
+    const fileDuration = (isWebP || isMp4 || isMp3) ? file.duration_seconds : null;
+    const mimeType = isMp4 ? 'video/mp4'
+        : isMp3 ? 'audio/mpeg'
+        : isWebP ? 'image/webp'
+        : fileExt === 'png' ? 'image/png'
+        : 'image/jpeg';
+
+    const sortValue = getSortLabel(sortBy.value, file);
+    const rating = file.rating || 0;
+    const tags = file.tags || [];
+
+    const container = isMp4
+        ? createVideoElement(fileName, sortValue, fileDuration, rating, tags, file.sprite)
+        : isMp3
+            ? createAudioElement(fileName, sortValue, fileDuration, rating, tags)
+            : createImageElement(fileName, filePath, isWebP, animatedPath, sortValue, fileDuration, rating, tags, file.sprite);
+
+    container.dataset.mediaType = isMp4 ? 'video' : isMp3 ? 'audio' : 'image';
+    container.dataset.isAnimated = isWebP ? 'true' : 'false';
+    container.dataset.mimeType = mimeType;
+    return container;
+}
+
+function forgetFile(dir, fileName) {
+    state.metadataCache.delete(`${dir}/${fileName}`);
+    state.fileMetadataCache.delete(`${dir}/${fileName}`);
+}
+
+// Same filters /images applies server-side, for files arriving through the change feed
+function matchesCurrentView(dir, file) {
+    if (dir !== state.currentDir || state.searchQuery) return false;
+    const slash = file.name.lastIndexOf('/');
+    const parent = slash === -1 ? '' : file.name.slice(0, slash);
+    const subpath = state.currentSubpath;
+    const inFolder = state.recursive
+        ? subpath === '' || parent === subpath || parent.startsWith(subpath + '/')
+        : parent === subpath;
+    if (!inFolder) return false;
+    if (extFilter.value && !file.name.toLowerCase().endsWith(extFilter.value.toLowerCase())) return false;
+    if (ratingFilter.value !== 'all' && (file.rating || 0) !== Number(ratingFilter.value)) return false;
+    const tags = file.tags || [];
+    return [...state.selectedTags].every(tag => tags.includes(tag));
+}
+
+/**
+ * Apply a /events change to the item list without refetching: deleted and
+ * moved-away files are removed, changed files are updated in place, and new
+ * files matching the current view are inserted at their sorted position
+ * (files that sort past the loaded pages are left for paging to fetch).
+ */
+export function applyChangeEvent(change) {
+    if (change.dir !== state.currentDir) return;
+    const wasShown = findItemIndex(change.previous || change.name) !== -1;
+    if (change.previous) {
+        removeItem(change.previous);
+        forgetFile(change.dir, change.previous);
+    }
+    forgetFile(change.dir, change.name);
+    if (change.type === 'deleted' || !matchesCurrentView(change.dir, change.file)) {
+        removeItem(change.name);
+        return;
+    }
+    state.fileMetadataCache.set(`${change.dir}/${change.name}`, change.file);
+    if (!updateItem(change.file)) insertItem(change.file, wasShown);
+}
@@ -6,6 +6,7 @@ import {
 import { toggleMetadataPanel, closeMetadataPanel } from './metadata.js';
 import { showLightboxTags } from './tags.js';
 import { showLightboxRating } from './ratings.js';
+import { getFileMetadata } from './virtual-grid.js';
 
 export function initLightbox() {
     // Setup video drag
@@ -54,8 +55,7 @@ export function initLightbox() {
     lightboxImg.addEventListener('load', () => {
         const storedFilename = lightboxImg.dataset.filename;
         const filename = storedFilename || lightboxImg.src.split('/').pop().split('?')[0];
-        const cacheKey = `${state.currentDir}/${filename}`;
-        const fileMetadata = state.fileMetadataCache[cacheKey];
+        const fileMetadata = getFileMetadata(filename);
         const animationControls = document.querySelectorAll('.animation-control');
 
         if (fileMetadata) {
@@ -1,20 +1,24 @@
 import { state } from './state.js';
 import {
     galleryBtn, uploadsBtn, archivesBtn, modal, sortBy, sortDir,
-    ratingFilter, extFilter, tagFilterBtn, tagFilterDropdown, dirPanel,
+    ratingFilter, extFilter, searchInput, recursiveToggle, tagFilterBtn, tagFilterDropdown, dirPanel,
     zipFilenameInput,
 } from './dom.js';
 import { hideModal, showInfo } from './modal.js';
 import { fetchAndPopulateTagFilter, fetchAndPopulateExtFilter, updateTagFilterLabel, initTagFilter } from './tags.js';
 import {
-    loadMore, reloadGallery, switchDirectory, navigateSubdir,
+    loadPage, reloadGallery, switchDirectory, navigateSubdir,
     showDirPanel, scheduleDirPanelHide, cancelDirPanelHide,
     initNavigation,
 } from './navigation.js';
 import { populateArchives, reloadArchives } from './archives.js';
 import { initLightbox } from './lightbox.js';
+import { applyChangeEvent, createFileElement } from './gallery-items.js';
+import { initVirtualGrid } from './virtual-grid.js';
+import { subscribeToChanges } from './api.js';
 import { initUploadListeners } from './upload.js';
 import { initToolbar, initZipHandler } from './toolbar.js';
+import { debounce } from './utils.js';
 
 // ─── Directory buttons ─────────────────────────────────────
 
@@ -74,14 +78,25 @@ ratingFilter.addEventListener('change', () => {
 });
 
 extFilter.addEventListener('change', () => {
-    state.page = 0;
-    state.done = false;
-    state.loading = false;
-    document.getElementById('gallery').innerHTML = '';
-    loadMore();
+    reloadGallery();
     fetchAndPopulateTagFilter();
 });
 
+recursiveToggle.addEventListener('change', () => {
+    state.recursive = recursiveToggle.checked;
+    if (state.currentDir === 'archives') return;
+    reloadGallery();
+    fetchAndPopulateTagFilter();
+    fetchAndPopulateExtFilter();
+});
+
+searchInput.addEventListener('input', debounce(() => {
+    const query = searchInput.value.trim();
+    if (query === state.searchQuery || state.currentDir === 'archives') return;
+    state.searchQuery = query;
+    reloadGallery();
+}, 300));
+
 // ─── Tag filter dropdown ───────────────────────────────────
 
 tagFilterBtn.addEventListener('click', e => {
@@ -107,16 +122,21 @@ modal.addEventListener('click', e => {
     if (e.target === modal) hideModal();
 });
 
-// ─── Infinite scroll ───────────────────────────────────────
+// ─── Live changes ──────────────────────────────────────────
 
-window.addEventListener('scroll', () => {
-    if (window.innerHeight + window.scrollY >= document.body.offsetHeight - 300) {
-        loadMore();
+function handleChange(change) {
+    if (change.type === 'reset') {
+        // Missed events while disconnected: the grid may be stale
+        if (state.currentDir !== 'archives') reloadGallery();
+        return;
     }
-});
+    if (state.currentDir === 'archives') return;
+    applyChangeEvent(change);
+}
 
 // ─── Init ──────────────────────────────────────────────────
 
+initVirtualGrid({ createElement: file => createFileElement(file, state.currentDir), onNeedPage: loadPage });
 initLightbox();
 initUploadListeners();
 initToolbar(zipFilenameInput);
@@ -124,6 +144,7 @@ initZipHandler();
 initNavigation({ onAfterNavigate: () => { fetchAndPopulateTagFilter(); fetchAndPopulateExtFilter(); } });
 initTagFilter({ onFilterChange: reloadGallery });
 
-loadMore();
+reloadGallery();
 fetchAndPopulateTagFilter();
 fetchAndPopulateExtFilter();
+subscribeToChanges(handleChange);
@@ -3,10 +3,19 @@ import { lightbox, lightboxMetadataPanel, lightboxMetadataContent, toggleMetadat
 import { fetchMetadataRequest } from './api.js';
 import { escapeHtml } from './utils.js';
 
-export async function fetchMetadata(filename, dir) {
+export async function fetchMetadata(filename, dir, summary = false) {
     const cacheKey = `${dir}/${filename}`;
-    if (state.metadataCache[cacheKey]) return state.metadataCache[cacheKey];
-    return fetchMetadataRequest(filename, dir);
+    const cached = state.metadataCache.get(cacheKey);
+    // Full metadata also answers a summary request
+    if (cached && (summary || !cached._summary)) return cached;
+    return fetchMetadataRequest(filename, dir, summary);
+}
+
+function loadMetadata(file, dir, summary) {
+    fetchMetadata(file, dir, summary).then(metadata => {
+        // Opening another file supersedes (and aborts) this request
+        if (state.currentLightboxFile === file) displayMetadata(metadata);
+    });
 }
 
 export function toggleMetadataPanel() {
@@ -19,7 +28,7 @@ export function toggleMetadataPanel() {
         toggleMetadataBtn.title = 'Hide Metadata';
         if (state.currentLightboxFile && state.currentLightboxDir) {
             lightboxMetadataContent.innerHTML = '<div class="metadata-loading">Loading metadata...</div>';
-            fetchMetadata(state.currentLightboxFile, state.currentLightboxDir).then(displayMetadata);
+            loadMetadata(state.currentLightboxFile, state.currentLightboxDir, true);
         }
     }
 }
@@ -42,7 +51,16 @@ export function displayMetadata(metadata) {
 
     for (const [k, v] of Object.entries(metadata)) {
         if (k.startsWith('🔧') || k.startsWith('⚙️')) workflowSections.push([k, v]);
-        else otherSections.push([k, v]);
+        else if (k !== '_summary') otherSections.push([k, v]);
+    }
+
+    // Summary responses leave out the workflow graph until asked for
+    if (metadata._summary) {
+        html += `<div class="metadata-section"><div class="metadata-section-title">Summary</div><div class="metadata-table">`;
+        for (const [key, value] of Object.entries(metadata._summary)) {
+            html += `<div class="metadata-row"><div class="metadata-key">${escapeHtml(key)}</div><div class="metadata-value">${formatMetadataValue(value)}</div></div>`;
+        }
+        html += `</div></div>`;
     }
 
     for (const [k, v] of workflowSections) {
@@ -70,7 +88,20 @@ export function displayMetadata(metadata) {
         }
     }
 
+    if (metadata._summary) {
+        html += `<button class="metadata-full-btn">Show full metadata</button>`;
+    }
+
     lightboxMetadataContent.innerHTML = html || '<div class="metadata-error">No metadata found</div>';
+
+    const fullButton = lightboxMetadataContent.querySelector('.metadata-full-btn');
+    if (fullButton) {
+        fullButton.addEventListener('click', () => {
+            fullButton.disabled = true;
+            fullButton.textContent = 'Loading...';
+            loadMetadata(state.currentLightboxFile, state.currentLightboxDir, false);
+        });
+    }
 }
 
 function formatJsonValue(obj) {
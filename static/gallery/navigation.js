@@ -2,11 +2,10 @@ import { state } from './state.js';
 import {
     gallery, archivesContainer, mainHeadingName, currentPathEl,
     galleryBtn, uploadsBtn, archivesBtn, dropArea, loadingText,
-    sortBy, sortDir, ratingFilter, extFilter, dirPanel, dirList, dirBreadcrumb,
+    sortBy, sortDir, ratingFilter, extFilter, searchInput, dirPanel, dirList, dirBreadcrumb,
 } from './dom.js';
-import { fetchImagesRequest, fetchDirTree, mkdirRequest } from './api.js';
-import { getSortLabel } from './utils.js';
-import { createImageElement, createVideoElement, createAudioElement } from './gallery-items.js';
+import { fetchImagesRequest, searchRequest, fetchDirTree, mkdirRequest } from './api.js';
+import { placePage, resetGrid } from './virtual-grid.js';
 
 // Injected by main.js via initNavigation — avoids a circular dependency with tags.js
 let onAfterNavigate = () => {};
@@ -17,93 +16,65 @@ export function initNavigation({ onAfterNavigate: fn }) {
 
 // ─── Gallery Loading ───────────────────────────────────────
 
-export async function loadMore() {
-    if (state.loading || state.done) return;
-    state.loading = true;
-    loadingText.style.display = 'block';
-
-    if (state.fetchController) state.fetchController.abort();
-    state.fetchController = new AbortController();
+// Fetch one page into the virtual grid; the grid asks for pages as their rows scroll into view
+export async function loadPage(page) {
+    if (state.loadedPages.has(page)) return;
+    state.loadedPages.add(page);
+    const controller = state.fetchController;
 
     try {
-        const response = await fetchImagesRequest({
+        const params = {
             dir: state.currentDir,
-            page: state.page,
+            page,
             sortBy: sortBy.value,
             sortDir: sortDir.value,
             subpath: state.currentSubpath,
+            recursive: state.recursive,
             ratingFilter: ratingFilter.value,
             tagFilter: state.selectedTags,
             extFilter: extFilter.value,
-        });
+        };
+        // A search query spans the whole directory tree instead of the current subpath
+        const response = state.searchQuery
+            ? await searchRequest({ ...params, query: state.searchQuery })
+            : await fetchImagesRequest(params);
         if (!response.ok) throw new Error(`Server error: ${response.status}`);
         const data = await response.json();
+        if (controller !== state.fetchController) return;
 
-        if (data.files.length === 0) {
-            loadingText.innerText = 'No more files.';
-            state.done = true;
-            return;
-        }
-
+        const sprite = data.sprite;
         data.files.forEach(file => {
-            const fileName = file.name;
-            const fileExt = fileName.split('.').pop().toLowerCase();
-            const isMp4 = fileExt === 'mp4';
-            const isWebP = fileExt === 'webp';
-            const isMp3 = fileExt === 'mp3';
-            const filePath = isWebP
-                ? `/static-frame/${state.currentDir}/${fileName}`
-                : `/${state.currentDir}/${fileName}`;
-            const animatedPath = isWebP ? `/${state.currentDir}/${fileName}` : null;
-            const fileDuration = (isWebP || isMp4 || isMp3) ? file.duration_seconds : null;
-            const mimeType = isMp4 ? 'video/mp4'
-                : isMp3 ? 'audio/mpeg'
-                : isWebP ? 'image/webp'
-                : fileExt === 'png' ? 'image/png'
-                : 'image/jpeg';
-
-            state.fileMetadataCache[`${state.currentDir}/${fileName}`] = file;
-
-            const sortValue = getSortLabel(sortBy.value, file);
-            const rating = file.rating || 0;
-            const tags = file.tags || [];
-
-            const container = isMp4
-                ? createVideoElement(fileName, sortValue, fileDuration, rating, tags)
-                : isMp3
-                    ? createAudioElement(fileName, sortValue, fileDuration, rating, tags)
-                    : createImageElement(fileName, filePath, isWebP, animatedPath, sortValue, fileDuration, rating, tags);
-
-            container.dataset.mediaType = isMp4 ? 'video' : isMp3 ? 'audio' : 'image';
-            container.dataset.isAnimated = isWebP ? 'true' : 'false';
-            container.dataset.mimeType = mimeType;
-            container.dataset.sortDate = new Date(file.last_modified).toISOString();
-            container.dataset.sortFilename = fileName.toLowerCase();
-            container.dataset.sortSize = file.size_bytes || 0;
-            gallery.appendChild(container);
+            if (sprite && sprite.tiles[file.name]) {
+                file.sprite = { url: sprite.url, width: sprite.width, height: sprite.height, tile: sprite.tiles[file.name] };
+            }
+            state.fileMetadataCache.set(`${state.currentDir}/${file.name}`, file);
         });
+        placePage(page, data.files, data.total);
 
-        state.page++;
-        loadingText.style.display = 'none';
-
-        if (document.body.scrollHeight <= window.innerHeight && !state.done) {
-            loadMore();
+        if (state.totalItems === 0) {
+            loadingText.innerText = 'No files.';
+            loadingText.style.display = 'block';
+        } else {
+            loadingText.style.display = 'none';
         }
     } catch (err) {
         if (err.name !== 'AbortError') {
+            state.loadedPages.delete(page);
             loadingText.innerText = 'Failed to load files.';
-            console.error('loadMore error:', err);
+            loadingText.style.display = 'block';
+            console.error('loadPage error:', err);
         }
-    } finally {
-        state.loading = false;
     }
 }
 
 export function reloadGallery() {
-    state.page = 0;
-    state.done = false;
-    gallery.innerHTML = '';
-    loadMore();
+    if (state.fetchController) state.fetchController.abort();
+    state.fetchController = new AbortController();
+    state.loadedPages.clear();
+    resetGrid();
+    loadingText.innerText = 'Loading...';
+    loadingText.style.display = 'block';
+    loadPage(0);
 }
 
 export function updateActiveFolderButton(dir) {
@@ -113,21 +84,18 @@ export function updateActiveFolderButton(dir) {
 }
 
 export function switchDirectory(dir) {
-    if (state.fetchController) state.fetchController.abort();
     state.currentDir = dir;
     state.currentSubpath = dir === 'gallery' ? state.lastGallerySubpath : state.lastUploadsSubpath;
-    state.page = 0;
-    state.done = false;
-    state.loading = false;
-    gallery.innerHTML = '';
     archivesContainer.style.display = 'none';
     gallery.style.display = 'grid';
     dropArea.style.display = dir === 'uploads' ? 'block' : 'none';
     ratingFilter.value = 'all';
     state.selectedTags.clear();
     extFilter.value = '';
+    state.searchQuery = '';
+    searchInput.value = '';
 
-    loadMore();
+    reloadGallery();
     onAfterNavigate();
 
     mainHeadingName.innerHTML = dir === 'gallery' ? 'Gallery' : 'Uploads';
@@ -233,9 +201,7 @@ async function submitNewDir() {
             newDirInput.style.display = 'none';
             newDirLabel.style.display = '';
             newDirInput.classList.remove('error');
-            delete state.dirTreeCache[state.panelDir];
-            const res = await fetchDirTree(state.panelDir);
-            state.dirTreeCache[state.panelDir] = res;
+            await fetchDirTree(state.panelDir);
             renderDirTree(state.panelDir);
         } else {
             newDirInput.classList.add('error');
@@ -286,7 +252,7 @@ export function renderDirTree(dir) {
     rootRow.addEventListener('click', () => navigateSubdir('', dir));
     dirList.appendChild(rootRow);
 
-    const tree = state.dirTreeCache[dir];
+    const tree = state.dirTreeCache.get(dir);
     if (tree && tree.length > 0) {
         tree.forEach(node => dirList.appendChild(renderTreeNode(node, 1, dir)));
     } else if (tree) {
@@ -329,9 +295,16 @@ export function renderDirTree(dir) {
 export async function showDirPanel(dir, triggerBtn) {
     if (dir === 'archives') return;
     state.panelDir = dir;
-    if (!state.dirTreeCache[dir]) {
+    const cached = state.dirTreeCache.get(dir);
+    const refresh = fetchDirTree(dir);
+    if (cached) {
+        // Show the cached tree now; re-render only if revalidation returned a different one
+        refresh.then(tree => {
+            if (tree !== cached && state.panelDir === dir) renderDirTree(dir);
+        }).catch(err => console.error('Failed to refresh directory tree:', err));
+    } else {
         try {
-            state.dirTreeCache[dir] = await fetchDirTree(dir);
+            await refresh;
         } catch (err) {
             console.error('Failed to load directory tree:', err);
             return;
@@ -370,7 +343,6 @@ export function cancelDirPanelHide() {
 
 export function navigateSubdir(subpath, navDir = state.currentDir) {
     if (navDir !== state.currentDir) {
-        if (state.fetchController) state.fetchController.abort();
         state.currentDir = navDir;
         archivesContainer.style.display = 'none';
         gallery.style.display = 'grid';
@@ -385,11 +357,6 @@ export function navigateSubdir(subpath, navDir = state.currentDir) {
     if (navDir === 'gallery') state.lastGallerySubpath = subpath;
     else if (navDir === 'uploads') state.lastUploadsSubpath = subpath;
 
-    state.page = 0;
-    state.done = false;
-    state.loading = false;
-    gallery.innerHTML = '';
-
     mainHeadingName.innerHTML = navDir === 'gallery' ? 'Gallery' : 'Uploads';
     if (subpath) {
         currentPathEl.textContent = subpath;
@@ -400,6 +367,6 @@ export function navigateSubdir(subpath, navDir = state.currentDir) {
     }
 
     renderDirTree(navDir);
-    loadMore();
+    reloadGallery();
     onAfterNavigate();
 }
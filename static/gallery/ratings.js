@@ -1,6 +1,7 @@
 import { state } from './state.js';
 import { lightboxRating, ratingFilter } from './dom.js';
 import { setRatingRequest } from './api.js';
+import { removeItem } from './virtual-grid.js';
 
 export async function setRating(filename, rating) {
     return setRatingRequest(state.currentDir, filename, rating);
@@ -32,7 +33,7 @@ export function createRatingWidget(filename, currentRating = 0) {
                 currentRating = newRating;
                 const filterValue = ratingFilter.value;
                 if (filterValue !== 'all' && newRating !== parseInt(filterValue)) {
-                    ratingContainer.closest('.image-container')?.remove();
+                    removeItem(filename);
                 }
             }
         });
@@ -79,9 +80,7 @@ export function showLightboxRating(filename, currentRating = 0) {
                 const filterValue = ratingFilter.value;
                 const containers = document.querySelectorAll('.gallery .image-container');
                 if (filterValue !== 'all' && newRating !== parseInt(filterValue)) {
-                    containers.forEach(container => {
-                        if (container.dataset.filename === filename) container.remove();
-                    });
+                    removeItem(filename);
                 } else {
                     containers.forEach(container => {
                         const ratingWidget = container.querySelector('.rating-container');
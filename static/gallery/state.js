@@ -1,24 +1,28 @@
+import { LruCache } from './utils.js';
+
 export const state = {
-    page: 0,
-    loading: false,
-    done: false,
     currentDir: 'gallery',
     lastSelectedIndex: -1,
     currentSubpath: '',
     lastGallerySubpath: '',
     lastUploadsSubpath: '',
     fetchController: null,
-    dirTreeCache: {},
+    loadedPages: new Set(),
+    items: [],
+    totalItems: null,
+    itemShift: 0,
+    selectedFiles: new Set(),
+    dirTreeCache: new LruCache(4),             // dir → /dirs tree, revalidated by ETag on every fetch
     dirPanelHideTimer: null,
     activeDirBtn: null,
     panelDir: null,
     moveTargetDir: null,
     moveTargetSubpath: null,
     selectedTags: new Set(),
-    fileMetadataCache: {},
-    metadataCache: {},
-    loadedImages: new Map(),
+    searchQuery: '',
+    recursive: false,
+    fileMetadataCache: new LruCache(5000),     // 'dir/name' → /images item
+    metadataCache: new LruCache(100),          // 'dir/name' → /metadata result or its summary (workflow JSON can be large)
     currentLightboxFile: null,
     currentLightboxDir: null,
-    _cachedTagSuggestions: [],
 };
@@ -1,6 +1,6 @@
 import { state } from './state.js';
 import { tagFilterBtn, tagFilterDropdown, extFilter } from './dom.js';
-import { addTagRequest as apiAddTag, removeTagRequest, fetchTagsRequest, fetchExtensionsRequest } from './api.js';
+import { addTagRequest as apiAddTag, removeTagRequest, fetchTagsRequest, fetchTagSuggestionsRequest, fetchExtensionsRequest } from './api.js';
 import { hideModal } from './modal.js';
 
 // Injected by main.js via initTagFilter — avoids a circular dependency with navigation.js
@@ -16,7 +16,7 @@ export function updateTagFilterLabel() {
 
 export async function fetchAndPopulateTagFilter() {
     try {
-        const data = await fetchTagsRequest(state.currentDir, state.currentSubpath, state.selectedTags);
+        const data = await fetchTagsRequest(state.currentDir, state.currentSubpath, state.selectedTags, state.recursive);
         if (!data) return;
         const tags = data.tags || [];
         tagFilterDropdown.innerHTML = '';
@@ -52,7 +52,7 @@ export async function fetchAndPopulateTagFilter() {
 
 export async function fetchAndPopulateExtFilter() {
     try {
-        const data = await fetchExtensionsRequest(state.currentDir, state.currentSubpath);
+        const data = await fetchExtensionsRequest(state.currentDir, state.currentSubpath, state.recursive);
         if (!data) return;
         const extensions = data.extensions || [];
         const currentVal = extFilter.value;
@@ -69,18 +69,20 @@ export async function fetchAndPopulateExtFilter() {
     }
 }
 
-export async function fetchTagSuggestions() {
+const MAX_SUGGESTIONS = 8;
+
+/**
+ * Library-wide tags starting with prefix, most used first, leaving out the
+ * tags in exclude. Resolves to null if a newer lookup superseded this one.
+ */
+export async function fetchTagSuggestions(prefix, exclude) {
     try {
-        const results = await Promise.all(
-            ['gallery', 'uploads'].map(d =>
-                fetch(`/tags?dir=${encodeURIComponent(d)}`).then(r => r.json()).catch(() => ({ tags: [] }))
-            )
-        );
-        const tagSet = new Set();
-        results.forEach(data => (data.tags || []).forEach(t => tagSet.add(t.name)));
-        state._cachedTagSuggestions = Array.from(tagSet).sort();
-    } catch {
-        state._cachedTagSuggestions = [];
+        const data = await fetchTagSuggestionsRequest(prefix, MAX_SUGGESTIONS + exclude.size);
+        if (!data) return null;
+        return data.tags.map(t => t.name).filter(t => !exclude.has(t)).slice(0, MAX_SUGGESTIONS);
+    } catch (err) {
+        console.error('Error fetching tag suggestions:', err);
+        return [];
     }
 }
 
@@ -166,17 +168,16 @@ export function showLightboxTags(dir, filename, tags) {
 
         let highlightIndex = -1;
 
-        function updateDropdown() {
+        async function updateDropdown() {
             const query = input.value.toLowerCase();
-            dropdown.innerHTML = '';
-            highlightIndex = -1;
-            if (!query) { dropdown.style.display = 'none'; return; }
+            if (!query) { dropdown.innerHTML = ''; highlightIndex = -1; dropdown.style.display = 'none'; return; }
             const currentTags = new Set(
                 Array.from(container.querySelectorAll('.tag-chip')).map(c => c.childNodes[0].textContent.trim())
             );
-            const matches = state._cachedTagSuggestions
-                .filter(t => t.includes(query) && !currentTags.has(t))
-                .slice(0, 8);
+            const matches = await fetchTagSuggestions(query, currentTags);
+            if (matches === null || input.value.toLowerCase() !== query) return;
+            dropdown.innerHTML = '';
+            highlightIndex = -1;
             if (!matches.length) { dropdown.style.display = 'none'; return; }
             matches.forEach(t => {
                 const item = document.createElement('div');
@@ -250,7 +251,6 @@ export function showLightboxTags(dir, filename, tags) {
         wrapper.appendChild(dropdown);
         container.replaceChild(wrapper, addChip);
         input.focus();
-        fetchTagSuggestions();
     });
 
     container.appendChild(addChip);
@@ -259,7 +259,7 @@ export function showLightboxTags(dir, filename, tags) {
 export function initTagModal(selectedFiles) {
     const list = document.getElementById('tag-pending-list');
     list.innerHTML = '';
-    fetchTagSuggestions().then(() => addPendingInputChip(list));
+    addPendingInputChip(list);
 
     document.getElementById('tag-apply-btn').onclick = async () => {
         const tags = Array.from(list.querySelectorAll('.tag-pending-chip'))
@@ -307,17 +307,16 @@ export function addPendingInputChip(list) {
 
     let highlightIndex = -1;
 
-    function updateDropdown() {
+    async function updateDropdown() {
         const query = input.value.toLowerCase();
-        dropdown.innerHTML = '';
-        highlightIndex = -1;
-        if (!query) { dropdown.style.display = 'none'; return; }
+        if (!query) { dropdown.innerHTML = ''; highlightIndex = -1; dropdown.style.display = 'none'; return; }
         const alreadyAdded = new Set(
             Array.from(list.querySelectorAll('.tag-pending-chip')).map(c => c.dataset.tag)
         );
-        const matches = state._cachedTagSuggestions
-            .filter(t => t.includes(query) && !alreadyAdded.has(t))
-            .slice(0, 8);
+        const matches = await fetchTagSuggestions(query, alreadyAdded);
+        if (matches === null || input.value.toLowerCase() !== query) return;
+        dropdown.innerHTML = '';
+        highlightIndex = -1;
         if (!matches.length) { dropdown.style.display = 'none'; return; }
         matches.forEach(t => {
             const item = document.createElement('div');
@@ -1,5 +1,6 @@
 import { state } from './state.js';
-import { gallery, modal, zipFilenameInput, zipBtn, modalProgress, downloadBtn } from './dom.js';
+import { modal, zipFilenameInput, zipBtn, modalProgress, downloadBtn } from './dom.js';
+import { removeItem, setAllSelected } from './virtual-grid.js';
 import { archiveRequest, deleteFilesRequest, applyMoveRequest, fetchDirTree } from './api.js';
 import { showModal, hideModal, showInfo } from './modal.js';
 import { fetchAndPopulateTagFilter, initTagModal } from './tags.js';
@@ -7,9 +8,8 @@ import { fetchAndPopulateTagFilter, initTagModal } from './tags.js';
 // ─── Selection Helpers ─────────────────────────────────────
 
 export function getSelectedImages() {
-    return Array.from(document.querySelectorAll('.gallery .image-container.selected'))
-        .map(container => container.dataset.filename || null)
-        .filter(Boolean);
+    // In grid order, including selected items the virtual grid has unmounted
+    return state.items.filter(file => file && state.selectedFiles.has(file.name)).map(file => file.name);
 }
 
 // ─── Static Frame Reload ───────────────────────────────────
@@ -19,7 +19,10 @@ export function reloadStaticFrames() {
     document.querySelectorAll('.gallery .image-container[data-is-animated="true"]').forEach(container => {
         const img = container.querySelector('img');
         if (!img) return;
-        const baseUrl = (img.dataset.static || img.src).split('?')[0];
+        // Frames drawn from a page sprite sheet switch to their own (busted) URL
+        const baseUrl = (img.dataset.frame || img.dataset.static || img.src).split('?')[0];
+        img.style.backgroundImage = '';
+        delete img.dataset.frame;
         img.src = `${baseUrl}?bust=${timestamp}`;
         img.dataset.static = `${baseUrl}?bust=${timestamp}`;
     });
@@ -31,10 +34,7 @@ export async function deleteFiles(files) {
     const response = await deleteFilesRequest(files, state.currentDir);
     const result = await response.json();
     if (result.success) {
-        result.deleted.forEach(filename => {
-            const imgContainer = Array.from(gallery.children).find(c => c.dataset.filename === filename);
-            if (imgContainer) gallery.removeChild(imgContainer);
-        });
+        result.deleted.forEach(filename => removeItem(filename));
         showInfo('Deletion Complete', result.message);
     } else {
         showInfo('Deletion Error', `Error deleting files: ${result.message}`);
@@ -170,16 +170,12 @@ async function applyMove(selectedFiles) {
 
     if (result.moved && result.moved.length > 0) {
         result.moved.forEach(filename => {
-            const imgContainer = Array.from(gallery.children).find(c => c.dataset.filename === filename);
-            if (imgContainer) gallery.removeChild(imgContainer);
+            removeItem(filename);
 
             const cacheKey = `${state.currentDir}/${filename}`;
-            delete state.metadataCache[cacheKey];
-            delete state.fileMetadataCache[cacheKey];
+            state.metadataCache.delete(cacheKey);
+            state.fileMetadataCache.delete(cacheKey);
         });
-
-        delete state.dirTreeCache[state.currentDir];
-        delete state.dirTreeCache[state.moveTargetDir];
     }
 
     hideModal();
@@ -197,17 +193,9 @@ export function initToolbar(zipFilenameInputEl) {
         if (e.target.closest('#reload-btn')) {
             reloadStaticFrames();
         } else if (e.target.closest('#select-all-btn')) {
-            document.querySelectorAll('.gallery .image-container').forEach(container => {
-                const checkbox = container.querySelector('.checkbox');
-                checkbox.checked = true;
-                container.classList.add('selected');
-            });
+            setAllSelected(true);
         } else if (e.target.closest('#clear-selection-btn')) {
-            document.querySelectorAll('.gallery .image-container').forEach(container => {
-                const checkbox = container.querySelector('.checkbox');
-                checkbox.checked = false;
-                container.classList.remove('selected');
-            });
+            setAllSelected(false);
         } else if (e.target.closest('#tag-selected-btn')) {
             const selectedFiles = getSelectedImages();
             if (selectedFiles.length === 0) { showInfo("Can't Tag Selected", 'No files selected.'); return; }
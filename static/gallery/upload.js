@@ -1,63 +1,155 @@
 import { state } from './state.js';
 import { dropArea, fileElem, uploadStatus } from './dom.js';
-import { uploadFilesRequest } from './api.js';
-import { getSortLabel, insertSorted } from './utils.js';
-import { createImageElement, createVideoElement, createAudioElement } from './gallery-items.js';
-
-export async function uploadFiles(files) {
-    const formData = new FormData();
-    for (const file of files) {
-        formData.append('file', file);
+import { initUploadRequest, uploadChunkRequest, completeUploadRequest } from './api.js';
+import { findItemIndex, insertItem } from './virtual-grid.js';
+
+const FILES_IN_FLIGHT = 2;
+const CHUNKS_IN_FLIGHT = 4;    // Per file
+const CHUNK_RETRIES = 3;
+
+// crypto.subtle only exists on secure origins (https or localhost); without it the server checks sizes only
+async function sha256Hex(data) {
+    if (!window.crypto?.subtle) return null;
+    const digest = await crypto.subtle.digest('SHA-256', data);
+    return Array.from(new Uint8Array(digest), byte => byte.toString(16).padStart(2, '0')).join('');
+}
+
+async function compositeChecksum(digests) {
+    if (digests.some(digest => !digest)) return null;
+    const bytes = new Uint8Array(digests.length * 32);
+    digests.forEach((digest, i) => {
+        for (let j = 0; j < 32; j++) bytes[i * 32 + j] = parseInt(digest.substr(j * 2, 2), 16);
+    });
+    return sha256Hex(bytes);
+}
+
+async function errorMessage(response) {
+    const body = await response.json().catch(() => ({}));
+    return body.message || response.statusText;
+}
+
+// resume() re-opens the upload session on the server and resolves to its id
+async function sendChunk(uploadId, index, blob, digest, resume) {
+    for (let attempt = 0; ; attempt++) {
+        let response = null;
+        try {
+            response = await uploadChunkRequest(uploadId, index, blob, digest);
+        } catch (err) {
+            if (attempt >= CHUNK_RETRIES) throw err;
+        }
+        if (response?.ok) return;
+        if (response && attempt >= CHUNK_RETRIES) throw new Error(await errorMessage(response));
+        if (response?.status === 404) {
+            // The server no longer knows the session (restart, part file removed); resume it and resend
+            uploadId = await resume();
+            continue;
+        }
+        await new Promise(resolve => setTimeout(resolve, 500 * 2 ** attempt));
     }
-    const uploadSubpath = state.currentDir === 'uploads' && state.currentSubpath ? state.currentSubpath : '';
-    if (uploadSubpath) formData.append('subdir', uploadSubpath);
+}
+
+/**
+ * Upload one file in chunks, CHUNKS_IN_FLIGHT at a time. Chunks the server
+ * already has from an interrupted attempt are skipped (but still hashed for
+ * the final checksum); chunks the server rejects on completion are sent again
+ * once. A session the server has lost is re-opened with /upload/init.
+ * onProgress(bytes) reports bytes stored so far.
+ */
+async function uploadFileInChunks(file, subdir, onProgress) {
+    const openSession = async () => {
+        const response = await initUploadRequest(file.name, file.size, subdir, file.lastModified);
+        if (!response.ok) throw new Error(await errorMessage(response));
+        return response.json();
+    };
+    const session = await openSession();
+    const chunkSize = session.chunk_size;
+    let uploadId = session.upload_id;
+    // Workers that hit a lost session share one re-init; chunks it does not list come back as missing on completion
+    let resuming = null;
+    const resume = () => resuming ??= openSession()
+        .then(resumed => uploadId = resumed.upload_id)
+        .finally(() => { resuming = null; });
+    const chunkCount = Math.max(1, Math.ceil(file.size / chunkSize));
+    const digests = new Array(chunkCount).fill(null);
+    let stored = 0;
 
-    try {
-        const response = await uploadFilesRequest(formData);
+    async function sendChunks(indexes, skip) {
+        let next = 0;
+        const worker = async () => {
+            while (next < indexes.length) {
+                const index = indexes[next++];
+                const blob = file.slice(index * chunkSize, (index + 1) * chunkSize);
+                digests[index] = await sha256Hex(await blob.arrayBuffer());
+                if (!skip.has(index)) await sendChunk(uploadId, index, blob, digests[index], resume);
+                stored += blob.size;
+                onProgress(stored);
+            }
+        };
+        await Promise.all(Array.from({ length: CHUNKS_IN_FLIGHT }, worker));
+    }
+
+    await sendChunks([...Array(chunkCount).keys()], new Set(session.received));
+    for (let attempt = 0; ; attempt++) {
+        const response = await completeUploadRequest(uploadId, await compositeChecksum(digests));
         const result = await response.json();
-        uploadStatus.innerText = result.message;
-
-        if (response.ok) {
-            for (const file of files) {
-                const fileExt = file.name.split('.').pop().toLowerCase();
-                const isMp4 = fileExt === 'mp4';
-                const isWebP = fileExt === 'webp';
-                const isMp3 = fileExt === 'mp3';
-                const rawPath = `/uploads/${uploadSubpath ? uploadSubpath + '/' : ''}${file.name}`;
-                const filePath = isWebP
-                    ? `/static-frame/uploads/${uploadSubpath ? uploadSubpath + '/' : ''}${file.name}`
-                    : rawPath;
-                const animatedPath = isWebP ? rawPath : null;
-                const mimeType = isMp4 ? 'video/mp4'
-                    : isMp3 ? 'audio/mpeg'
-                    : isWebP ? 'image/webp'
-                    : fileExt === 'png' ? 'image/png'
-                    : 'image/jpeg';
-
-                const uploadDate = new Date();
-                const sortValue = getSortLabel(state.currentDir === 'uploads' ? 'date' : 'date', {
-                    ...file,
-                    last_modified: uploadDate.toISOString(),
-                });
+        if (response.ok) return result;
+        if (response.status !== 409 || attempt > 0 || !result.missing.length) throw new Error(result.message);
+        stored -= result.missing.reduce((total, index) => total + Math.min(chunkSize, file.size - index * chunkSize), 0);
+        await sendChunks(result.missing, new Set());
+    }
+}
+
+function addPlaceholder(file, relName) {
+    // Placeholder until the change feed delivers the server's metadata for the file
+    if (state.currentDir !== 'uploads' || findItemIndex(relName) !== -1) return;
+    const placeholder = { name: relName, size_bytes: file.size, last_modified: new Date().toISOString(), rating: 0, tags: [] };
+    state.fileMetadataCache.set(`uploads/${relName}`, placeholder);
+    insertItem(placeholder, true);
+}
+
+export async function uploadFiles(fileList) {
+    const files = Array.from(fileList);
+    if (!files.length) return;
+    const uploadSubpath = state.currentDir === 'uploads' && state.currentSubpath ? state.currentSubpath : '';
+    const totalBytes = files.reduce((total, file) => total + file.size, 0) || 1;
+    const progress = new Map();
+    const messages = [];
+    let finished = 0;
+    let failed = 0;
+
+    const showProgress = () => {
+        const bytes = [...progress.values()].reduce((total, value) => total + value, 0);
+        uploadStatus.innerText = `Uploading ${finished}/${files.length} files — ${Math.floor(100 * bytes / totalBytes)}%`;
+    };
+    showProgress();
 
-                const container = isMp4
-                    ? createVideoElement(file.name, sortValue)
-                    : isMp3
-                        ? createAudioElement(file.name, sortValue)
-                        : createImageElement(file.name, filePath, isWebP, animatedPath, sortValue);
-                container.dataset.mediaType = isMp4 ? 'video' : isMp3 ? 'audio' : 'image';
-                container.dataset.isAnimated = isWebP ? 'true' : 'false';
-                container.dataset.mimeType = mimeType;
-                container.dataset.sortDate = uploadDate.toISOString();
-                container.dataset.sortFilename = file.name.toLowerCase();
-                container.dataset.sortSize = file.size || 0;
-                insertSorted(container);
+    let next = 0;
+    const worker = async () => {
+        while (next < files.length) {
+            const file = files[next++];
+            try {
+                const result = await uploadFileInChunks(file, uploadSubpath, bytes => {
+                    progress.set(file, bytes);
+                    showProgress();
+                });
+                messages.push(result.message);
+                // The server's path, not file.name: it sanitizes names and drops skipped duplicates
+                if (result.path) addPlaceholder(file, result.path);
+            } catch (err) {
+                console.error(`Upload of ${file.name} failed:`, err);
+                messages.push(`Upload of '${file.name}' failed: ${err.message}`);
+                failed++;
             }
+            finished++;
+            progress.set(file, file.size);
+            showProgress();
         }
-    } catch (err) {
-        console.error('Upload failed:', err);
-        uploadStatus.innerText = 'Upload failed. Please try again.';
-    }
+    };
+    await Promise.all(Array.from({ length: Math.min(FILES_IN_FLIGHT, files.length) }, worker));
+
+    if (files.length === 1) uploadStatus.innerText = messages[0];
+    else if (failed) uploadStatus.innerText = `${files.length - failed} of ${files.length} files uploaded. ${messages.filter(m => m.includes('failed')).join(' ')}`;
+    else uploadStatus.innerText = `${files.length} files uploaded successfully`;
 }
 
 export function initUploadListeners() {
@@ -1,5 +1,3 @@
-import { gallery, sortBy, sortDir } from './dom.js';
-
 export function debounce(func, delay) {
     let timeoutId;
     return (...args) => {
@@ -31,32 +29,55 @@ export function getSortLabel(sortKey, file) {
     return null;
 }
 
-export function insertSorted(container) {
-    const sortKey = sortBy.value;
-    const dir = sortDir.value;
+// Map with a size limit: get() refreshes an entry, set() past the limit evicts the least recently used.
+// maxWeight optionally also bounds the summed weights (e.g. bytes) passed to set().
+export class LruCache {
+    constructor(limit, maxWeight = Infinity) {
+        this.limit = limit;
+        this.maxWeight = maxWeight;
+        this.entries = new Map();
+        this.weights = new Map();
+        this.totalWeight = 0;
+    }
 
-    function getSortValue(c) {
-        if (sortKey === 'date') return c.dataset.sortDate || '';
-        if (sortKey === 'filename') return c.dataset.sortFilename || '';
-        return Number(c.dataset.sortSize) || 0;
+    get(key) {
+        if (!this.entries.has(key)) return undefined;
+        const value = this.entries.get(key);
+        this.entries.delete(key);
+        this.entries.set(key, value);
+        return value;
     }
 
-    const newVal = getSortValue(container);
-    const containers = Array.from(gallery.children);
+    has(key) {
+        return this.entries.has(key);
+    }
 
-    let insertBefore = null;
-    for (const existing of containers) {
-        const existingVal = getSortValue(existing);
-        const insertBeforeThis = dir === 'asc' ? newVal < existingVal : newVal > existingVal;
-        if (insertBeforeThis) {
-            insertBefore = existing;
-            break;
+    set(key, value, weight = 0) {
+        this.delete(key);
+        if (weight > this.maxWeight) return this;
+        this.entries.set(key, value);
+        this.weights.set(key, weight);
+        this.totalWeight += weight;
+        while (this.entries.size > this.limit || this.totalWeight > this.maxWeight) {
+            this.delete(this.entries.keys().next().value);
         }
+        return this;
+    }
+
+    delete(key) {
+        if (!this.entries.has(key)) return false;
+        this.totalWeight -= this.weights.get(key);
+        this.weights.delete(key);
+        return this.entries.delete(key);
+    }
+
+    clear() {
+        this.entries.clear();
+        this.weights.clear();
+        this.totalWeight = 0;
     }
 
-    if (insertBefore) {
-        gallery.insertBefore(container, insertBefore);
-    } else {
-        gallery.appendChild(container);
+    get size() {
+        return this.entries.size;
     }
 }
@@ -0,0 +1,300 @@
+import { state } from './state.js';
+import { gallery, sortBy, sortDir } from './dom.js';
+
+// Page size of /images and /search; page N always starts at server offset N * PAGE_SIZE
+export const PAGE_SIZE = 12;
+const OVERSCAN_ROWS = 3;
+const RECYCLE_LIMIT = 200;
+
+// Injected by main.js via initVirtualGrid — avoids circular dependencies with gallery-items.js / navigation.js
+let createElement = file => document.createElement('div');
+let onNeedPage = page => {};
+
+const mounted = new Map();   // file name → container currently in the grid
+const recycled = new Map();  // file name → unmounted container, oldest first
+let rowStride = 0;           // px from one row's top to the next, measured from mounted rows
+let renderQueued = false;
+
+export function initVirtualGrid({ createElement: create, onNeedPage: needPage }) {
+    createElement = create;
+    onNeedPage = needPage;
+    window.addEventListener('scroll', scheduleRender, { passive: true });
+    window.addEventListener('resize', () => {
+        rowStride = 0;
+        scheduleRender();
+    });
+}
+
+// ─── Item list ─────────────────────────────────────────────
+
+export function resetGrid() {
+    mounted.forEach(releaseMedia);
+    mounted.clear();
+    recycled.clear();
+    state.items = [];
+    state.totalItems = null;
+    state.itemShift = 0;
+    state.selectedFiles.clear();
+    state.lastSelectedIndex = -1;
+    rowStride = 0;
+    gallery.replaceChildren();
+    gallery.style.paddingTop = '';
+    gallery.style.paddingBottom = '';
+}
+
+export function findItemIndex(fileName) {
+    return state.items.findIndex(file => file && file.name === fileName);
+}
+
+// /images metadata for a file in the current view; the item list covers entries the LRU cache evicted
+export function getFileMetadata(fileName) {
+    const cached = state.fileMetadataCache.get(`${state.currentDir}/${fileName}`);
+    if (cached) return cached;
+    const index = findItemIndex(fileName);
+    return index === -1 ? undefined : state.items[index];
+}
+
+export function getMountedElement(fileName) {
+    return mounted.get(fileName) || null;
+}
+
+export function isFullyLoaded() {
+    return state.totalItems !== null && state.items.filter(Boolean).length >= state.totalItems;
+}
+
+/**
+ * Store one server page. Items spliced in or removed by the change feed shift
+ * server offsets, tracked approximately by state.itemShift; repeats are
+ * skipped and the page fills the first free slots from its offset.
+ */
+export function placePage(page, files, total) {
+    if (total !== undefined) state.totalItems = total + state.itemShift;
+    let slot = Math.max(0, page * PAGE_SIZE + state.itemShift);
+    files.forEach(file => {
+        if (findItemIndex(file.name) !== -1) return;
+        while (state.items[slot]) slot++;
+        state.items[slot] = file;
+    });
+    state.totalItems = Math.max(state.totalItems ?? 0, state.items.length);
+    scheduleRender();
+}
+
+function sortValue(file) {
+    switch (sortBy.value) {
+        case 'filename': return file.name.toLowerCase();
+        case 'size': return file.size_bytes || 0;
+        case 'rating': return file.rating || 0;
+        case 'duration': return file.duration_seconds || 0;
+        case 'resolution': {
+            const [width, height] = (file.resolution || '').split('x').map(Number);
+            return (width * height) || 0;
+        }
+        default: return new Date(file.last_modified).toISOString();
+    }
+}
+
+/**
+ * Insert a file at its sorted position among the loaded items. Returns false
+ * (leaving it for paging) if it sorts after every loaded item while later
+ * pages are still unloaded, unless allowAppend.
+ */
+export function insertItem(file, allowAppend = false) {
+    const value = sortValue(file);
+    const ascending = sortDir.value === 'asc';
+    let index = state.items.findIndex(existing =>
+        existing && (ascending ? value < sortValue(existing) : value > sortValue(existing)));
+    if (index === -1) {
+        if (!allowAppend && !isFullyLoaded()) return false;
+        index = state.items.length;
+    }
+    state.items.splice(index, 0, file);
+    state.totalItems = (state.totalItems ?? 0) + 1;
+    state.itemShift++;
+    scheduleRender();
+    return true;
+}
+
+export function removeItem(fileName) {
+    const index = findItemIndex(fileName);
+    if (index !== -1) {
+        state.items.splice(index, 1);
+        state.totalItems = Math.max(0, (state.totalItems ?? 1) - 1);
+        state.itemShift--;
+    }
+    state.selectedFiles.delete(fileName);
+    dropElement(fileName);
+    scheduleRender();
+}
+
+// Replace an item's metadata; its element is rebuilt on the next render
+export function updateItem(file) {
+    const index = findItemIndex(file.name);
+    if (index === -1) return false;
+    state.items[index] = file;
+    dropElement(file.name);
+    scheduleRender();
+    return true;
+}
+
+// ─── Selection ─────────────────────────────────────────────
+
+export function setSelected(fileName, selected) {
+    if (selected) state.selectedFiles.add(fileName);
+    else state.selectedFiles.delete(fileName);
+    const container = mounted.get(fileName);
+    if (container) applySelection(container, fileName);
+}
+
+// Select or clear every loaded item between two item indexes (shift-click)
+export function setSelectedRange(fromIndex, toIndex, selected) {
+    const [start, end] = [fromIndex, toIndex].sort((a, b) => a - b);
+    for (let i = start; i <= end; i++) {
+        if (state.items[i]) setSelected(state.items[i].name, selected);
+    }
+}
+
+export function setAllSelected(selected) {
+    if (selected) state.items.forEach(file => file && state.selectedFiles.add(file.name));
+    else state.selectedFiles.clear();
+    mounted.forEach(applySelection);
+}
+
+function applySelection(container, fileName) {
+    const selected = state.selectedFiles.has(fileName);
+    container.classList.toggle('selected', selected);
+    const checkbox = container.querySelector('.checkbox');
+    if (checkbox) checkbox.checked = selected;
+}
+
+// ─── Mounting ──────────────────────────────────────────────
+
+// Stop playback and drop decoded media; restoreMedia puts the sources back
+function releaseMedia(container) {
+    container.querySelectorAll('img, video, audio').forEach(media => {
+        if (media.tagName !== 'IMG') media.pause();
+        const src = media.getAttribute('src');
+        if (src) {
+            media.dataset.releasedSrc = src;
+            media.removeAttribute('src');
+            if (media.tagName !== 'IMG') media.load();
+        }
+    });
+}
+
+function restoreMedia(container) {
+    container.querySelectorAll('img, video, audio').forEach(media => {
+        if (media.dataset.releasedSrc) {
+            media.src = media.dataset.releasedSrc;
+            delete media.dataset.releasedSrc;
+        }
+    });
+}
+
+function dropElement(fileName) {
+    const container = mounted.get(fileName);
+    if (container) {
+        releaseMedia(container);
+        container.remove();
+        mounted.delete(fileName);
+    }
+    recycled.delete(fileName);
+}
+
+function unmount(fileName, container) {
+    releaseMedia(container);
+    mounted.delete(fileName);
+    recycled.set(fileName, container);
+    if (recycled.size > RECYCLE_LIMIT) recycled.delete(recycled.keys().next().value);
+}
+
+function elementFor(file, index) {
+    let container = mounted.get(file.name);
+    if (!container) {
+        container = recycled.get(file.name);
+        if (container) {
+            recycled.delete(file.name);
+            restoreMedia(container);
+        } else {
+            container = createElement(file);
+        }
+        mounted.set(file.name, container);
+    }
+    container.dataset.index = index;
+    applySelection(container, file.name);
+    return container;
+}
+
+function countColumns() {
+    return Math.max(1, getComputedStyle(gallery).gridTemplateColumns.split(' ').length);
+}
+
+function measureRowStride(columns) {
+    const children = gallery.children;
+    if (children.length > columns) return children[columns].offsetTop - children[0].offsetTop;
+    if (children.length > 0) return children[0].offsetHeight + (parseFloat(getComputedStyle(gallery).rowGap) || 0);
+    return gallery.clientWidth / columns;
+}
+
+export function scheduleRender() {
+    if (renderQueued) return;
+    renderQueued = true;
+    requestAnimationFrame(render);
+}
+
+/**
+ * Mount the rows in view plus OVERSCAN_ROWS above and below; everything else
+ * is represented by padding sized from the server's total count, so the
+ * scrollbar can jump to any offset and the pages there are fetched directly.
+ */
+function render() {
+    renderQueued = false;
+    if (gallery.style.display === 'none' || state.totalItems === null) return;
+
+    const columns = countColumns();
+    if (!rowStride) rowStride = measureRowStride(columns) || 1;
+    const totalRows = Math.ceil(state.totalItems / columns);
+    const galleryTop = gallery.getBoundingClientRect().top + window.scrollY;
+    const firstRow = Math.max(0, Math.floor((window.scrollY - galleryTop) / rowStride) - OVERSCAN_ROWS);
+    const lastRow = Math.min(
+        totalRows - 1,
+        Math.floor((window.scrollY + window.innerHeight - galleryTop) / rowStride) + OVERSCAN_ROWS
+    );
+
+    const next = [];
+    const neededPages = new Set();
+    for (let i = firstRow * columns; i < Math.min(state.totalItems, (lastRow + 1) * columns); i++) {
+        const file = state.items[i];
+        if (file) {
+            next.push(elementFor(file, i));
+        } else {
+            const placeholder = document.createElement('div');
+            placeholder.className = 'image-container placeholder';
+            next.push(placeholder);
+            neededPages.add(Math.floor(Math.max(0, i - state.itemShift) / PAGE_SIZE));
+        }
+    }
+
+    const keep = new Set(next);
+    mounted.forEach((container, fileName) => {
+        if (!keep.has(container)) unmount(fileName, container);
+    });
+    Array.from(gallery.children).forEach(child => {
+        if (!keep.has(child)) child.remove();
+    });
+    let cursor = gallery.firstElementChild;
+    next.forEach(node => {
+        if (node === cursor) cursor = cursor.nextElementSibling;
+        else gallery.insertBefore(node, cursor);
+    });
+
+    gallery.style.paddingTop = `${firstRow * rowStride}px`;
+    gallery.style.paddingBottom = `${Math.max(0, totalRows - lastRow - 1) * rowStride}px`;
+
+    // Rows grow to fit their tallest item; re-render once if the estimate was off
+    const measured = next.length ? measureRowStride(columns) : rowStride;
+    if (Math.abs(measured - rowStride) > 1) {
+        rowStride = measured;
+        scheduleRender();
+    }
+    neededPages.forEach(page => onNeedPage(page));
+}
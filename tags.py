@@ -1,11 +1,24 @@
+import bisect
 import json
 import os
 import threading
-from typing import Dict, List
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Set, Tuple
 
 
 class TagsManager:
-    """Manages tags for media files using a JSON file for persistence."""
+    """
+    Manages tags for media files using a JSON file for persistence.
+
+    Alongside the per-file lists it keeps each tag's postings (the set of
+    files carrying it) and a sorted list of the tag names, both updated on
+    every mutation. Prefix lookups for autocomplete are a bisect plus a scan
+    of the matches, and library-wide renames, merges and deletes touch only
+    the files in the affected postings, with one write of tags.json.
+
+    tags.json is read, and the postings built, on first use rather than on
+    construction; preload() does it in the background.
+    """
 
     TAGS_FILE = "tags.json"
 
@@ -13,67 +26,222 @@ class TagsManager:
         self.directory = os.path.abspath(directory)
         self.tags_path = os.path.join(self.directory, self.TAGS_FILE)
         self._tags: Dict[str, List[str]] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        self._sorted_tags: List[str] = []
         self._lock = threading.Lock()
-        self._load()
+        self._listeners: List[Callable[[str], None]] = []
+        self._loaded = False
 
-    def _load(self):
+    @contextmanager
+    def _locked(self):
+        """Hold the lock, loading tags.json first if it has not been read yet."""
         with self._lock:
-            if os.path.exists(self.tags_path):
-                try:
-                    with open(self.tags_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    self._tags = {
-                        k: [t for t in v if isinstance(t, str)]
-                        for k, v in data.items()
-                        if isinstance(v, list)
-                    }
-                except (json.JSONDecodeError, IOError) as e:
-                    print(f"Error loading tags from {self.tags_path}: {e}")
-                    self._tags = {}
-            else:
+            if not self._loaded:
+                self._load_unsafe()
+            yield
+
+    def preload(self):
+        """Read tags.json in a background thread."""
+        def load():
+            with self._locked():
+                pass
+        threading.Thread(target=load, daemon=True).start()
+
+    def _load_unsafe(self):
+        self._loaded = True
+        if os.path.exists(self.tags_path):
+            try:
+                with open(self.tags_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self._tags = {
+                    k: [t for t in v if isinstance(t, str)]
+                    for k, v in data.items()
+                    if isinstance(v, list)
+                }
+            except (json.JSONDecodeError, IOError) as e:
+                print(f"Error loading tags from {self.tags_path}: {e}")
                 self._tags = {}
+        else:
+            self._tags = {}
+        self._postings = {}
+        for filename, tags in self._tags.items():
+            for tag in tags:
+                self._postings.setdefault(tag, set()).add(filename)
+        self._sorted_tags = sorted(self._postings)
+
+    def _post_unsafe(self, filename: str, tags: Iterable[str]):
+        for tag in tags:
+            files = self._postings.get(tag)
+            if files is None:
+                files = self._postings[tag] = set()
+                bisect.insort(self._sorted_tags, tag)
+            files.add(filename)
+
+    def _unpost_unsafe(self, filename: str, tags: Iterable[str]):
+        for tag in tags:
+            files = self._postings.get(tag)
+            if files is None:
+                continue
+            files.discard(filename)
+            if not files:
+                del self._postings[tag]
+                del self._sorted_tags[bisect.bisect_left(self._sorted_tags, tag)]
+
+    def suggest(self, prefix: str, limit: int = 0) -> List[Tuple[str, int]]:
+        """
+        (tag, file count) for every tag starting with prefix, most used first.
+
+        limit > 0 keeps only the first limit suggestions.
+        """
+        with self._locked():
+            matches = []
+            index = bisect.bisect_left(self._sorted_tags, prefix)
+            while index < len(self._sorted_tags) and self._sorted_tags[index].startswith(prefix):
+                tag = self._sorted_tags[index]
+                matches.append((tag, len(self._postings[tag])))
+                index += 1
+        matches.sort(key=lambda match: -match[1])
+        return matches[:limit] if limit > 0 else matches
+
+    def tag_count(self, tag: str) -> int:
+        """Number of files carrying a tag."""
+        with self._locked():
+            return len(self._postings.get(tag, ()))
+
+    def merge_tags(self, tags: Iterable[str], target: str) -> Tuple[bool, int]:
+        """
+        Replace each of tags with target on every file carrying it.
+
+        A file that already has target just loses the merged tag; otherwise
+        target takes the merged tag's place in the file's list. Renaming a
+        tag is merging it into a new name. Returns (saved, files changed).
+        """
+        changed: Set[str] = set()
+        with self._locked():
+            for tag in set(tags) - {target}:
+                for filename in self._postings.get(tag, set()).copy():
+                    current = self._tags[filename]
+                    self._unpost_unsafe(filename, [tag])
+                    if target in current:
+                        self._tags[filename] = [t for t in current if t != tag]
+                    else:
+                        self._tags[filename] = [target if t == tag else t for t in current]
+                        self._post_unsafe(filename, [target])
+                    changed.add(filename)
+            saved = self._save_unsafe() if changed else True
+        self._notify(*changed)
+        return saved, len(changed)
+
+    def delete_tag(self, tag: str) -> Tuple[bool, int]:
+        """Remove a tag from every file carrying it; returns (saved, files changed)."""
+        with self._locked():
+            changed = self._postings.pop(tag, set())
+            if not changed:
+                return True, 0
+            del self._sorted_tags[bisect.bisect_left(self._sorted_tags, tag)]
+            for filename in changed:
+                remaining = [t for t in self._tags[filename] if t != tag]
+                if remaining:
+                    self._tags[filename] = remaining
+                else:
+                    del self._tags[filename]
+            saved = self._save_unsafe()
+        self._notify(*changed)
+        return saved, len(changed)
 
     def get_tags(self, filename: str) -> List[str]:
         filename = filename.replace(os.sep, '/')
-        with self._lock:
+        with self._locked():
             return list(self._tags.get(filename, []))
 
     def add_tag(self, filename: str, tag: str) -> bool:
         filename = filename.replace(os.sep, '/')
-        with self._lock:
+        with self._locked():
             tags = list(self._tags.get(filename, []))
             if tag not in tags:
                 tags.append(tag)
                 self._tags[filename] = tags
-            return self._save_unsafe()
+                self._post_unsafe(filename, [tag])
+            saved = self._save_unsafe()
+        self._notify(filename)
+        return saved
 
     def remove_tag(self, filename: str, tag: str) -> bool:
         filename = filename.replace(os.sep, '/')
-        with self._lock:
+        with self._locked():
             tags = self._tags.get(filename, [])
-            if tag in tags:
-                self._tags[filename] = [t for t in tags if t != tag]
-                if not self._tags[filename]:
-                    del self._tags[filename]
-                return self._save_unsafe()
-            return True
+            if tag not in tags:
+                return True
+            self._tags[filename] = [t for t in tags if t != tag]
+            self._unpost_unsafe(filename, [tag])
+            if not self._tags[filename]:
+                del self._tags[filename]
+            saved = self._save_unsafe()
+        self._notify(filename)
+        return saved
 
     def delete_file_tags(self, filename: str) -> bool:
-        filename = filename.replace(os.sep, '/')
-        with self._lock:
-            if filename in self._tags:
-                del self._tags[filename]
-                return self._save_unsafe()
-            return True
+        self.pop_file_tags([filename])
+        return True
+
+    def pop_file_tags(self, filenames: Iterable[str]) -> Dict[str, List[str]]:
+        """Remove the tags of a batch of files with one write; returns the removed tags by filename."""
+        with self._locked():
+            removed = {}
+            for filename in filenames:
+                filename = filename.replace(os.sep, '/')
+                if filename in self._tags:
+                    removed[filename] = self._tags.pop(filename)
+                    self._unpost_unsafe(filename, removed[filename])
+            if removed:
+                self._save_unsafe()
+        self._notify(*removed)
+        return removed
+
+    def add_file_tags(self, tags_by_file: Dict[str, List[str]]) -> bool:
+        """Add tags to a batch of files with one write, keeping each file's existing tags first."""
+        with self._locked():
+            changed = []
+            for filename, tags in tags_by_file.items():
+                filename = filename.replace(os.sep, '/')
+                current = self._tags.get(filename, [])
+                added = [tag for tag in dict.fromkeys(tags) if tag not in current]
+                if added:
+                    self._tags[filename] = current + added
+                    self._post_unsafe(filename, added)
+                    changed.append(filename)
+            saved = self._save_unsafe() if changed else True
+        self._notify(*changed)
+        return saved
 
     def rename_file_key(self, old_filename: str, new_filename: str) -> bool:
-        old_filename = old_filename.replace(os.sep, '/')
-        new_filename = new_filename.replace(os.sep, '/')
-        with self._lock:
-            if old_filename in self._tags:
-                self._tags[new_filename] = self._tags.pop(old_filename)
-                return self._save_unsafe()
-            return True
+        return self.rename_file_keys({old_filename: new_filename})
+
+    def rename_file_keys(self, renames: Dict[str, str]) -> bool:
+        """Move tags from old to new filenames for a batch of moved files, with one write."""
+        renames = {old.replace(os.sep, '/'): new.replace(os.sep, '/') for old, new in renames.items()}
+        with self._locked():
+            moved = {old: self._tags.pop(old) for old in renames if old in self._tags}
+            if not moved:
+                return True
+            for old, tags in moved.items():
+                new = renames[old]
+                self._unpost_unsafe(old, tags)
+                self._unpost_unsafe(new, self._tags.get(new, []))
+                self._tags[new] = tags
+                self._post_unsafe(new, tags)
+            saved = self._save_unsafe()
+        self._notify(*moved, *(renames[old] for old in moved))
+        return saved
+
+    def add_listener(self, listener: Callable[[str], None]):
+        """Register a callback invoked with a filename after its tags change (outside the lock)."""
+        self._listeners.append(listener)
+
+    def _notify(self, *filenames: str):
+        for listener in self._listeners:
+            for filename in filenames:
+                listener(filename)
 
     def _save_unsafe(self) -> bool:
         try:
@@ -0,0 +1,91 @@
+import errno
+import os
+import shutil
+import threading
+import uuid
+from typing import Iterable, List, Set, Tuple
+
+TRASH_DIR = ".trash"  # Per source, at its root; left out of the directory tree
+
+
+class Trash:
+    """
+    Fast batch deletes for one directory tree.
+
+    move_to_trash() renames each file into a fresh batch folder under
+    TRASH_DIR, which is on the same filesystem so a rename is a metadata
+    update however large the file. Trashed files are named n.deleted, not a
+    media extension, so watchers and scans see them as gone. A background
+    thread removes batch folders for real, including any left behind by a
+    previous run.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = os.path.abspath(directory)
+        self.trash_dir = os.path.join(self.directory, TRASH_DIR)
+        self._wake = threading.Event()
+        self._filling: Set[str] = set()  # Batch folders still being moved into
+        self._lock = threading.Lock()
+
+    def move_to_trash(self, files: Iterable[Tuple[str, str]]) -> Tuple[List[str], List[str]]:
+        """
+        Move (relative path, full path) pairs out of the tree.
+
+        Files on another filesystem than the trash (a mount inside the tree)
+        are removed in place instead.
+
+        Returns:
+            (relative paths trashed, error messages)
+        """
+        batch_dir = os.path.join(self.trash_dir, uuid.uuid4().hex)
+        trashed: List[str] = []
+        errors: List[str] = []
+        with self._lock:
+            self._filling.add(batch_dir)
+        try:
+            os.makedirs(batch_dir)
+            for index, (relative_path, full_path) in enumerate(files):
+                try:
+                    if not os.path.isfile(full_path):
+                        raise FileNotFoundError("File not found")
+                    try:
+                        os.rename(full_path, os.path.join(batch_dir, f"{index}.deleted"))
+                    except OSError as e:
+                        if e.errno != errno.EXDEV:
+                            raise
+                        os.remove(full_path)
+                    trashed.append(relative_path)
+                except OSError as e:
+                    errors.append(f"{relative_path}: {e.strerror or e}")
+        except OSError as e:
+            errors.append(f"Could not create trash folder: {e}")
+        finally:
+            with self._lock:
+                self._filling.discard(batch_dir)
+        self._wake.set()
+        return trashed, errors
+
+    # ─── Purging ─────────────────────────────────────────────
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._purge()
+            self._wake.wait()
+            self._wake.clear()
+
+    def _purge(self):
+        try:
+            batches = [entry.path for entry in os.scandir(self.trash_dir) if entry.is_dir(follow_symlinks=False)]
+        except OSError:
+            return
+        with self._lock:
+            batches = [batch_dir for batch_dir in batches if batch_dir not in self._filling]
+        for batch_dir in batches:
+            try:
+                shutil.rmtree(batch_dir)
+            except OSError as e:
+                # Left for the next purge
+                print(f"Error purging {batch_dir}: {e}")